@@ -0,0 +1,99 @@
+"""Agenda dos médicos: horários livres e conflitos de horário.
+
+O índice único uq_Consulta_Med_Data (CodMed, Data_Hora) de script_banco.sql
+impede que dois agendamentos simultâneos peguem o mesmo horário do mesmo
+médico; o segundo recebe o erro 1062, reconhecido por horario_ocupado().
+
+Os horários livres de um médico em um período saem de uma única consulta por
+faixa nesse índice (as consultas já marcadas, em ordem) e de uma varredura
+em memória: para cada horário candidato, searchsorted acha a primeira
+consulta que ainda pode se sobrepor a ele.
+"""
+import datetime
+
+import numpy as np
+
+from banco import ler_sql
+
+INICIO_EXPEDIENTE = datetime.time(7, 0)
+FIM_EXPEDIENTE = datetime.time(19, 0)
+DURACAO_CONSULTA = datetime.timedelta(minutes=30)
+DIAS_ATENDIMENTO = {0, 1, 2, 3, 4, 5}  # segunda a sábado (weekday)
+
+ER_DUP_ENTRY = 1062
+INDICE_UNICO = "uq_Consulta_Med_Data"
+MSG_HORARIO_OCUPADO = "Horário já ocupado para este médico"
+
+
+def horarios_do_dia():
+    # Horários de início das consultas em um dia de expediente
+    inicio = datetime.datetime.combine(datetime.date.min, INICIO_EXPEDIENTE)
+    fim = datetime.datetime.combine(datetime.date.min, FIM_EXPEDIENTE)
+    horarios = []
+    while inicio + DURACAO_CONSULTA <= fim:
+        horarios.append(inicio.time())
+        inicio += DURACAO_CONSULTA
+    return horarios
+
+
+HORARIOS = horarios_do_dia()
+
+
+def horario_ocupado(erro):
+    # Erro do mysql.connector causado pelo índice único (CodMed, Data_Hora)?
+    return getattr(erro, "errno", None) == ER_DUP_ENTRY and INDICE_UNICO in (getattr(erro, "msg", "") or "")
+
+
+def sql_agenda_periodo(cod_med, inicio, fim):
+    # Faixa no índice único (CodMed, Data_Hora): já vem ordenada, sem ler a tabela
+    sql = """
+    SELECT Data_Hora
+    FROM Consulta
+    WHERE CodMed = %s AND Data_Hora >= %s AND Data_Hora < %s
+    ORDER BY Data_Hora
+    """
+    return sql, (cod_med, inicio, fim)
+
+
+def candidatos(data_inicio, data_fim):
+    # Todos os horários de expediente entre as datas (inclusive)
+    dias = np.arange(np.datetime64(data_inicio, "D"), np.datetime64(data_fim, "D") + 1)
+    dias = dias[np.isin((dias.astype(np.int64) + 3) % 7, list(DIAS_ATENDIMENTO))]  # 1970-01-01 foi quinta (3)
+    minutos = np.array([h.hour * 60 + h.minute for h in HORARIOS], dtype="timedelta64[m]")
+    return (dias.astype("datetime64[m]")[:, None] + minutos[None, :]).ravel()
+
+
+def horarios_livres(ocupados, data_inicio, data_fim, agora=None):
+    """Horários candidatos do período que não se sobrepõem a nenhuma consulta.
+
+    ocupados: inícios das consultas já marcadas, em ordem crescente.
+    """
+    slots = candidatos(data_inicio, data_fim)
+    if agora is not None:
+        slots = slots[slots > np.datetime64(agora, "m")]  # o gatilho recusa datas passadas
+    marcadas = np.asarray(ocupados, dtype="datetime64[m]")
+    duracao = np.timedelta64(int(DURACAO_CONSULTA.total_seconds() // 60), "m")
+    # Primeira consulta que termina depois do início do horário; há conflito
+    # se ela começar antes do fim do horário
+    j = np.searchsorted(marcadas, slots - duracao, side="right")
+    proxima = marcadas[np.minimum(j, len(marcadas) - 1)] if len(marcadas) else slots + duracao
+    conflito = (j < len(marcadas)) & (proxima < slots + duracao)
+    return slots[~conflito].astype(datetime.datetime).tolist()
+
+
+def buscar_horarios_livres(conn, cod_med, data_inicio, data_fim, agora=None):
+    fim = data_fim + datetime.timedelta(days=1)
+    # Inclui a consulta que começa antes do período mas ainda o ocupa
+    inicio = datetime.datetime.combine(data_inicio, datetime.time()) - DURACAO_CONSULTA
+    df = ler_sql(conn, *sql_agenda_periodo(cod_med, inicio, fim))
+    return horarios_livres(df["Data_Hora"].to_numpy(dtype="datetime64[m]"), data_inicio, data_fim,
+                           agora or datetime.datetime.now())
+
+
+def proximo_horario(agora=None):
+    # Primeiro horário de expediente depois de agora. Serve de valor padrão
+    # dos campos de data/hora: o Streamlit identifica o widget pelo padrão, e
+    # um padrão que muda a cada reexecução (now()) descarta o que foi escolhido
+    agora = agora or datetime.datetime.now()
+    slots = candidatos(agora.date(), agora.date() + datetime.timedelta(days=7))
+    return slots[slots > np.datetime64(agora, "m")][0].astype(datetime.datetime)
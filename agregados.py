@@ -0,0 +1,253 @@
+"""Agregados do Dashboard em memória, atualizados por marca d'água.
+
+No modo incremental do Dashboard o processo guarda, para cada filtro
+(período e especialidade), as contagens por dia, por médico, por paciente e
+por especialidade, junto com a maior IdConsulta e o maior IdLog de
+Log_Cancelamento já aplicados. A cada atualização só as consultas novas
+(IdConsulta acima da marca) e os cancelamentos novos (IdLog acima da marca)
+são lidos, duas buscas por faixa de chave primária, e somados ou subtraídos.
+
+Uma UPDATE em Consulta, a remoção de entradas do log e as alterações em
+médicos e pacientes não aparecem nessas faixas: os gatilhos de
+Controle_Versao (script_banco.sql) as registram e o filtro é reconstruído
+do zero. Sem essa migração não há como detectá-las, então cada atualização
+reconstrói.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import dashboard
+import medicao
+import referencia
+from banco import executar, ler_sql
+
+MARGEM_IDS = 1000        # IDs abaixo da marca relidos a cada vez: transações confirmadas fora de ordem
+NOVIDADES_MAX = 50_000   # acima disso (importação em massa etc.) é mais barato reconstruir
+FILTROS_MAX = 8          # filtros guardados; os usados há mais tempo saem
+TABELA_ALTERACOES = "Consulta_Alterada"  # linha de Controle_Versao
+
+SQL_MARCAS = """
+SELECT (SELECT COALESCE(MAX(IdConsulta), 0) FROM Consulta) AS consulta,
+       (SELECT COALESCE(MAX(IdLog), 0) FROM Log_Cancelamento) AS log
+"""
+
+# Agregado -> expressão de agrupamento (sobre Consulta c JOIN Medico m)
+CHAVES = {
+    "por_dia": "DATE(c.Data_Hora)",
+    "por_medico": "c.CodMed",
+    "por_paciente": "c.CpfPaciente",
+}
+
+
+def sql_contagem(filtro, expressao):
+    where, params = filtro
+    sql = f"""
+    SELECT {expressao} AS chave, COUNT(*) AS Qtd
+    FROM Consulta c
+    JOIN Medico m ON c.CodMed = m.CodMed
+    {where}
+    GROUP BY chave
+    """
+    return sql, params
+
+
+def sql_novas(apos, limite=NOVIDADES_MAX + 1):
+    sql = """
+    SELECT IdConsulta, CodMed, CpfPaciente, Data_Hora
+    FROM Consulta
+    WHERE IdConsulta > %s
+    ORDER BY IdConsulta
+    LIMIT %s
+    """
+    return sql, (apos, limite)
+
+
+def sql_canceladas(apos, limite=NOVIDADES_MAX + 1):
+    sql = """
+    SELECT IdLog, IdConsultaDeletada, CodMed, CpfPaciente, Data_Hora
+    FROM Log_Cancelamento
+    WHERE IdLog > %s
+    ORDER BY IdLog
+    LIMIT %s
+    """
+    return sql, (apos, limite)
+
+
+@dataclass
+class Agregados:
+    por_dia: Counter = field(default_factory=Counter)
+    por_medico: Counter = field(default_factory=Counter)
+    por_paciente: Counter = field(default_factory=Counter)
+    marca_consulta: int = 0
+    marca_log: int = 0
+    recentes: set = field(default_factory=set)      # IdConsulta aplicados dentro da margem
+    recentes_log: set = field(default_factory=set)  # IdLog aplicados dentro da margem
+    versao: tuple = None                            # versões que invalidam os agregados
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def aplicar(self, df, sinal):
+        # Soma (sinal=1) ou subtrai (sinal=-1) as linhas com Data_Hora, CodMed e CpfPaciente
+        for contador, chaves in ((self.por_dia, df["Data_Hora"].dt.date), (self.por_medico, df["CodMed"]),
+                                 (self.por_paciente, df["CpfPaciente"])):
+            for chave, qtd in chaves.value_counts().items():
+                contador[chave] += sinal * qtd
+                if contador[chave] <= 0:
+                    del contador[chave]
+
+    def podar(self):
+        self.recentes = {i for i in self.recentes if i > self.marca_consulta - MARGEM_IDS}
+        self.recentes_log = {i for i in self.recentes_log if i > self.marca_log - MARGEM_IDS}
+
+
+_estados = OrderedDict()   # (data_inicio, data_fim, especialidade) -> Agregados
+_lock = threading.Lock()
+
+
+def _versao(conn):
+    # None quando Controle_Versao (ou a linha de Consulta) não existe
+    alteracoes = referencia.versao(conn, TABELA_ALTERACOES, forcar=True)
+    if alteracoes[1] is None:
+        return None
+    return alteracoes, referencia.versao(conn, "Medico"), referencia.versao(conn, "Paciente")
+
+
+def _no_filtro(df, data_inicio, data_fim, especialidade, medicos):
+    inicio, fim = dashboard.intervalo_datas(data_inicio, data_fim)
+    dentro = (df["Data_Hora"] >= pd.Timestamp(inicio)) & (df["Data_Hora"] < pd.Timestamp(fim))
+    if especialidade != "Todas":
+        especialidades = dict(zip(medicos.codigos, medicos.extras or ()))
+        dentro &= df["CodMed"].map(especialidades) == especialidade
+    return df[dentro]
+
+
+def reconstruir(conn, data_inicio, data_fim, especialidade, versao):
+    """Agregados do filtro calculados do zero, com as marcas no mesmo instante."""
+    estado = Agregados(versao=versao)
+    filtro = dashboard.filtro_dashboard(data_inicio, data_fim, especialidade)
+    cursor = conn.cursor()
+    # Marcas e contagens da mesma fotografia do banco
+    executar(cursor, "START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    try:
+        marcas = ler_sql(conn, SQL_MARCAS)
+        estado.marca_consulta, estado.marca_log = int(marcas["consulta"][0]), int(marcas["log"][0])
+        for nome, expressao in CHAVES.items():
+            df = ler_sql(conn, *sql_contagem(filtro, expressao))
+            setattr(estado, nome, Counter(dict(zip(df["chave"], df["Qtd"].astype(int)))))
+        estado.recentes = set(ler_sql(conn, *sql_novas(estado.marca_consulta - MARGEM_IDS, MARGEM_IDS))["IdConsulta"])
+        estado.recentes_log = set(ler_sql(conn, *sql_canceladas(estado.marca_log - MARGEM_IDS, MARGEM_IDS))["IdLog"])
+    finally:
+        conn.commit()
+        cursor.close()
+    return estado
+
+
+def aplicar_novidades(conn, estado, data_inicio, data_fim, especialidade, medicos):
+    """Aplica as inserções e os cancelamentos desde as marcas; devolve (novas, canceladas).
+
+    Devolve None quando há novidades demais e é melhor reconstruir.
+    """
+    novas = ler_sql(conn, *sql_novas(estado.marca_consulta - MARGEM_IDS))
+    canceladas = ler_sql(conn, *sql_canceladas(estado.marca_log - MARGEM_IDS))
+    if len(novas) > NOVIDADES_MAX or len(canceladas) > NOVIDADES_MAX:
+        return None
+    novas = novas[~novas["IdConsulta"].isin(estado.recentes)]
+    canceladas = canceladas[~canceladas["IdLog"].isin(estado.recentes_log)]
+    # Só desconta consultas que entraram nos agregados: abaixo da margem ou já
+    # vistas (uma consulta criada e cancelada entre duas atualizações nunca entrou)
+    limite_margem = estado.marca_consulta - MARGEM_IDS
+    estado.recentes |= set(novas["IdConsulta"])
+    contadas = canceladas[(canceladas["IdConsultaDeletada"] <= limite_margem)
+                          | canceladas["IdConsultaDeletada"].isin(estado.recentes)]
+    estado.aplicar(_no_filtro(novas, data_inicio, data_fim, especialidade, medicos), 1)
+    estado.aplicar(_no_filtro(contadas, data_inicio, data_fim, especialidade, medicos), -1)
+    estado.recentes_log |= set(canceladas["IdLog"])
+    if not novas.empty:
+        estado.marca_consulta = max(estado.marca_consulta, int(novas["IdConsulta"].max()))
+    if not canceladas.empty:
+        estado.marca_log = max(estado.marca_log, int(canceladas["IdLog"].max()))
+    estado.podar()
+    return len(novas), len(canceladas)
+
+
+def _montar(conn, estado, data_inicio, data_fim, especialidade, medicos, dados):
+    # Seções do Dashboard a partir dos contadores (mesmas colunas das consultas SQL)
+    dados.kpis = pd.DataFrame({"total": [sum(estado.por_dia.values())],
+                               "pacientes": [len(estado.por_paciente)], "medicos": [len(medicos)]})
+
+    por_medico = pd.DataFrame({"NomeMed": medicos.nomes, "Especialidade": medicos.extras,
+                               "TotalConsultas": [estado.por_medico.get(c, 0) for c in medicos.codigos]})
+    dados.rank_medicos = (por_medico[por_medico["TotalConsultas"] > 0]
+                          .groupby(["NomeMed", "Especialidade"], as_index=False)["TotalConsultas"].sum()
+                          .nlargest(10, "TotalConsultas").reset_index(drop=True))
+    dados.especialidades = (por_medico.groupby("Especialidade", as_index=False)["TotalConsultas"].sum()
+                            .rename(columns={"TotalConsultas": "Quantidade"})
+                            .query("Quantidade > 0")
+                            .sort_values("Quantidade", ascending=False).reset_index(drop=True))
+
+    top = estado.por_paciente.most_common(10)
+    nomes = {}
+    if top:
+        marcadores = ", ".join(["%s"] * len(top))
+        df_nomes = ler_sql(conn, f"SELECT CpfPaciente, NomePac FROM Paciente WHERE CpfPaciente IN ({marcadores})",
+                           [cpf for cpf, _ in top])
+        nomes = dict(zip(df_nomes["CpfPaciente"], df_nomes["NomePac"]))
+    dados.rank_pacientes = pd.DataFrame({"NomePac": [nomes.get(cpf, cpf) for cpf, _ in top],
+                                         "TotalConsultas": [qtd for _, qtd in top]})
+
+    if especialidade == "Todas":
+        # Médicos sem nenhuma consulta no período: só falta o e-mail
+        ociosos = [c for c in medicos.codigos if c not in estado.por_medico]
+        dados.ociosos = pd.DataFrame(columns=["NomeMed", "Especialidade", "Email"])
+        if ociosos:
+            marcadores = ", ".join(["%s"] * len(ociosos))
+            dados.ociosos = ler_sql(conn, f"SELECT NomeMed, Especialidade, Email FROM Medico "
+                                          f"WHERE CodMed IN ({marcadores})", ociosos)
+    else:
+        # O relatório de ociosos não filtra por especialidade: os contadores não bastam
+        dados.ociosos = ler_sql(conn, *dashboard.sql_ociosos(data_inicio, data_fim))
+
+
+def carregar(conn, data_inicio, data_fim, especialidade="Todas", agrupamento="Dia", ler=ler_sql):
+    """DadosDashboard do modo incremental; dados.detalhe diz o que foi feito.
+
+    A série temporal continua vindo do resumo Consulta_Diaria (ler permite o
+    cache do app).
+    """
+    dados = dashboard.DadosDashboard()
+    inicio = time.perf_counter()
+    chave = (data_inicio, data_fim, especialidade)
+    try:
+        with medicao.secao("dashboard:incremental"):
+            medicos = referencia.obter(conn, "medicos")
+            versao = _versao(conn)
+            with _lock:
+                estado = _estados.get(chave)
+                if estado is not None:
+                    _estados.move_to_end(chave)
+            resultado = None
+            if estado is not None and versao is not None and estado.versao == versao:
+                with estado.lock:
+                    resultado = aplicar_novidades(conn, estado, data_inicio, data_fim, especialidade, medicos)
+            if resultado is None:
+                estado = reconstruir(conn, data_inicio, data_fim, especialidade, versao)
+                with _lock:
+                    _estados[chave] = estado
+                    while len(_estados) > FILTROS_MAX:
+                        _estados.popitem(last=False)
+                dados.detalhe = "agregados reconstruídos"
+            else:
+                dados.detalhe = f"+{resultado[0]} consulta(s), -{resultado[1]} cancelamento(s) desde a última atualização"
+            with estado.lock:
+                _montar(conn, estado, data_inicio, data_fim, especialidade, medicos, dados)
+        with medicao.secao("dashboard:evolucao"):
+            dados.evolucao = ler(conn, *dashboard.sql_evolucao(data_inicio, data_fim, especialidade, agrupamento))
+    except dashboard.ERROS_SECAO as e:
+        for nome in ("kpis", "rank_medicos", "rank_pacientes", "especialidades", "evolucao", "ociosos"):
+            if getattr(dados, nome) is None:
+                dados.erros[nome] = str(e)
+    dados.segundos = time.perf_counter() - inicio
+    return dados
@@ -0,0 +1,285 @@
+"""API HTTP (somente leitura) com os agregados do Dashboard.
+
+Serve as mesmas seções que a página Dashboard do app (dashboard.py:
+kpis, rank_medicos, rank_pacientes, especialidades, evolucao e ociosos) para
+outros sistemas, sem passar pelo Streamlit. Roda em asyncio (aiohttp) com
+um pool de conexões aiomysql.
+
+    GET /dashboard/{secao}?inicio=2024-01-01&fim=2024-12-31&especialidade=Cardiologia&agrupamento=Mês
+    GET /dashboard?...          todas as seções em um objeto JSON
+    GET /versao                 carimbo de versão dos dados
+    GET /saude
+
+As respostas vêm em JSON (padrão) ou Arrow IPC (stream), com
+?formato=arrow ou Accept: application/vnd.apache.arrow.stream.
+
+Cada resposta leva um ETag calculado a partir do carimbo de versão dos dados
+(maior IdConsulta, maior IdLog e a soma das versões de Controle_Versao) e
+da própria requisição. Com If-None-Match igual, a resposta é 304 sem
+executar a consulta da seção; o carimbo é relido no máximo a cada
+API_VERSAO_TTL segundos. Respostas já montadas ficam em memória pelo ETag.
+
+Dependências opcionais (só para a API): pip install -r requirements-api.txt
+    python api.py --porta 8080
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+
+import aiomysql
+import pyarrow as pa
+import pymysql
+from aiohttp import web
+
+import dashboard
+from banco import DASHBOARD_TIMEOUT, DB_HOST, DB_NAME, DB_PASSWORD, DB_POOL_SIZE, DB_USER, tabela_arrow
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+API_PORTA = int(os.environ.get("API_PORTA", "8080"))
+API_POOL_SIZE = int(os.environ.get("API_POOL_SIZE", str(DB_POOL_SIZE)))
+API_VERSAO_TTL = float(os.environ.get("API_VERSAO_TTL", "1"))       # segundos entre leituras do carimbo
+API_CACHE_MAX = int(os.environ.get("API_CACHE_MAX", "256"))          # respostas guardadas por ETag
+
+TIPO_JSON = "application/json"
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+INICIO_PADRAO = datetime.date(2015, 1, 1)   # mesmo período inicial do app
+FIM_PADRAO = datetime.date(2036, 12, 29)
+SECOES = list(dashboard.consultas_dashboard(INICIO_PADRAO, FIM_PADRAO))
+
+# Carimbo de versão: consultas novas e canceladas mudam as marcas de ID;
+# UPDATE em Consulta, remoções do log e alterações de médicos, pacientes e
+# clínicas incrementam Controle_Versao (gatilhos de script_banco.sql)
+SQL_VERSAO = """
+SELECT (SELECT COALESCE(MAX(IdConsulta), 0) FROM Consulta) AS consulta,
+       (SELECT COALESCE(MAX(IdLog), 0) FROM Log_Cancelamento) AS log,
+       (SELECT CAST(COALESCE(SUM(Versao), 0) AS SIGNED) FROM Controle_Versao) AS versoes
+"""
+
+ERROS_BANCO = (pymysql.err.MySQLError,)
+
+
+def para_pymysql(sql):
+    # O PyMySQL formata o comando com "%": os literais (DATE_FORMAT(d, '%Y-%m'))
+    # precisam virar "%%"; o mysql.connector do app só substitui os %s
+    return sql.replace("%", "%%").replace("%%s", "%s")
+
+
+def ler_filtros(query):
+    """(data_inicio, data_fim, especialidade, agrupamento) da query string; ValueError se inválidos."""
+    try:
+        inicio = datetime.date.fromisoformat(query.get("inicio", INICIO_PADRAO.isoformat()))
+        fim = datetime.date.fromisoformat(query.get("fim", FIM_PADRAO.isoformat()))
+    except ValueError:
+        raise ValueError("inicio e fim devem estar no formato AAAA-MM-DD")
+    if fim < inicio:
+        raise ValueError("fim anterior a inicio")
+    agrupamento = query.get("agrupamento", "Dia")
+    if agrupamento not in dashboard.AGRUPAMENTOS:
+        raise ValueError(f"agrupamento deve ser um de: {', '.join(dashboard.AGRUPAMENTOS)}")
+    return inicio, fim, query.get("especialidade", "Todas"), agrupamento
+
+
+def ler_formato(request):
+    formato = request.query.get("formato")
+    if formato is None:
+        formato = "arrow" if TIPO_ARROW in request.headers.get("Accept", "") else "json"
+    if formato not in ("json", "arrow"):
+        raise ValueError("formato deve ser json ou arrow")
+    return formato
+
+
+def etiqueta(versao, *partes):
+    # ETag forte: mesma versão dos dados e mesma requisição -> mesmo corpo
+    chave = json.dumps([versao, *partes], default=str, ensure_ascii=False)
+    return '"' + hashlib.sha1(chave.encode()).hexdigest()[:20] + '"'
+
+
+def etag_confere(request, etag):
+    cabecalho = request.headers.get("If-None-Match", "")
+    candidatos = {valor.strip().removeprefix("W/") for valor in cabecalho.split(",")}
+    return etag in candidatos or "*" in candidatos
+
+
+def _json_padrao(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    if isinstance(valor, datetime.timedelta):
+        return valor.total_seconds()
+    return str(valor)
+
+
+def corpo_json(dados):
+    return json.dumps(dados, default=_json_padrao, ensure_ascii=False).encode()
+
+
+def corpo_arrow(tabela):
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return sink.getvalue()
+
+
+class ServicoDashboard:
+    """Pool aiomysql, carimbo de versão e respostas guardadas por ETag."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._versao = None
+        self._versao_em = 0.0
+        self._versao_lock = asyncio.Lock()
+        self._respostas = OrderedDict()   # ETag -> (tipo, corpo)
+        self._em_andamento = {}           # ETag -> Future: requisições iguais esperam a mesma consulta
+
+    async def consultar(self, sql, params):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await asyncio.wait_for(cursor.execute(para_pymysql(sql), params), DASHBOARD_TIMEOUT)
+                except asyncio.TimeoutError:
+                    conn.close()  # ainda esperando a resposta do servidor: não volta ao pool
+                    raise
+                linhas = await cursor.fetchall()
+                return tabela_arrow(cursor.description, linhas)
+
+    async def versao(self):
+        # Uma leitura do carimbo por API_VERSAO_TTL, compartilhada pelas requisições
+        async with self._versao_lock:
+            if self._versao is None or time.monotonic() - self._versao_em > API_VERSAO_TTL:
+                linha = (await self.consultar(SQL_VERSAO, ())).to_pylist()[0]
+                self._versao = f"{linha['consulta']}.{linha['log']}.{linha['versoes']}"
+                self._versao_em = time.monotonic()
+            return self._versao
+
+    async def resposta(self, etag, montar):
+        """(tipo, corpo) da resposta com este ETag; montar() só roda se ainda não houver."""
+        if etag in self._respostas:
+            self._respostas.move_to_end(etag)
+            return self._respostas[etag]
+        if etag in self._em_andamento:
+            return await asyncio.shield(self._em_andamento[etag])
+        futuro = asyncio.get_running_loop().create_future()
+        self._em_andamento[etag] = futuro
+        try:
+            resultado = await montar()
+            futuro.set_result(resultado)
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()  # marcada como lida mesmo se ninguém mais esperava
+            raise
+        finally:
+            del self._em_andamento[etag]
+        self._respostas[etag] = resultado
+        if len(self._respostas) > API_CACHE_MAX:
+            self._respostas.popitem(last=False)
+        return resultado
+
+
+SERVICO = web.AppKey("servico", ServicoDashboard)
+
+
+async def _responder(request, partes, montar):
+    servico = request.app[SERVICO]
+    try:
+        etag = etiqueta(await servico.versao(), *partes)
+        if etag_confere(request, etag):
+            return web.Response(status=304, headers={"ETag": etag})
+        tipo, corpo = await servico.resposta(etag, montar)
+    except asyncio.TimeoutError:
+        return web.json_response({"erro": f"tempo esgotado ({DASHBOARD_TIMEOUT:g}s)"}, status=504)
+    except ERROS_BANCO as e:
+        return web.json_response({"erro": str(e)}, status=503)
+    return web.Response(body=corpo, content_type=tipo, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+async def rota_secao(request):
+    nome = request.match_info["secao"]
+    if nome not in SECOES:
+        return web.json_response({"erro": f"seção desconhecida; use uma de: {', '.join(SECOES)}"}, status=404)
+    try:
+        filtros, formato = ler_filtros(request.query), ler_formato(request)
+    except ValueError as e:
+        return web.json_response({"erro": str(e)}, status=400)
+    servico = request.app[SERVICO]
+
+    async def montar():
+        sql, params = dashboard.consultas_dashboard(*filtros)[nome]
+        tabela = await servico.consultar(sql, params)
+        if formato == "arrow":
+            return TIPO_ARROW, corpo_arrow(tabela)
+        return TIPO_JSON, corpo_json(tabela.to_pylist())
+
+    return await _responder(request, (nome, filtros, formato), montar)
+
+
+async def rota_dashboard(request):
+    try:
+        filtros = ler_filtros(request.query)
+    except ValueError as e:
+        return web.json_response({"erro": str(e)}, status=400)
+    servico = request.app[SERVICO]
+
+    async def montar():
+        comandos = dashboard.consultas_dashboard(*filtros)
+        # Seções em paralelo, uma conexão do pool cada (como dashboard.carregar)
+        tabelas = await asyncio.gather(*(servico.consultar(sql, params) for sql, params in comandos.values()))
+        return TIPO_JSON, corpo_json({nome: tabela.to_pylist() for nome, tabela in zip(comandos, tabelas)})
+
+    return await _responder(request, ("todas", filtros), montar)
+
+
+async def rota_versao(request):
+    try:
+        versao = await request.app[SERVICO].versao()
+    except ERROS_BANCO as e:
+        return web.json_response({"erro": str(e)}, status=503)
+    return web.json_response({"versao": versao})
+
+
+async def rota_saude(request):
+    return web.json_response({"ok": True})
+
+
+def criar_app(usuario=DB_USER, senha=DB_PASSWORD, host=DB_HOST, database=DB_NAME, tamanho_pool=API_POOL_SIZE):
+    app = web.Application()
+
+    async def abrir_pool(app):
+        # O servidor interrompe o SELECT que passar do prazo (erro 3024), como no app
+        pool = await aiomysql.create_pool(host=host, user=usuario, password=senha, db=database,
+                                          minsize=1, maxsize=tamanho_pool, autocommit=True,
+                                          init_command=f"SET SESSION MAX_EXECUTION_TIME = {int(DASHBOARD_TIMEOUT * 1000)}")
+        app[SERVICO] = ServicoDashboard(pool)
+
+    async def fechar_pool(app):
+        pool = app[SERVICO].pool
+        pool.close()
+        await pool.wait_closed()
+
+    app.on_startup.append(abrir_pool)
+    app.on_cleanup.append(fechar_pool)
+    app.router.add_get("/dashboard", rota_dashboard)
+    app.router.add_get("/dashboard/{secao}", rota_secao)
+    app.router.add_get("/versao", rota_versao)
+    app.router.add_get("/saude", rota_saude)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP com os agregados do Dashboard.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=API_PORTA)
+    parser.add_argument("--pool", type=int, default=API_POOL_SIZE, help="conexões no pool aiomysql")
+    args = parser.parse_args(argv)
+    web.run_app(criar_app(tamanho_pool=args.pool), host=args.host, port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
+import datetime
+import threading
+import time
+
 import streamlit as st
 import mysql.connector
 import pandas as pd
 import plotly.express as px
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import agenda
+import agregados
+import auditoria
+import busca
+import cadastros
+import cancelamento
+import consultas
+import dashboard
+import importacao
+import medicao
+import ocupacao
+import referencia
+import snapshot
+from banco import CACHE_MAX_ENTRIES, CACHE_TTL, DASHBOARD_INCREMENTAL, DASHBOARD_PARALELO, DB_HOST, DB_NAME, PoolConexoes, executar, ler_sql, normalizar_sql, versao_dados
 
 # --- 1. CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Sistema Médico", layout="wide")
@@ -13,17 +33,129 @@ db_password = st.sidebar.text_input("Senha (MySQL)", type="password") # Deixe em
 st.sidebar.info("Digite sua senha do MySQL acima e pressione Enter.")
 
 # --- 2. FUNÇÃO DE CONEXÃO ---
+# Um pool por processo para cada credencial; as reexecuções do Streamlit
+# reaproveitam conexões já abertas em vez de refazer o handshake TCP+login.
+@st.cache_resource(show_spinner=False)
+def get_pool(usuario, senha, host, database):
+    return PoolConexoes(usuario, senha, host=host, database=database)
+
 def get_connection():
+    # conn.close() devolve a conexão ao pool
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user=db_user,
-            password=db_password,
-            database="ConsultasMedicas"
-        )
-        return conn
+        conn = get_pool(db_user, db_password, DB_HOST, DB_NAME).obter()
     except mysql.connector.Error as err:
         return None
+    st.session_state.setdefault("conexoes_rodada", []).append(conn)
+    return conn
+
+# Uma reexecução que parou no meio da página (exceção ou interrompida por
+# outra interação) não chegou ao conn.close(): devolve essas conexões agora,
+# senão o pool se esgota e todas as sessões caem em "Desconectado"
+for conn_pendente in st.session_state.pop("conexoes_rodada", []):
+    if not conn_pendente.devolvida:
+        try:
+            conn_pendente.close()
+        except mysql.connector.Error:
+            pass
+
+# --- CACHE DE CONSULTAS ---
+# Resultados memorizados por (SQL normalizado, parâmetros, versão dos dados),
+# com validade (CACHE_TTL) e limite de entradas (CACHE_MAX_ENTRIES). versao
+# muda a cada escrita deste processo: o que foi gravado aparece na hora.
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _consulta_em_cache(sql, params, usuario, versao, _conn, _no_banco=None):
+    # Argumentos com "_" não entram na chave do cache
+    if _no_banco is not None:
+        _no_banco.append(True)
+    return ler_sql(_conn, sql, params)
+
+def ler_sql_cache(conn, sql, params=()):
+    # A conexão só é usada quando o resultado não está em cache
+    no_banco = []
+    inicio = time.perf_counter()
+    df = _consulta_em_cache(normalizar_sql(sql), tuple(params), db_user, versao_dados(), conn, no_banco)
+    if not no_banco:
+        # Nada foi ao banco: registra o acerto de cache no painel de desempenho
+        medicao.registrar(sql, params, inicio, time.perf_counter(), len(df), 0, origem="cache")
+    return df
+
+# Ocupação das agendas (ocupacao.py): os pares do período são lidos e
+# reduzidos a tabelas pequenas; só o resultado fica em cache. versao muda a
+# cada escrita deste processo.
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _ocupacao_em_cache(data_inicio, data_fim, especialidade, por_clinica, usuario, versao, _conn):
+    clinicas = referencia.obter(_conn, "clinicas") if por_clinica else None
+    return ocupacao.carregar(_conn, referencia.obter(_conn, "medicos"), data_inicio, data_fim, especialidade, clinicas)
+
+# Resultados das abas de Gerenciar Cadastros, guardados na sessão enquanto
+# nenhuma escrita acontecer (versao_dados muda a cada INSERT/UPDATE/DELETE)
+CACHE_ABAS_MAX = 32
+
+def ler_sql_aba(conn, sql, params=()):
+    versao = versao_dados()
+    cache = st.session_state.setdefault("cache_abas", {})
+    for chave_velha in [k for k, (v, _) in cache.items() if v != versao]:
+        del cache[chave_velha]
+    chave = (normalizar_sql(sql), tuple(params))
+    if chave in cache:
+        inicio = time.perf_counter()
+        df = cache[chave][1]
+        medicao.registrar(sql, params, inicio, time.perf_counter(), len(df), 0, origem="cache")
+        return df
+    df = ler_sql(conn, sql, params)
+    cache[chave] = (versao, df)
+    if len(cache) > CACHE_ABAS_MAX:
+        del cache[next(iter(cache))]  # descarta o mais antigo
+    return df
+
+# Tabela paginada por chave (keyset), como o log da Auditoria: cada página
+# traz tamanho + 1 linhas (a última só indica se há próxima página) e só é
+# consultada quando a tabela é aberta. montar_sql(apos, limite) devolve
+# (sql, params); chave_linha(última linha) dá o "apos" da página seguinte.
+AGENDA_PAGINA = 25
+
+def tabela_paginada(conn, chave, montar_sql, chave_linha, tamanho=AGENDA_PAGINA):
+    estado = st.session_state.setdefault(chave, {"apos": None, "pilha": [], "ultimo": None})
+
+    def seguinte():
+        estado["pilha"].append(estado["apos"])
+        estado["apos"] = estado["ultimo"]
+
+    def anterior():
+        estado["apos"] = estado["pilha"].pop()
+
+    df = ler_sql_aba(conn, *montar_sql(estado["apos"], tamanho + 1))
+    tem_proxima = len(df) > tamanho
+    df = df.head(tamanho)
+    if df.empty:
+        return df
+    estado["ultimo"] = chave_linha(df.iloc[-1])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    col_ant, col_prox, col_pag = st.columns([1, 1, 3])
+    col_ant.button("⬅️ Anterior", on_click=anterior, disabled=not estado["pilha"], key=f"{chave}_ant")
+    col_prox.button("Próxima ➡️", on_click=seguinte, disabled=not tem_proxima, key=f"{chave}_prox")
+    col_pag.caption(f"Página {len(estado['pilha']) + 1}")
+    return df
+
+# Dica das caixas de busca de paciente (regras em busca.condicao_busca)
+AJUDA_BUSCA_PACIENTE = ("Palavras do nome em qualquer ordem; cada palavra casa com o início de uma palavra "
+                        "do nome. Números buscam pelo início do CPF, com ou sem pontuação.")
+
+# Seletor de paciente com busca: o campo de texto fica fora do st.form (dentro
+# dele não haveria reexecução ao digitar) e só os 20 primeiros pacientes cujo
+# CPF ou nome começa com o termo são consultados. O Streamlit só reexecuta ao
+# pressionar Enter ou sair do campo, o que já espaça as consultas; termos
+# curtos não vão ao banco e os resultados recentes ficam em cache (busca.py).
+def seletor_paciente(conn, chave, rotulo="👤 Paciente", termo_inicial=""):
+    termo = st.text_input(f"{rotulo}: digite o CPF ou o início do nome", value=termo_inicial, key=f"{chave}_termo")
+    if len(termo.strip()) < busca.SUGESTAO_MIN:
+        st.caption(f"Digite ao menos {busca.SUGESTAO_MIN} caracteres para buscar.")
+        return None
+    sugestoes = dict(busca.sugerir_pacientes(conn, termo))
+    if not sugestoes:
+        st.caption("Nenhum paciente encontrado.")
+        return None
+    return st.selectbox(rotulo, list(sugestoes), format_func=sugestoes.get, key=f"{chave}_cpf")
 
 # --- VERIFICAÇÃO INICIAL DE CONEXÃO ---
 # Testamos a conexão antes de carregar qualquer página
@@ -41,11 +173,13 @@ if conn_test is None:
     st.stop() # PARA O CÓDIGO AQUI para não dar erro lá embaixo
 else:
     st.sidebar.success("✅ Conectado!")
-    conn_test.close()
+    conn_test.close() # Devolve ao pool para a página reutilizar
 
 # --- 3. MENU DE NAVEGAÇÃO ---
 st.sidebar.divider()
 pagina = st.sidebar.radio("Navegação", ["Dashboard ", "Gerenciar Consultas (CRUD)", "Gerenciar Cadastros", "Auditoria (Trigger)"])
+# Registros de desempenho desta reexecução (painel no fim da barra lateral)
+medicao.iniciar_rodada(pagina.strip())
 
 # ==============================================================================
 # PÁGINA 1: DASHBOARD
@@ -66,38 +200,69 @@ if pagina == "Dashboard ":
         data_fim = col_data2.date_input("Data Fim", value=pd.to_datetime("2036-12-29"))
         
         # Filtro de especialidade
-        query_especialidades = "SELECT DISTINCT Especialidade FROM Medico ORDER BY Especialidade"
-        df_especialidades = pd.read_sql(query_especialidades, conn)
-        especialidades_list = ["Todas"] + df_especialidades['Especialidade'].tolist()
+        especialidades_list = ["Todas"] + referencia.especialidades(conn)
         filtro_especialidade = st.sidebar.selectbox("Especialidade", especialidades_list)
+        consultas_paralelas = st.sidebar.toggle("Consultas em paralelo", value=DASHBOARD_PARALELO,
+                                                help="Desligue para executar as consultas uma após a outra")
+        atualizacao_incremental = st.sidebar.toggle("Atualização incremental", value=DASHBOARD_INCREMENTAL,
+                                                    help="Mantém as contagens em memória e lê só as consultas "
+                                                         "e os cancelamentos novos desde a última atualização")
+        analises_snapshot = st.sidebar.toggle("Análises do snapshot (Parquet)", value=False,
+                                              help="Lê os arquivos exportados por snapshot.py em vez do MySQL")
+        if analises_snapshot and st.sidebar.button("🔄 Atualizar snapshot"):
+            # Exporta só os meses que mudaram desde a última exportação
+            with st.spinner("Exportando os meses alterados..."):
+                resumo_snapshot = snapshot.atualizar(conn)
+            st.sidebar.success(f"{len(resumo_snapshot.meses_exportados)} mês(es) exportado(s) em {resumo_snapshot.segundos:.1f}s")
         
-        # Construir filtro SQL
-        filtro_where = f"WHERE DATE(c.Data_Hora) BETWEEN '{data_inicio}' AND '{data_fim}'"
-        if filtro_especialidade != "Todas":
-            filtro_where += f" AND m.Especialidade = '{filtro_especialidade}'"
-        
-        # KPI 1: Total de Consultas
-        query_total = f"SELECT COUNT(*) as total FROM Consulta c JOIN Medico m ON c.CodMed = m.CodMed {filtro_where}"
-        df_total = pd.read_sql(query_total, conn)
-        total_consultas = df_total['total'][0]
+        # === CARGA DOS DADOS ===
+        # As seções não dependem umas das outras: todas as consultas saem ao
+        # mesmo tempo (uma conexão do pool cada) antes de desenhar a página.
+        # O agrupamento vem do rádio da seção de evolução (key="agrupamento").
+        agrupamento = st.session_state.get("agrupamento", "Dia")
+        if analises_snapshot:
+            # Nenhuma consulta ao MySQL: só os arquivos Parquet (snapshot.py)
+            dados = snapshot.carregar(data_inicio, data_fim, filtro_especialidade, agrupamento)
+            if dados.detalhe:
+                defasagem = snapshot.idade(dados.detalhe)
+                texto_snapshot = (f"Dados do snapshot de {dados.detalhe.replace('T', ' ')} "
+                                  f"(há {defasagem.total_seconds() / 3600:.1f} h), calculados em {dados.segundos:.2f}s")
+                if defasagem > snapshot.IDADE_AVISO:
+                    st.warning(f"⚠️ {texto_snapshot}. Atualize o snapshot na barra lateral.")
+                else:
+                    st.caption(texto_snapshot)
+        elif atualizacao_incremental:
+            # Contagens em memória + só as novidades acima das marcas (agregados.py)
+            dados = agregados.carregar(conn, data_inicio, data_fim, filtro_especialidade, agrupamento, ler=ler_sql_cache)
+            st.caption(f"Dados carregados em {dados.segundos:.2f}s (incremental: {dados.detalhe})")
+        else:
+            ctx_script = get_script_run_ctx()
+            dados = dashboard.carregar(get_pool(db_user, db_password, DB_HOST, DB_NAME).obter,
+                                       data_inicio, data_fim, filtro_especialidade, agrupamento,
+                                       paralelo=consultas_paralelas, ler=ler_sql_cache,
+                                       ao_iniciar=lambda: add_script_run_ctx(threading.current_thread(), ctx_script))
+            st.caption(f"Dados carregados em {dados.segundos:.2f}s ({'em paralelo' if dados.paralelo else 'em série'})")
 
-        # KPI 2: Médicos
-        query_medicos = "SELECT COUNT(*) as total FROM Medico"
-        df_medicos = pd.read_sql(query_medicos, conn)
-        total_medicos = df_medicos['total'][0]
+        def erro_secao(secao):
+            # Seção sem dados (None): erro ou tempo esgotado na sua consulta
+            st.error(f"Não foi possível carregar esta seção: {dados.erros.get(secao)}")
         
-        # KPI 3: Pacientes únicos
-        query_pacientes = f"SELECT COUNT(DISTINCT c.CpfPaciente) as total FROM Consulta c JOIN Medico m ON c.CodMed = m.CodMed {filtro_where}"
-        df_pacientes = pd.read_sql(query_pacientes, conn)
-        total_pacientes = df_pacientes['total'][0]
-        
-        # Evitar divisão por zero
-        media = total_consultas / total_medicos if total_medicos > 0 else 0
+        # KPIs: total de consultas, médicos e pacientes únicos em uma só consulta
+        df_kpis = dados.kpis
+        if df_kpis is None:
+            erro_secao("kpis")
+        else:
+            total_consultas = int(df_kpis['total'][0])
+            total_medicos = int(df_kpis['medicos'][0])
+            total_pacientes = int(df_kpis['pacientes'][0])
+            
+            # Evitar divisão por zero
+            media = total_consultas / total_medicos if total_medicos > 0 else 0
 
-        col1, col2, col3 = st.columns(3)
-        col1.metric("📅 Total de Consultas", total_consultas)
-        col2.metric("👨‍⚕️ Total de Médicos", total_medicos)
-        col3.metric("🏥 Média Consultas/Médico", f"{media:.1f}")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("📅 Total de Consultas", total_consultas)
+            col2.metric("👨‍⚕️ Total de Médicos", total_medicos)
+            col3.metric("🏥 Média Consultas/Médico", f"{media:.1f}")
 
         st.divider()
         
@@ -106,17 +271,10 @@ if pagina == "Dashboard ":
         
         with col_rank1:
             st.subheader("🏆 Top 10 Médicos")
-            query_rank_med = f"""
-            SELECT m.NomeMed, m.Especialidade, COUNT(c.IdConsulta) as TotalConsultas
-            FROM Medico m
-            JOIN Consulta c ON m.CodMed = c.CodMed
-            {filtro_where}
-            GROUP BY m.NomeMed, m.Especialidade
-            ORDER BY TotalConsultas DESC
-            LIMIT 10
-            """
-            df_rank_med = pd.read_sql(query_rank_med, conn)
-            if not df_rank_med.empty:
+            df_rank_med = dados.rank_medicos
+            if df_rank_med is None:
+                erro_secao("rank_medicos")
+            elif not df_rank_med.empty:
                 fig_rank_med = px.bar(df_rank_med, 
                                      y='NomeMed', 
                                      x='TotalConsultas',
@@ -131,18 +289,10 @@ if pagina == "Dashboard ":
 
         with col_rank2:
             st.subheader("👥 Top 10 Pacientes")
-            query_rank_pac = f"""
-            SELECT p.NomePac, COUNT(c.IdConsulta) as TotalConsultas
-            FROM Paciente p
-            JOIN Consulta c ON p.CpfPaciente = c.CpfPaciente
-            JOIN Medico m ON c.CodMed = m.CodMed
-            {filtro_where}
-            GROUP BY p.NomePac
-            ORDER BY TotalConsultas DESC
-            LIMIT 10
-            """
-            df_rank_pac = pd.read_sql(query_rank_pac, conn)
-            if not df_rank_pac.empty:
+            df_rank_pac = dados.rank_pacientes
+            if df_rank_pac is None:
+                erro_secao("rank_pacientes")
+            elif not df_rank_pac.empty:
                 fig_rank_pac = px.bar(df_rank_pac,
                                      y='NomePac',
                                      x='TotalConsultas',
@@ -160,17 +310,11 @@ if pagina == "Dashboard ":
         # === ESPECIALIDADES COM VISUALIZAÇÃO DUPLA ===
         st.subheader("🩺 Análise de Especialidades")
         
-        query_esp = f"""
-        SELECT m.Especialidade, COUNT(c.IdConsulta) as Quantidade
-        FROM Medico m
-        JOIN Consulta c ON m.CodMed = c.CodMed
-        {filtro_where}
-        GROUP BY m.Especialidade
-        ORDER BY Quantidade DESC
-        """
-        df_esp = pd.read_sql(query_esp, conn)
+        df_esp = dados.especialidades
         
-        if not df_esp.empty:
+        if df_esp is None:
+            erro_secao("especialidades")
+        elif not df_esp.empty:
             col_esp1, col_esp2 = st.columns(2)
             
             with col_esp1:
@@ -205,38 +349,13 @@ if pagina == "Dashboard ":
         st.subheader("📈 Evolução de Atendimentos ao Longo do Tempo")
         
         # Seletor de agrupamento
-        agrupamento = st.radio("Agrupar por:", ["Dia", "Semana", "Mês"], horizontal=True)
-        
-        if agrupamento == "Dia":
-            query_tempo = f"""
-            SELECT DATE(c.Data_Hora) as Data, COUNT(*) as Consultas
-            FROM Consulta c
-            JOIN Medico m ON c.CodMed = m.CodMed
-            {filtro_where}
-            GROUP BY DATE(c.Data_Hora)
-            ORDER BY Data ASC
-            """
-        elif agrupamento == "Semana":
-            query_tempo = f"""
-            SELECT DATE_FORMAT(c.Data_Hora, '%Y-%u') as Data, COUNT(*) as Consultas
-            FROM Consulta c
-            JOIN Medico m ON c.CodMed = m.CodMed
-            {filtro_where}
-            GROUP BY DATE_FORMAT(c.Data_Hora, '%Y-%u')
-            ORDER BY Data ASC
-            """
-        else:  # Mês
-            query_tempo = f"""
-            SELECT DATE_FORMAT(c.Data_Hora, '%Y-%m') as Data, COUNT(*) as Consultas
-            FROM Consulta c
-            JOIN Medico m ON c.CodMed = m.CodMed
-            {filtro_where}
-            GROUP BY DATE_FORMAT(c.Data_Hora, '%Y-%m')
-            ORDER BY Data ASC
-            """
+        agrupamento = st.radio("Agrupar por:", ["Dia", "Semana", "Mês"], horizontal=True, key="agrupamento")
         
-        df_tempo = pd.read_sql(query_tempo, conn)
-        if not df_tempo.empty:
+        # Só a série temporal depende do rádio; as demais consultas vêm do cache
+        df_tempo = dados.evolucao
+        if df_tempo is None:
+            erro_secao("evolucao")
+        elif not df_tempo.empty:
             fig_line = px.line(df_tempo, 
                              x='Data', 
                              y='Consultas', 
@@ -261,24 +380,51 @@ if pagina == "Dashboard ":
         # === ANÁLISE DE MÉDICOS OCIOSOS ===
         st.subheader("⚠️ Alerta: Médicos Sem Consultas Agendadas")
         
-        query_ociosos = f"""
-        SELECT m.NomeMed, m.Especialidade, m.Email
-        FROM Medico m
-        LEFT JOIN (
-            SELECT DISTINCT CodMed 
-            FROM Consulta c
-            WHERE DATE(c.Data_Hora) BETWEEN '{data_inicio}' AND '{data_fim}'
-        ) c ON m.CodMed = c.CodMed
-        WHERE c.CodMed IS NULL
-        """
-        df_ociosos = pd.read_sql(query_ociosos, conn)
+        df_ociosos = dados.ociosos
         
-        if not df_ociosos.empty:
+        if df_ociosos is None:
+            erro_secao("ociosos")
+        elif not df_ociosos.empty:
             st.warning(f"⚠️ {len(df_ociosos)} médico(s) sem consultas no período selecionado")
             st.dataframe(df_ociosos, use_container_width=True)
         else:
             st.success("✅ Todos os médicos têm consultas agendadas no período!")
         
+        st.divider()
+        
+        # === OCUPAÇÃO DAS AGENDAS ===
+        st.subheader("📈 Ocupação das Agendas")
+        ocupacao_por_clinica = st.toggle("Incluir a ocupação por clínica", key="ocupacao_clinicas")
+        try:
+            ocup = _ocupacao_em_cache(data_inicio, data_fim, filtro_especialidade, ocupacao_por_clinica,
+                                      db_user, versao_dados(), conn)
+        except mysql.connector.Error as e:
+            st.error(f"Erro ao calcular a ocupação: {e}")
+            ocup = None
+        if ocup is not None and ocup.disponiveis:
+            col_oc1, col_oc2, col_oc3, col_oc4 = st.columns(4)
+            col_oc1.metric("📈 Ocupação", f"{ocup.percentual:.1f}%")
+            col_oc2.metric("✅ Horários marcados", ocup.marcadas)
+            col_oc3.metric("🗓️ Horários disponíveis", ocup.disponiveis)
+            col_oc4.metric("🌙 Fora do expediente", ocup.fora_da_grade)
+            st.caption(f"Grade de {ocupacao.SLOTS_DIA} horários por dia de atendimento (agenda.py). "
+                       f"{ocup.linhas} consultas lidas em {ocup.leitura_s:.2f}s; cálculo em {ocup.segundos * 1000:.0f} ms.")
+            
+            fig_mapa = px.imshow(ocup.mapa, text_auto=".0f", aspect="auto", color_continuous_scale="YlOrRd",
+                                 labels={'x': 'Horário', 'y': 'Dia da semana', 'color': 'Ocupação (%)'},
+                                 title="Ocupação por Dia da Semana e Horário (%)")
+            st.plotly_chart(fig_mapa, use_container_width=True)
+            
+            fig_semanas = px.line(ocup.semanas, x='Semana', y='Ocupação (%)', title="Ocupação por Semana")
+            st.plotly_chart(fig_semanas, use_container_width=True)
+            
+            st.dataframe(ocup.medicos, use_container_width=True, hide_index=True)
+            if ocup.clinicas is not None:
+                st.caption("Capacidade da clínica: cada dia em que um médico atendeu nela conta como um dia inteiro da grade.")
+                st.dataframe(ocup.clinicas, use_container_width=True, hide_index=True)
+        elif ocup is not None:
+            st.info("Nenhum horário de atendimento no período selecionado")
+        
         conn.close()
 
 # ==============================================================================
@@ -292,56 +438,74 @@ elif pagina == "Gerenciar Consultas (CRUD)":
 
         # BUSCA RÁPIDA
         st.subheader("Busca Rápida de Consultas")
-        busca_paciente = st.text_input("Buscar por nome do paciente")
+        busca_paciente = st.text_input("Buscar por nome do paciente", help=AJUDA_BUSCA_PACIENTE)
         busca_medico = st.text_input("Buscar por nome do médico")
         busca_clinica = st.text_input("Buscar por nome da clínica")
         filtro_sql = []
         if busca_paciente:
-            filtro_sql.append(f"p.NomePac LIKE '%{busca_paciente}%'")
+            filtro_sql.append(busca.filtro_busca("paciente", busca_paciente, "c.CpfPaciente"))
         if busca_medico:
-            filtro_sql.append(f"m.NomeMed LIKE '%{busca_medico}%'")
+            filtro_sql.append(busca.filtro_busca("medico", busca_medico, "c.CodMed"))
         if busca_clinica:
-            filtro_sql.append(f"cl.NomeCli LIKE '%{busca_clinica}%'")
-        where_sql = ' AND '.join(filtro_sql)
-        if where_sql:
-            where_sql = 'WHERE ' + where_sql
-        # VIEW
-        query_view = f"""
-        SELECT c.IdConsulta, cl.NomeCli, m.NomeMed, p.NomePac, c.Data_Hora
-        FROM Consulta c
-        JOIN Clinica cl ON c.CodCli = cl.CodCli
-        JOIN Medico m ON c.CodMed = m.CodMed
-        JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
-        {where_sql}
-        ORDER BY c.IdConsulta ASC
-        """
-        df_view = pd.read_sql(query_view, conn)
+            filtro_sql.append(busca.filtro_busca("clinica", busca_clinica, "c.CodCli"))
+
+        # VIEW (paginada por IdConsulta)
+        tamanho_pagina = st.selectbox("Consultas por página", [25, 50, 100, 200], index=1)
+        # Volta para a primeira página quando a busca ou o tamanho mudam
+        assinatura_pag = (busca_paciente, busca_medico, busca_clinica, tamanho_pagina)
+        if st.session_state.get("pag_assinatura") != assinatura_pag:
+            st.session_state.pag_assinatura = assinatura_pag
+            st.session_state.pag_apos = 0      # mostra IdConsulta > pag_apos
+            st.session_state.pag_pilha = []    # pag_apos das páginas anteriores
+            st.session_state.pag_ultimo_id = 0
+
+        def pagina_seguinte():
+            st.session_state.pag_pilha.append(st.session_state.pag_apos)
+            st.session_state.pag_apos = st.session_state.pag_ultimo_id
+
+        def pagina_anterior():
+            st.session_state.pag_apos = st.session_state.pag_pilha.pop()
+
+        # Busca uma linha a mais só para saber se existe próxima página
+        query_view, params_view = consultas.sql_listar_consultas(filtro_sql, st.session_state.pag_apos, tamanho_pagina + 1)
+        df_view = ler_sql(conn, query_view, params_view)
+        tem_proxima = len(df_view) > tamanho_pagina
+        df_view = df_view.head(tamanho_pagina)
+        if not df_view.empty:
+            st.session_state.pag_ultimo_id = int(df_view['IdConsulta'].iloc[-1])
         st.dataframe(df_view)
 
+        df_total_aprox = ler_sql(conn, *consultas.sql_total_aproximado("Consulta"))
+        total_aprox = int(df_total_aprox['total'][0] or 0) if not df_total_aprox.empty else 0
+        col_pag1, col_pag2, col_pag3 = st.columns([1, 1, 3])
+        col_pag1.button("⬅️ Anterior", on_click=pagina_anterior, disabled=not st.session_state.pag_pilha)
+        col_pag2.button("Próxima ➡️", on_click=pagina_seguinte, disabled=not tem_proxima)
+        col_pag3.caption(f"Página {len(st.session_state.pag_pilha) + 1} · ≈ {total_aprox} consultas no total (estimativa do MySQL)")
+
         st.divider()
 
         # INSERT
         st.subheader("Nova Consulta")
-        medicos = pd.read_sql("SELECT CodMed, NomeMed FROM Medico", conn)
-        pacientes = pd.read_sql("SELECT CpfPaciente, NomePac FROM Paciente", conn)
-        clinicas = pd.read_sql("SELECT CodCli, NomeCli FROM Clinica", conn)
+        # Listas em memória (referencia.py), relidas só quando a tabela muda
+        medicos = referencia.obter(conn, "medicos")
+        clinicas = referencia.obter(conn, "clinicas")
+        cpf_pac = seletor_paciente(conn, "nova_consulta")
 
         with st.form("form_add"):
-            if not medicos.empty and not pacientes.empty and not clinicas.empty:
-                med_selecionado = st.selectbox("Médico", medicos['CodMed'] + " - " + medicos['NomeMed'])
-                pac_selecionado = st.selectbox("Paciente", pacientes['CpfPaciente'] + " - " + pacientes['NomePac'])
-                cli_selecionado = st.selectbox("Clínica", clinicas['CodCli'] + " - " + clinicas['NomeCli'])
+            if medicos and cpf_pac and clinicas:
+                med_selecionado = st.selectbox("Médico", medicos.rotulos)
+                cli_selecionado = st.selectbox("Clínica", clinicas.rotulos)
                 import datetime
-                data_consulta = st.date_input("Data da Consulta", datetime.date.today())
-                hora_consulta = st.time_input("Hora da Consulta", datetime.datetime.now().time())
+                sugerido = agenda.proximo_horario()  # padrão estável entre reexecuções
+                data_consulta = st.date_input("Data da Consulta", sugerido.date(), key="nova_consulta_data")
+                hora_consulta = st.time_input("Hora da Consulta", sugerido.time(), key="nova_consulta_hora")
                 data_hora = datetime.datetime.combine(data_consulta, hora_consulta).strftime("%Y-%m-%d %H:%M:%S")
                 submit_nova = st.form_submit_button("Agendar Consulta")
                 if submit_nova:
                     try:
                         cod_med = med_selecionado.split(" - ")[0]
-                        cpf_pac = pac_selecionado.split(" - ")[0]
                         cod_cli = cli_selecionado.split(" - ")[0]
-                        cursor.execute("INSERT INTO Consulta (CodCli, CodMed, CpfPaciente, Data_Hora) VALUES (%s, %s, %s, %s)", 
+                        executar(cursor, "INSERT INTO Consulta (CodCli, CodMed, CpfPaciente, Data_Hora) VALUES (%s, %s, %s, %s)", 
                                     (cod_cli, cod_med, cpf_pac, data_hora))
                         conn.commit()
                         st.info(f"Linhas afetadas: {cursor.rowcount}")
@@ -350,11 +514,65 @@ elif pagina == "Gerenciar Consultas (CRUD)":
                         else:
                             st.error("Nenhuma linha foi inserida. Verifique os dados e permissões do banco.")
                     except mysql.connector.Error as e:
-                        st.error(f"Erro ao inserir: {e}")
+                        if agenda.horario_ocupado(e):
+                            # Índice único (CodMed, Data_Hora): outro agendamento chegou antes
+                            st.error(f"Horário já ocupado: o médico já tem uma consulta em {data_hora}.")
+                            livres_dia = agenda.buscar_horarios_livres(conn, cod_med, data_consulta, data_consulta)
+                            if livres_dia:
+                                st.info("Horários livres neste dia: " + ", ".join(h.strftime("%H:%M") for h in livres_dia))
+                        else:
+                            st.error(f"Erro ao inserir: {e}")
             else:
-                st.warning("Faltam dados de Médicos, Pacientes ou Clínicas no banco.")
+                st.warning("Busque e selecione o paciente acima (e confira se há médicos e clínicas cadastrados).")
                 st.form_submit_button("Agendar (Bloqueado)")
 
+        # HORÁRIOS LIVRES (uma consulta por faixa no índice do médico + varredura em memória)
+        with st.expander("🕒 Horários livres de um médico"):
+            if medicos:
+                col_livre1, col_livre2 = st.columns(2)
+                med_livre = col_livre1.selectbox("Médico", medicos.rotulos, key="livres_medico")
+                periodo_livre = col_livre2.date_input("Período", value=(datetime.date.today(), datetime.date.today() + datetime.timedelta(days=6)),
+                                                      key="livres_periodo")
+                if len(periodo_livre) == 2 and st.button("Buscar horários livres"):
+                    livres = agenda.buscar_horarios_livres(conn, med_livre.split(" - ")[0], *periodo_livre)
+                    if livres:
+                        df_livres = pd.DataFrame({"Dia": [h.date() for h in livres], "Hora": [h.strftime("%H:%M") for h in livres]})
+                        st.dataframe(df_livres.groupby("Dia")["Hora"].agg(", ".join).reset_index(name="Horários livres"),
+                                     use_container_width=True, hide_index=True)
+                        st.caption(f"{len(livres)} horários de {agenda.DURACAO_CONSULTA.seconds // 60} min entre "
+                                   f"{agenda.INICIO_EXPEDIENTE:%H:%M} e {agenda.FIM_EXPEDIENTE:%H:%M}")
+                    else:
+                        st.info("Nenhum horário livre no período.")
+
+        # IMPORTAÇÃO EM MASSA
+        st.divider()
+        st.subheader("Importar Consultas em Massa")
+        st.caption("Arquivo CSV ou Parquet com as colunas CodCli, CodMed, CpfPaciente e Data_Hora. "
+                   "Também disponível pela linha de comando: `python importacao.py arquivo.csv`")
+        arquivo_import = st.file_uploader("Arquivo de consultas", type=["csv", "parquet"])
+        if arquivo_import is not None and st.button("Importar Consultas"):
+            barra = st.progress(0.0, text="Importando...")
+            total_bytes = max(arquivo_import.size, 1)
+            try:
+                resultado = importacao.importar(
+                    conn, arquivo_import, arquivo_import.name,
+                    progresso=lambda r: barra.progress(min(arquivo_import.tell() / total_bytes, 1.0),
+                                                       text=f"{r.lidas} linhas lidas, {r.inseridas} inseridas"))
+            except (mysql.connector.Error, ValueError) as e:
+                st.error(f"Erro ao importar: {e}")
+            else:
+                barra.progress(1.0, text="Importação concluída")
+                relatorio = resultado.relatorio()
+                col_imp1, col_imp2, col_imp3, col_imp4 = st.columns(4)
+                col_imp1.metric("📄 Linhas lidas", resultado.lidas)
+                col_imp2.metric("✅ Inseridas", resultado.inseridas)
+                col_imp3.metric("❌ Rejeitadas", len(relatorio))
+                col_imp4.metric("⚡ Linhas/s", f"{resultado.linhas_por_segundo:.0f}")
+                if not relatorio.empty:
+                    st.dataframe(relatorio.head(100), use_container_width=True, hide_index=True)
+                    st.download_button("⬇️ Baixar relatório de rejeitadas", relatorio.to_csv(index=False).encode("utf-8"),
+                                       file_name="consultas_rejeitadas.csv", mime="text/csv")
+
         st.divider()
         st.subheader("Cadastrar Novo Paciente")
         with st.form("form_add_paciente"):
@@ -373,7 +591,7 @@ elif pagina == "Gerenciar Consultas (CRUD)":
                 st.error("Nome do paciente é obrigatório!")
             else:
                 try:
-                    cursor.execute("INSERT INTO Paciente (CpfPaciente, NomePac, DataNascimento, Genero) VALUES (%s, %s, %s, %s)",
+                    executar(cursor, "INSERT INTO Paciente (CpfPaciente, NomePac, DataNascimento, Genero) VALUES (%s, %s, %s, %s)",
                                    (cpf_limpo, nome_paciente, data_nasc.strftime("%Y-%m-%d"), sexo))
                     conn.commit()
                     st.success("Paciente cadastrado com sucesso!")
@@ -385,7 +603,7 @@ elif pagina == "Gerenciar Consultas (CRUD)":
         cpf_remover = st.text_input("CPF do Paciente para Remover")
         if st.button("Remover Paciente"):
             try:
-                cursor.execute("DELETE FROM Paciente WHERE CpfPaciente = %s", (cpf_remover,))
+                executar(cursor, "DELETE FROM Paciente WHERE CpfPaciente = %s", (cpf_remover,))
                 conn.commit()
                 if cursor.rowcount > 0:
                     st.success(f"Paciente {cpf_remover} removido com sucesso!")
@@ -396,14 +614,14 @@ elif pagina == "Gerenciar Consultas (CRUD)":
 
         st.divider()
         st.subheader("Lista de Pacientes")
-        df_pacientes = pd.read_sql("SELECT CpfPaciente, NomePac, DataNascimento, Genero FROM Paciente ORDER BY NomePac ASC", conn)
+        df_pacientes = ler_sql(conn, *consultas.sql_lista_pacientes())
         st.dataframe(df_pacientes, use_container_width=True)
 
         st.divider()
         st.subheader("Editar Paciente")
         cpf_editar = st.text_input("CPF do Paciente para Editar")
         if cpf_editar:
-            paciente_editar = pd.read_sql(f"SELECT * FROM Paciente WHERE CpfPaciente = '{cpf_editar}'", conn)
+            paciente_editar = ler_sql(conn, *consultas.sql_paciente(cpf_editar))
             if not paciente_editar.empty:
                 nome_novo = st.text_input("Novo Nome", paciente_editar['NomePac'][0])
                 data_nasc_novo = st.date_input("Nova Data de Nascimento", paciente_editar['DataNascimento'][0])
@@ -412,7 +630,7 @@ elif pagina == "Gerenciar Consultas (CRUD)":
                 email_novo = st.text_input("Novo Email", paciente_editar['Email'][0] if 'Email' in paciente_editar else "")
                 if st.button("Salvar Alterações"):
                     try:
-                        cursor.execute("UPDATE Paciente SET NomePac=%s, DataNascimento=%s, Genero=%s, Telefone=%s, Email=%s WHERE CpfPaciente=%s",
+                        executar(cursor, "UPDATE Paciente SET NomePac=%s, DataNascimento=%s, Genero=%s, Telefone=%s, Email=%s WHERE CpfPaciente=%s",
                                        (nome_novo, data_nasc_novo.strftime("%Y-%m-%d"), genero_novo, telefone_novo, email_novo, cpf_editar))
                         conn.commit()
                         st.success("Paciente atualizado com sucesso!")
@@ -427,7 +645,7 @@ elif pagina == "Gerenciar Consultas (CRUD)":
         id_delete = st.number_input("ID da Consulta", min_value=1, step=1)
         if st.button("Remover Consulta"):
             try:
-                cursor.execute("DELETE FROM Consulta WHERE IdConsulta = %s", (id_delete,))
+                executar(cursor, "DELETE FROM Consulta WHERE IdConsulta = %s", (id_delete,))
                 conn.commit()
                 if cursor.rowcount > 0:
                     st.warning(f"Consulta {id_delete} removida!")
@@ -436,6 +654,49 @@ elif pagina == "Gerenciar Consultas (CRUD)":
             except mysql.connector.Error as e:
                 st.error(f"Erro ao remover (Integridade): {e}")
 
+        # DELETE EM MASSA
+        st.divider()
+        st.subheader("Cancelamento em Massa")
+        modo_cancel = st.radio("Selecionar consultas por", ["Filtro", "Lista de IDs"], horizontal=True, key="modo_cancel")
+        try:
+            if modo_cancel == "Filtro":
+                col_cancel1, col_cancel2 = st.columns(2)
+                med_cancel = col_cancel1.selectbox("Médico", ["Todos"] + medicos.rotulos, key="med_cancel")
+                cli_cancel = col_cancel2.selectbox("Clínica", ["Todas"] + clinicas.rotulos, key="cli_cancel")
+                por_periodo = st.checkbox("Somente no período", key="periodo_cancel")
+                data_ini_cancel = data_fim_cancel = None
+                if por_periodo:
+                    col_cancel3, col_cancel4 = st.columns(2)
+                    data_ini_cancel = col_cancel3.date_input("De", key="ini_cancel")
+                    data_fim_cancel = col_cancel4.date_input("Até", key="fim_cancel")
+                filtro_cancel = cancelamento.filtro_cancelamento(
+                    cod_med=None if med_cancel == "Todos" else med_cancel.split(" - ")[0],
+                    cod_cli=None if cli_cancel == "Todas" else cli_cancel.split(" - ")[0],
+                    data_inicio=data_ini_cancel, data_fim=data_fim_cancel)
+            else:
+                arquivo_ids = st.file_uploader("Arquivo com os IDs das consultas (um por linha)", type=["csv", "txt"], key="ids_cancel")
+                ids_cancel = cancelamento.ids_do_texto(arquivo_ids.getvalue().decode("utf-8", errors="ignore")) if arquivo_ids else []
+                filtro_cancel = cancelamento.filtro_cancelamento(ids=ids_cancel)
+        except ValueError as e:
+            filtro_cancel = None
+            st.info(str(e))
+
+        if filtro_cancel is not None:
+            # Prévia: quantas consultas o filtro atinge
+            qtd_cancel = cancelamento.contar(conn, filtro_cancel)
+            st.warning(f"⚠️ {qtd_cancel} consulta(s) serão canceladas.")
+            motivo_cancel = st.text_input("Motivo do cancelamento", max_chars=cancelamento.MOTIVO_MAX, key="motivo_cancel")
+            confirmar_cancel = st.checkbox("Confirmo o cancelamento destas consultas", key="confirma_cancel")
+            if st.button("Cancelar Consultas", type="primary", disabled=not (qtd_cancel and motivo_cancel and confirmar_cancel)):
+                barra_cancel = st.progress(0.0, text="Cancelando...")
+                try:
+                    lote, removidas = cancelamento.cancelar_em_lote(
+                        conn, filtro_cancel, motivo_cancel,
+                        progresso=lambda n: barra_cancel.progress(min(n / qtd_cancel, 1.0), text=f"{n} de {qtd_cancel} removidas"))
+                    st.success(f"{removidas} consulta(s) canceladas. Lote registrado na auditoria: {lote}")
+                except mysql.connector.Error as e:
+                    st.error(f"Erro no cancelamento em massa: {e}")
+
         conn.close()
 
 # ==============================================================================
@@ -448,261 +709,197 @@ elif pagina == "Gerenciar Cadastros":
     if conn:
         cursor = conn.cursor()
         
-        # Abas para cada entidade
-        tab1, tab2, tab3 = st.tabs(["👥 Pacientes", "👨‍⚕️ Médicos", "🏥 Clínicas"])
+        # Abas para cada entidade. Com "Carregar só a aba ativa" a aba é
+        # escolhida por um rádio e só as consultas dela são executadas (st.tabs
+        # executa o conteúdo das três abas a cada interação). Os resultados
+        # ficam guardados na sessão até a próxima escrita no banco.
+        carregar_so_ativa = st.toggle("Carregar só a aba ativa", value=True, key="cadastros_lazy")
+        abas = {"pacientes": "👥 Pacientes", "medicos": "👨‍⚕️ Médicos", "clinicas": "🏥 Clínicas"}
+        if carregar_so_ativa:
+            aba_ativa = st.radio("Cadastro", list(abas), format_func=abas.get, horizontal=True,
+                                 key="aba_cadastros", label_visibility="collapsed")
+            mostrar = {aba: aba == aba_ativa for aba in abas}
+            tab1 = tab2 = tab3 = st.container()
+        else:
+            mostrar = dict.fromkeys(abas, True)
+            tab1, tab2, tab3 = st.tabs(list(abas.values()))
         
         # ========== ABA PACIENTES ==========
-        with tab1:
-            st.header("Gerenciar Pacientes")
-            
-            # Busca de Pacientes
-            col_search1, col_search2 = st.columns([3, 1])
-            with col_search1:
-                busca_paciente = st.text_input("🔍 Buscar paciente por nome ou CPF", key="busca_pac")
-            with col_search2:
-                st.write("")
-                st.write("")
-                btn_limpar_pac = st.button("🔄 Limpar Filtro", key="limpar_pac")
-            
-            # Query base
-            query_pacientes = """
-            SELECT 
-                p.CpfPaciente as CPF,
-                p.NomePac as Nome,
-                p.DataNascimento as 'Data Nascimento',
-                p.Genero as Gênero,
-                p.Telefone,
-                p.Email,
-                COUNT(c.IdConsulta) as 'Total Consultas'
-            FROM Paciente p
-            LEFT JOIN Consulta c ON p.CpfPaciente = c.CpfPaciente
-            """
-            
-            if busca_paciente and not btn_limpar_pac:
-                query_pacientes += f" WHERE p.NomePac LIKE '%{busca_paciente}%' OR p.CpfPaciente LIKE '%{busca_paciente}%'"
-            
-            query_pacientes += " GROUP BY p.CpfPaciente, p.NomePac, p.DataNascimento, p.Genero, p.Telefone, p.Email ORDER BY p.NomePac ASC"
-            
-            df_pacientes = pd.read_sql(query_pacientes, conn)
-            
-            st.subheader(f"📊 Total de Pacientes: {len(df_pacientes)}")
-            st.dataframe(df_pacientes, use_container_width=True, hide_index=True)
-            
-            # Detalhes do Paciente Selecionado
-            st.divider()
-            st.subheader("🔍 Detalhes do Paciente")
-            
-            cpf_selecionado = st.selectbox("Selecione um paciente", df_pacientes['CPF'].tolist() if not df_pacientes.empty else [])
-            
-            if cpf_selecionado:
-                # Dados do paciente
-                paciente_info = df_pacientes[df_pacientes['CPF'] == cpf_selecionado].iloc[0]
+        if mostrar["pacientes"]:
+            with tab1:
+                st.header("Gerenciar Pacientes")
                 
-                col_info1, col_info2, col_info3 = st.columns(3)
-                col_info1.metric("👤 Nome", paciente_info['Nome'])
-                col_info2.metric("📅 Data Nascimento", str(paciente_info['Data Nascimento']))
-                col_info3.metric("📊 Total de Consultas", int(paciente_info['Total Consultas']))
+                # Busca de Pacientes
+                col_search1, col_search2 = st.columns([3, 1])
+                with col_search1:
+                    busca_paciente = st.text_input("🔍 Buscar paciente por nome ou CPF", key="busca_pac",
+                                                   help=AJUDA_BUSCA_PACIENTE)
+                with col_search2:
+                    st.write("")
+                    st.write("")
+                    btn_limpar_pac = st.button("🔄 Limpar Filtro", key="limpar_pac")
                 
-                # Consultas do paciente
-                st.subheader("📋 Histórico de Consultas")
-                query_consultas_pac = f"""
-                SELECT 
-                    c.IdConsulta as 'ID',
-                    c.Data_Hora as 'Data/Hora',
-                    m.NomeMed as 'Médico',
-                    m.Especialidade,
-                    cl.NomeCli as 'Clínica'
-                FROM Consulta c
-                JOIN Medico m ON c.CodMed = m.CodMed
-                JOIN Clinica cl ON c.CodCli = cl.CodCli
-                WHERE c.CpfPaciente = '{cpf_selecionado}'
-                ORDER BY c.Data_Hora DESC
-                """
-                df_consultas_pac = pd.read_sql(query_consultas_pac, conn)
+                filtros_pac = []
+                if busca_paciente and not btn_limpar_pac:
+                    filtros_pac.append(busca.filtro_busca("paciente", busca_paciente, "p.CpfPaciente"))
                 
-                if not df_consultas_pac.empty:
-                    st.dataframe(df_consultas_pac, use_container_width=True, hide_index=True)
-                else:
-                    st.info("Este paciente ainda não tem consultas agendadas.")
+                df_pacientes = ler_sql_aba(conn, *cadastros.sql_pacientes(filtros_pac))
+                
+                st.subheader(f"📊 Total de Pacientes: {len(df_pacientes)}")
+                st.dataframe(df_pacientes, use_container_width=True, hide_index=True)
+                
+                # Detalhes do Paciente Selecionado
+                st.divider()
+                st.subheader("🔍 Detalhes do Paciente")
+                
+                cpf_selecionado = st.selectbox("Selecione um paciente", df_pacientes['CPF'].tolist() if not df_pacientes.empty else [])
+                
+                if cpf_selecionado:
+                    # Dados do paciente
+                    paciente_info = df_pacientes[df_pacientes['CPF'] == cpf_selecionado].iloc[0]
+                    
+                    col_info1, col_info2, col_info3 = st.columns(3)
+                    col_info1.metric("👤 Nome", paciente_info['Nome'])
+                    col_info2.metric("📅 Data Nascimento", str(paciente_info['Data Nascimento']))
+                    col_info3.metric("📊 Total de Consultas", int(paciente_info['Total Consultas']))
+                    
+                    # Consultas do paciente
+                    st.subheader("📋 Histórico de Consultas")
+                    df_consultas_pac = ler_sql_aba(conn, *cadastros.sql_historico_paciente(cpf_selecionado))
+                    
+                    if not df_consultas_pac.empty:
+                        st.dataframe(df_consultas_pac, use_container_width=True, hide_index=True)
+                    else:
+                        st.info("Este paciente ainda não tem consultas agendadas.")
         
         # ========== ABA MÉDICOS ==========
-        with tab2:
-            st.header("Gerenciar Médicos")
-            
-            # Busca de Médicos
-            col_search1, col_search2, col_search3 = st.columns([2, 2, 1])
-            with col_search1:
-                busca_medico = st.text_input("🔍 Buscar médico por nome", key="busca_med")
-            with col_search2:
-                especialidades_disponiveis = pd.read_sql("SELECT DISTINCT Especialidade FROM Medico ORDER BY Especialidade", conn)
-                filtro_esp = st.selectbox("Filtrar por especialidade", ["Todas"] + especialidades_disponiveis['Especialidade'].tolist(), key="filtro_esp")
-            with col_search3:
-                st.write("")
-                st.write("")
-                btn_limpar_med = st.button("🔄 Limpar", key="limpar_med")
-            
-            # Query base
-            query_medicos = """
-            SELECT 
-                m.CodMed as 'Código',
-                m.NomeMed as 'Nome',
-                m.Especialidade,
-                m.Email,
-                m.Telefone,
-                COUNT(c.IdConsulta) as 'Total Consultas',
-                COUNT(DISTINCT c.CpfPaciente) as 'Pacientes Atendidos'
-            FROM Medico m
-            LEFT JOIN Consulta c ON m.CodMed = c.CodMed
-            """
-            
-            filtros = []
-            if busca_medico and not btn_limpar_med:
-                filtros.append(f"m.NomeMed LIKE '%{busca_medico}%'")
-            if filtro_esp != "Todas" and not btn_limpar_med:
-                filtros.append(f"m.Especialidade = '{filtro_esp}'")
-            
-            if filtros:
-                query_medicos += " WHERE " + " AND ".join(filtros)
-            
-            query_medicos += " GROUP BY m.CodMed, m.NomeMed, m.Especialidade, m.Email, m.Telefone ORDER BY m.NomeMed ASC"
-            
-            df_medicos = pd.read_sql(query_medicos, conn)
-            
-            st.subheader(f"📊 Total de Médicos: {len(df_medicos)}")
-            st.dataframe(df_medicos, use_container_width=True, hide_index=True)
-            
-            # Detalhes do Médico Selecionado
-            st.divider()
-            st.subheader("🔍 Detalhes do Médico")
-            
-            cod_med_selecionado = st.selectbox("Selecione um médico", df_medicos['Código'].tolist() if not df_medicos.empty else [])
-            
-            if cod_med_selecionado:
-                medico_info = df_medicos[df_medicos['Código'] == cod_med_selecionado].iloc[0]
+        if mostrar["medicos"]:
+            with tab2:
+                st.header("Gerenciar Médicos")
+                
+                # Busca de Médicos
+                col_search1, col_search2, col_search3 = st.columns([2, 2, 1])
+                with col_search1:
+                    busca_medico = st.text_input("🔍 Buscar médico por nome", key="busca_med")
+                with col_search2:
+                    filtro_esp = st.selectbox("Filtrar por especialidade", ["Todas"] + referencia.especialidades(conn), key="filtro_esp")
+                with col_search3:
+                    st.write("")
+                    st.write("")
+                    btn_limpar_med = st.button("🔄 Limpar", key="limpar_med")
                 
-                col_info1, col_info2, col_info3, col_info4 = st.columns(4)
-                col_info1.metric("👨‍⚕️ Nome", medico_info['Nome'])
-                col_info2.metric("🩺 Especialidade", medico_info['Especialidade'])
-                col_info3.metric("📊 Total Consultas", int(medico_info['Total Consultas']))
-                col_info4.metric("👥 Pacientes", int(medico_info['Pacientes Atendidos']))
+                filtros = []
+                if busca_medico and not btn_limpar_med:
+                    filtros.append(busca.filtro_busca("medico", busca_medico, "m.CodMed"))
+                if filtro_esp != "Todas" and not btn_limpar_med:
+                    filtros.append(("m.Especialidade = %s", (filtro_esp,)))
                 
-                # Consultas do médico
-                st.subheader("📋 Agenda de Consultas")
-                query_consultas_med = f"""
-                SELECT 
-                    c.IdConsulta as 'ID',
-                    c.Data_Hora as 'Data/Hora',
-                    p.NomePac as 'Paciente',
-                    p.CpfPaciente as 'CPF',
-                    cl.NomeCli as 'Clínica'
-                FROM Consulta c
-                JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
-                JOIN Clinica cl ON c.CodCli = cl.CodCli
-                WHERE c.CodMed = '{cod_med_selecionado}'
-                ORDER BY c.Data_Hora DESC
-                """
-                df_consultas_med = pd.read_sql(query_consultas_med, conn)
+                df_medicos = ler_sql_aba(conn, *cadastros.sql_medicos(filtros))
                 
-                if not df_consultas_med.empty:
-                    st.dataframe(df_consultas_med, use_container_width=True, hide_index=True)
+                st.subheader(f"📊 Total de Médicos: {len(df_medicos)}")
+                st.dataframe(df_medicos, use_container_width=True, hide_index=True)
+                
+                # Detalhes do Médico Selecionado
+                st.divider()
+                st.subheader("🔍 Detalhes do Médico")
+                
+                cod_med_selecionado = st.selectbox("Selecione um médico", df_medicos['Código'].tolist() if not df_medicos.empty else [])
+                
+                if cod_med_selecionado:
+                    medico_info = df_medicos[df_medicos['Código'] == cod_med_selecionado].iloc[0]
                     
-                    # Gráfico de consultas por mês
-                    df_consultas_med['Mes'] = pd.to_datetime(df_consultas_med['Data/Hora']).dt.to_period('M').astype(str)
-                    df_agrupado = df_consultas_med.groupby('Mes').size().reset_index(name='Quantidade')
+                    col_info1, col_info2, col_info3, col_info4 = st.columns(4)
+                    col_info1.metric("👨‍⚕️ Nome", medico_info['Nome'])
+                    col_info2.metric("🩺 Especialidade", medico_info['Especialidade'])
+                    col_info3.metric("📊 Total Consultas", int(medico_info['Total Consultas']))
+                    col_info4.metric("👥 Pacientes", int(medico_info['Pacientes Atendidos']))
                     
-                    fig = px.bar(df_agrupado, x='Mes', y='Quantidade', 
-                               title=f"Consultas de {medico_info['Nome']} por Mês",
-                               labels={'Mes': 'Mês', 'Quantidade': 'Número de Consultas'})
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("Este médico ainda não tem consultas agendadas.")
+                    # Gráfico de consultas por mês: só os totais vêm do banco
+                    df_agrupado = ler_sql_aba(conn, *cadastros.sql_consultas_por_mes_medico(cod_med_selecionado))
+                    
+                    if not df_agrupado.empty:
+                        fig = px.bar(df_agrupado, x='Mes', y='Quantidade', 
+                                   title=f"Consultas de {medico_info['Nome']} por Mês",
+                                   labels={'Mes': 'Mês', 'Quantidade': 'Número de Consultas'})
+                        st.plotly_chart(fig, use_container_width=True)
+                        
+                        # Agenda em páginas, consultada só quando aberta
+                        st.subheader("📋 Agenda de Consultas")
+                        if st.toggle("Mostrar agenda", key="agenda_med_aberta"):
+                            tabela_paginada(conn, f"agenda_med_{cod_med_selecionado}",
+                                            lambda apos, limite: cadastros.sql_agenda_medico(cod_med_selecionado, apos, limite),
+                                            lambda linha: linha['Data/Hora'].to_pydatetime())
+                    else:
+                        st.info("Este médico ainda não tem consultas agendadas.")
         
         # ========== ABA CLÍNICAS ==========
-        with tab3:
-            st.header("Gerenciar Clínicas")
-            
-            # Busca de Clínicas
-            col_search1, col_search2 = st.columns([3, 1])
-            with col_search1:
-                busca_clinica = st.text_input("🔍 Buscar clínica por nome", key="busca_cli")
-            with col_search2:
-                st.write("")
-                st.write("")
-                btn_limpar_cli = st.button("🔄 Limpar", key="limpar_cli")
-            
-            # Query base
-            query_clinicas = """
-            SELECT 
-                cl.CodCli as 'Código',
-                cl.NomeCli as 'Nome',
-                cl.Endereco as 'Endereço',
-                cl.Telefone,
-                COUNT(c.IdConsulta) as 'Total Consultas'
-            FROM Clinica cl
-            LEFT JOIN Consulta c ON cl.CodCli = c.CodCli
-            """
-            
-            if busca_clinica and not btn_limpar_cli:
-                query_clinicas += f" WHERE cl.NomeCli LIKE '%{busca_clinica}%'"
-            
-            query_clinicas += " GROUP BY cl.CodCli, cl.NomeCli, cl.Endereco, cl.Telefone ORDER BY cl.NomeCli ASC"
-            
-            df_clinicas = pd.read_sql(query_clinicas, conn)
-            
-            st.subheader(f"📊 Total de Clínicas: {len(df_clinicas)}")
-            st.dataframe(df_clinicas, use_container_width=True, hide_index=True)
-            
-            # Detalhes da Clínica Selecionada
-            st.divider()
-            st.subheader("🔍 Detalhes da Clínica")
-            
-            cod_cli_selecionado = st.selectbox("Selecione uma clínica", df_clinicas['Código'].tolist() if not df_clinicas.empty else [])
-            
-            if cod_cli_selecionado:
-                clinica_info = df_clinicas[df_clinicas['Código'] == cod_cli_selecionado].iloc[0]
+        if mostrar["clinicas"]:
+            with tab3:
+                st.header("Gerenciar Clínicas")
                 
-                col_info1, col_info2, col_info3 = st.columns(3)
-                col_info1.metric("🏥 Nome", clinica_info['Nome'])
-                col_info2.metric("📍 Endereço", clinica_info['Endereço'])
-                col_info3.metric("📊 Total Consultas", int(clinica_info['Total Consultas']))
+                # Busca de Clínicas
+                col_search1, col_search2 = st.columns([3, 1])
+                with col_search1:
+                    busca_clinica = st.text_input("🔍 Buscar clínica por nome", key="busca_cli")
+                with col_search2:
+                    st.write("")
+                    st.write("")
+                    btn_limpar_cli = st.button("🔄 Limpar", key="limpar_cli")
                 
-                # Consultas da clínica
-                st.subheader("📋 Consultas Realizadas")
-                query_consultas_cli = f"""
-                SELECT 
-                    c.IdConsulta as 'ID',
-                    c.Data_Hora as 'Data/Hora',
-                    p.NomePac as 'Paciente',
-                    m.NomeMed as 'Médico',
-                    m.Especialidade
-                FROM Consulta c
-                JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
-                JOIN Medico m ON c.CodMed = m.CodMed
-                WHERE c.CodCli = '{cod_cli_selecionado}'
-                ORDER BY c.Data_Hora DESC
-                """
-                df_consultas_cli = pd.read_sql(query_consultas_cli, conn)
+                filtros_cli = []
+                if busca_clinica and not btn_limpar_cli:
+                    filtros_cli.append(busca.filtro_busca("clinica", busca_clinica, "cl.CodCli"))
                 
-                if not df_consultas_cli.empty:
-                    st.dataframe(df_consultas_cli, use_container_width=True, hide_index=True)
-                    
-                    # Distribuição por especialidade
-                    df_esp_dist = df_consultas_cli.groupby('Especialidade').size().reset_index(name='Quantidade')
+                df_clinicas = ler_sql_aba(conn, *cadastros.sql_clinicas(filtros_cli))
+                
+                st.subheader(f"📊 Total de Clínicas: {len(df_clinicas)}")
+                st.dataframe(df_clinicas, use_container_width=True, hide_index=True)
+                
+                # Detalhes da Clínica Selecionada
+                st.divider()
+                st.subheader("🔍 Detalhes da Clínica")
+                
+                cod_cli_selecionado = st.selectbox("Selecione uma clínica", df_clinicas['Código'].tolist() if not df_clinicas.empty else [])
+                
+                if cod_cli_selecionado:
+                    clinica_info = df_clinicas[df_clinicas['Código'] == cod_cli_selecionado].iloc[0]
                     
-                    col_chart1, col_chart2 = st.columns(2)
+                    col_info1, col_info2, col_info3 = st.columns(3)
+                    col_info1.metric("🏥 Nome", clinica_info['Nome'])
+                    col_info2.metric("📍 Endereço", clinica_info['Endereço'])
+                    col_info3.metric("📊 Total Consultas", int(clinica_info['Total Consultas']))
                     
-                    with col_chart1:
-                        fig_pie = px.pie(df_esp_dist, values='Quantidade', names='Especialidade',
-                                       title=f"Distribuição de Especialidades na {clinica_info['Nome']}")
-                        st.plotly_chart(fig_pie, use_container_width=True)
+                    # Distribuição por especialidade: só os totais vêm do banco
+                    df_esp_dist = ler_sql_aba(conn, *cadastros.sql_especialidades_clinica(cod_cli_selecionado))
                     
-                    with col_chart2:
-                        fig_bar = px.bar(df_esp_dist, x='Especialidade', y='Quantidade',
-                                       title="Consultas por Especialidade",
-                                       color='Quantidade')
-                        st.plotly_chart(fig_bar, use_container_width=True)
-                else:
-                    st.info("Esta clínica ainda não tem consultas agendadas.")
+                    if not df_esp_dist.empty:
+                        col_chart1, col_chart2 = st.columns(2)
+                        
+                        with col_chart1:
+                            fig_pie = px.pie(df_esp_dist, values='Quantidade', names='Especialidade',
+                                           title=f"Distribuição de Especialidades na {clinica_info['Nome']}")
+                            st.plotly_chart(fig_pie, use_container_width=True)
+                        
+                        with col_chart2:
+                            fig_bar = px.bar(df_esp_dist, x='Especialidade', y='Quantidade',
+                                           title="Consultas por Especialidade",
+                                           color='Quantidade')
+                            st.plotly_chart(fig_bar, use_container_width=True)
+                        
+                        # Consultas em páginas, consultadas só quando abertas
+                        st.subheader("📋 Consultas Realizadas")
+                        if st.toggle("Mostrar consultas", key="consultas_cli_abertas"):
+                            tabela_paginada(conn, f"consultas_cli_{cod_cli_selecionado}",
+                                            lambda apos, limite: cadastros.sql_consultas_clinica(cod_cli_selecionado, apos, limite),
+                                            lambda linha: (linha['Data/Hora'].to_pydatetime(), linha['Cód. Médico']))
+                    else:
+                        st.info("Esta clínica ainda não tem consultas agendadas.")
+        
+        # Comandos SQL desta interação (compare com e sem "Carregar só a aba ativa")
+        df_medicao_cad = medicao.rodada_atual().tabela()
+        st.caption(f"Comandos SQL nesta interação: {int((df_medicao_cad['origem'] == 'banco').sum())} no banco, "
+                   f"{int((df_medicao_cad['origem'] == 'cache').sum())} reaproveitados "
+                   f"({'só a aba ativa' if carregar_so_ativa else 'todas as abas'})")
         
         conn.close()
 
@@ -720,30 +917,47 @@ elif pagina == "Auditoria (Trigger)":
         
         # Filtros para o log
         col_filtro1, col_filtro2 = st.columns(2)
+        data_inicio_log = data_fim_log = None
         with col_filtro1:
             filtrar_por_data = st.checkbox("Filtrar por período")
             if filtrar_por_data:
                 data_inicio_log = st.date_input("Data Início do Log", value=pd.to_datetime("2015-01-01"), key="log_inicio")
                 data_fim_log = st.date_input("Data Fim do Log", value=pd.to_datetime("2036-12-29"), key="log_fim")
+        with col_filtro2:
+            # Entradas antigas movidas pelo arquivamento.py
+            ver_arquivo = st.checkbox("Consultar o arquivo (cancelamentos antigos)")
+            tamanho_pagina_log = st.selectbox("Registros por página", [25, 50, 100, 200], index=1, key="log_tamanho")
         
-        # Query do log - usando SELECT * para pegar todas as colunas como estão
-        if filtrar_por_data:
-            query_log = f"""
-            SELECT * FROM Log_Cancelamento 
-            WHERE DATE(DataCancelamento) BETWEEN '{data_inicio_log}' AND '{data_fim_log}'
-            ORDER BY DataCancelamento DESC
-            """
-        else:
-            query_log = """
-            SELECT * FROM Log_Cancelamento 
-            ORDER BY DataCancelamento DESC
-            """
+        # Log paginado por (DataCancelamento, IdLog), do mais recente para o mais antigo
+        assinatura_log = (data_inicio_log, data_fim_log, ver_arquivo, tamanho_pagina_log)
+        if st.session_state.get("log_assinatura") != assinatura_log:
+            st.session_state.log_assinatura = assinatura_log
+            st.session_state.log_apos = None      # chave da última linha da página anterior
+            st.session_state.log_pilha = []       # log_apos das páginas anteriores
+            st.session_state.log_ultimo = None
         
-        df_log = pd.read_sql(query_log, conn)
+        def log_seguinte():
+            st.session_state.log_pilha.append(st.session_state.log_apos)
+            st.session_state.log_apos = st.session_state.log_ultimo
         
+        def log_anterior():
+            st.session_state.log_apos = st.session_state.log_pilha.pop()
+        
+        # Uma linha a mais só para saber se existe próxima página
+        df_log = ler_sql(conn, *auditoria.sql_log(data_inicio_log, data_fim_log, st.session_state.log_apos,
+                                                  tamanho_pagina_log + 1, arquivo=ver_arquivo))
+        tem_proxima_log = len(df_log) > tamanho_pagina_log
+        df_log = df_log.head(tamanho_pagina_log)
         if not df_log.empty:
-            st.success(f"📊 Total de {len(df_log)} consulta(s) cancelada(s) registrada(s)")
+            ultima = df_log.iloc[-1]
+            st.session_state.log_ultimo = (ultima['DataCancelamento'].to_pydatetime(), int(ultima['IdLog']))
+            total_log = int(ler_sql(conn, *auditoria.sql_contar_log(data_inicio_log, data_fim_log, ver_arquivo))['total'][0])
+            st.success(f"📊 Total de {total_log} consulta(s) cancelada(s) registrada(s)")
             st.dataframe(df_log, use_container_width=True, hide_index=True)
+            col_log1, col_log2, col_log3 = st.columns([1, 1, 3])
+            col_log1.button("⬅️ Anterior", on_click=log_anterior, disabled=not st.session_state.log_pilha, key="log_ant")
+            col_log2.button("Próxima ➡️", on_click=log_seguinte, disabled=not tem_proxima_log, key="log_prox")
+            col_log3.caption(f"Página {len(st.session_state.log_pilha) + 1}")
         else:
             st.info("Nenhuma consulta cancelada no período selecionado.")
         
@@ -759,25 +973,8 @@ elif pagina == "Auditoria (Trigger)":
         
         # Por enquanto, vamos mostrar consultas criadas recentemente após haver cancelamentos no log
         if not df_log.empty:
-            query_recentes = """
-            SELECT 
-                c.IdConsulta,
-                c.Data_Hora as DataConsulta,
-                p.NomePac as Paciente,
-                m.NomeMed as Medico,
-                cl.NomeCli as Clinica,
-                TIMESTAMPDIFF(MINUTE, NOW(), c.Data_Hora) as MinutosAteFuturo
-            FROM Consulta c
-            JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
-            JOIN Medico m ON c.CodMed = m.CodMed
-            JOIN Clinica cl ON c.CodCli = cl.CodCli
-            WHERE c.IdConsulta > (SELECT COALESCE(MAX(IdConsultaDeletada), 0) FROM Log_Cancelamento)
-            ORDER BY c.IdConsulta DESC
-            LIMIT 10
-            """
-            
             try:
-                df_recuperadas = pd.read_sql(query_recentes, conn)
+                df_recuperadas = ler_sql(conn, *auditoria.sql_recuperadas())
                 
                 if not df_recuperadas.empty:
                     st.success(f"🔄 {len(df_recuperadas)} consulta(s) recuperada(s) identificada(s)")
@@ -801,62 +998,29 @@ elif pagina == "Auditoria (Trigger)":
         st.header("🔄 Recuperar Consulta Cancelada")
         st.info("💡 Você pode restaurar uma consulta cancelada desde que os dados ainda estejam disponíveis no log.")
         
-        if not df_log.empty:
-            # Seleção da consulta a recuperar
+        if ver_arquivo:
+            st.info("A recuperação usa o log atual; desmarque \"Consultar o arquivo\" para recuperar.")
+        elif not df_log.empty:
+            # Seleção da consulta a recuperar (entre as da página exibida)
             col_recuperar1, col_recuperar2 = st.columns([2, 1])
             
             with col_recuperar1:
-                # Criar lista de opções formatadas com os dados reais do log
-                opcoes_recuperacao = []
-                
-                # Detectar nomes das colunas dinamicamente
-                col_names = df_log.columns.tolist()
-                
-                for idx, row in df_log.iterrows():
-                    # Montar opção com as informações disponíveis no log
-                    id_log = row[col_names[0]] if len(col_names) > 0 else idx
-                    
-                    # Buscar coluna de data de cancelamento
-                    data_cancel = ""
-                    for col in col_names:
-                        if 'datacancelamento' in col.lower():
-                            data_cancel = f"Cancelada em: {row[col]}"
-                            break
-                    
-                    # Buscar ID da consulta deletada
-                    id_consulta = ""
-                    for col in col_names:
-                        if 'idconsulta' in col.lower() or 'deletada' in col.lower():
-                            id_consulta = f" | Consulta #{row[col]}"
-                            break
-                    
-                    # Buscar motivo
-                    motivo = ""
-                    for col in col_names:
-                        if 'motivo' in col.lower():
-                            motivo_texto = str(row[col])[:30]
-                            motivo = f" | {motivo_texto}"
-                            break
-                    
-                    opcao = f"Log #{id_log} - {data_cancel}{id_consulta}{motivo}"
-                    opcoes_recuperacao.append(opcao)
-                
-                consulta_selecionada = st.selectbox(
+                # Rótulos montados de uma vez (auditoria.rotulos_log); a opção
+                # escolhida já é o IdLog
+                rotulos_recuperacao = auditoria.rotulos_log(df_log)
+                id_recuperar = st.selectbox(
                     "Selecione a consulta para recuperar",
-                    opcoes_recuperacao if opcoes_recuperacao else ["Nenhuma consulta disponível"]
+                    list(rotulos_recuperacao),
+                    format_func=rotulos_recuperacao.get
                 )
             
-            if consulta_selecionada != "Nenhuma consulta disponível":
-                # Extrair ID do log selecionado
-                id_recuperar = int(consulta_selecionada.split(" - ")[0].replace("Log #", ""))
-                
+            if id_recuperar is not None:
                 # Buscar detalhes da consulta no log usando o ID correto
-                col_id = df_log.columns[0]
+                col_id = auditoria.COL_ID
                 log_info = df_log[df_log[col_id] == id_recuperar].iloc[0]
                 
                 st.subheader("📋 Detalhes da Consulta Cancelada")
                 
-                # Encontrar as colunas dinamicamente
                 col_names = df_log.columns.tolist()
                 
                 # Exibir métricas com os dados disponíveis
@@ -867,36 +1031,31 @@ elif pagina == "Auditoria (Trigger)":
                 # Buscar informações adicionais
                 st.subheader("📝 Inserir Dados para Recuperação")
                 
+                # Paciente: busca por CPF/nome (já preenchida com o CPF do log)
+                cpf_log = log_info['CpfPaciente'] if 'CpfPaciente' in log_info and pd.notna(log_info['CpfPaciente']) else ""
+                cpf_valor = seletor_paciente(conn, f"recuperacao_{id_recuperar}", termo_inicial=str(cpf_log))
+                
                 # Formulário para entrada manual de dados
                 with st.form("form_recuperacao", clear_on_submit=False):
                     st.write("Preencha os dados da consulta que deseja recuperar:")
                     
                     # Buscar listas de opções
-                    medicos_disp = pd.read_sql("SELECT CodMed, NomeMed, Especialidade FROM Medico ORDER BY NomeMed", conn)
-                    pacientes_disp = pd.read_sql("SELECT CpfPaciente, NomePac FROM Paciente ORDER BY NomePac", conn)
-                    clinicas_disp = pd.read_sql("SELECT CodCli, NomeCli FROM Clinica ORDER BY NomeCli", conn)
+                    medicos_disp = referencia.obter(conn, "medicos")
+                    clinicas_disp = referencia.obter(conn, "clinicas")
                     
                     col_form1, col_form2 = st.columns(2)
                     
                     with col_form1:
-                        if not pacientes_disp.empty:
-                            pac_opcoes = [f"{row['CpfPaciente']} - {row['NomePac']}" for _, row in pacientes_disp.iterrows()]
-                            pac_selecionado = st.selectbox("👤 Selecione o Paciente", pac_opcoes)
-                            cpf_valor = pac_selecionado.split(" - ")[0]
-                        else:
-                            cpf_valor = st.text_input("👤 CPF do Paciente", max_chars=11)
                         
-                        if not clinicas_disp.empty:
-                            cli_opcoes = [f"{row['CodCli']} - {row['NomeCli']}" for _, row in clinicas_disp.iterrows()]
-                            cli_selecionado = st.selectbox("🏥 Selecione a Clínica", cli_opcoes)
+                        if clinicas_disp:
+                            cli_selecionado = st.selectbox("🏥 Selecione a Clínica", clinicas_disp.rotulos)
                             cli_valor = cli_selecionado.split(" - ")[0]
                         else:
                             cli_valor = st.text_input("🏥 Código da Clínica")
                     
                     with col_form2:
-                        if not medicos_disp.empty:
-                            med_opcoes = [f"{row['CodMed']} - {row['NomeMed']} ({row['Especialidade']})" for _, row in medicos_disp.iterrows()]
-                            med_selecionado = st.selectbox("👨‍⚕️ Selecione o Médico", med_opcoes)
+                        if medicos_disp:
+                            med_selecionado = st.selectbox("👨‍⚕️ Selecione o Médico", medicos_disp.rotulos_com_extra())
                             med_valor = med_selecionado.split(" - ")[0]
                         else:
                             med_valor = st.text_input("👨‍⚕️ Código do Médico")
@@ -919,91 +1078,65 @@ elif pagina == "Auditoria (Trigger)":
                 st.subheader("✅ Verificações de Integridade")
                 
                 verificacoes_ok = True
+                verificacao = None
                 
                 # Só fazer verificações se conseguimos buscar os dados
                 if cpf_valor and med_valor and cli_valor:
-                    # Verificar se o paciente existe
-                    query_check_pac = f"SELECT NomePac FROM Paciente WHERE CpfPaciente = '{cpf_valor}'"
-                    df_check_pac = pd.read_sql(query_check_pac, conn)
-                    
-                    if df_check_pac.empty:
-                        st.error(f"❌ Paciente com CPF {cpf_valor} não existe mais no sistema")
-                        verificacoes_ok = False
-                    
-                    # Verificar se o médico existe
-                    query_check_med = f"SELECT NomeMed FROM Medico WHERE CodMed = '{med_valor}'"
-                    df_check_med = pd.read_sql(query_check_med, conn)
-                    
-                    if df_check_med.empty:
-                        st.error(f"❌ Médico com código {med_valor} não existe mais no sistema")
-                        verificacoes_ok = False
-                    
-                    # Verificar se a clínica existe
-                    query_check_cli = f"SELECT NomeCli FROM Clinica WHERE CodCli = '{cli_valor}'"
-                    df_check_cli = pd.read_sql(query_check_cli, conn)
-                    
-                    if df_check_cli.empty:
-                        st.error(f"❌ Clínica com código {cli_valor} não existe mais no sistema")
-                        verificacoes_ok = False
+                    # Paciente, médico, clínica, duplicata e horário em uma única
+                    # consulta de uma linha, sempre no banco: outra sessão ou
+                    # outro processo pode ter apagado o médico ou ocupado o
+                    # horário, e o cache da sessão só vê as escritas locais
+                    try:
+                        verificacao = ler_sql(conn, *auditoria.sql_validar_recuperacao(
+                            cpf_valor, med_valor, cli_valor, data_hora_original)).iloc[0]
+                    except (mysql.connector.Error, pd.errors.DatabaseError):
+                        st.warning("⚠️ Não foi possível verificar os dados no banco.")
                     
-                    # VERIFICAÇÃO DE DUPLICAÇÃO
-                    if data_hora_original and verificacoes_ok:
-                        query_check_duplicada = f"""
-                        SELECT IdConsulta, Data_Hora 
-                        FROM Consulta 
-                        WHERE CpfPaciente = '{cpf_valor}' 
-                        AND CodMed = '{med_valor}' 
-                        AND CodCli = '{cli_valor}'
-                        AND Data_Hora = '{data_hora_original}'
-                        """
-                        df_check_dup = pd.read_sql(query_check_duplicada, conn)
+                    if verificacao is not None:
+                        if not verificacao['PacienteExiste']:
+                            st.error(f"❌ Paciente com CPF {cpf_valor} não existe mais no sistema")
+                            verificacoes_ok = False
+                        if not verificacao['MedicoExiste']:
+                            st.error(f"❌ Médico com código {med_valor} não existe mais no sistema")
+                            verificacoes_ok = False
+                        if not verificacao['ClinicaExiste']:
+                            st.error(f"❌ Clínica com código {cli_valor} não existe mais no sistema")
+                            verificacoes_ok = False
                         
-                        if not df_check_dup.empty:
-                            st.error(f"❌ JÁ EXISTE consulta idêntica (ID: {df_check_dup['IdConsulta'][0]} em {df_check_dup['Data_Hora'][0]})")
+                        # VERIFICAÇÃO DE DUPLICAÇÃO
+                        if verificacoes_ok and pd.notna(verificacao['IdDuplicada']):
+                            st.error(f"❌ JÁ EXISTE consulta idêntica (ID: {int(verificacao['IdDuplicada'])} em {data_hora_original})")
                             st.info("💡 Esta consulta já foi recuperada anteriormente ou nunca foi deletada.")
                             verificacoes_ok = False
                     
                     # Mostrar sucesso apenas se tudo estiver OK
-                    if verificacoes_ok:
+                    if verificacoes_ok and verificacao is not None:
                         st.success("✅ Todos os dados validados! Pode recuperar a consulta.")
                 else:
                     st.error("❌ Não foi possível obter os dados necessários para recuperação")
                     verificacoes_ok = False
                 
-                # Verificar conflito de horário
+                # Verificar conflito de horário (já respondido pela mesma consulta)
                 # Inicializar data_hora_recuperacao
                 data_hora_recuperacao = None
                 
-                if med_valor and data_hora_original:
-                    try:
-                        query_check_horario = f"""
-                        SELECT COUNT(*) as conflito 
-                        FROM Consulta 
-                        WHERE CodMed = '{med_valor}' 
-                        AND Data_Hora = '{data_hora_original}'
-                        """
-                        df_check_horario = pd.read_sql(query_check_horario, conn)
-                        
-                        if df_check_horario['conflito'][0] > 0:
+                if verificacao is not None:
+                    if verificacao['HorarioOcupado'] or not verificacao['DataFutura']:
+                        if verificacao['HorarioOcupado']:
                             st.warning("⚠️ O médico já tem consulta agendada neste horário. Escolha um novo horário:")
-                            nova_data = st.date_input("Nova Data", value=pd.to_datetime(data_hora_original).date(), key="nova_data_rec")
-                            nova_hora = st.time_input("Nova Hora", value=pd.to_datetime(data_hora_original).time(), key="nova_hora_rec")
-                            import datetime
-                            data_hora_recuperacao = datetime.datetime.combine(nova_data, nova_hora).strftime("%Y-%m-%d %H:%M:%S")
                         else:
-                            st.success(f"✅ Horário disponível: {data_hora_original}")
-                            data_hora_recuperacao = str(data_hora_original)
-                    except Exception as e:
-                        st.warning(f"⚠️ Não foi possível verificar conflito de horário. Você pode definir manualmente:")
-                        import datetime
-                        nova_data = st.date_input("Data da Consulta", value=datetime.date.today(), key="manual_data_rec")
-                        nova_hora = st.time_input("Hora da Consulta", value=datetime.datetime.now().time(), key="manual_hora_rec")
+                            st.warning("⚠️ Este horário já passou. Escolha um novo horário:")
+                        nova_data = st.date_input("Nova Data", value=pd.to_datetime(data_hora_original).date(), key="nova_data_rec")
+                        nova_hora = st.time_input("Nova Hora", value=pd.to_datetime(data_hora_original).time(), key="nova_hora_rec")
                         data_hora_recuperacao = datetime.datetime.combine(nova_data, nova_hora).strftime("%Y-%m-%d %H:%M:%S")
+                    else:
+                        st.success(f"✅ Horário disponível: {data_hora_original}")
+                        data_hora_recuperacao = str(data_hora_original)
                 else:
                     st.warning("⚠️ Defina manualmente a data e hora da consulta:")
-                    import datetime
-                    nova_data = st.date_input("Data da Consulta", value=datetime.date.today(), key="manual_data_rec2")
-                    nova_hora = st.time_input("Hora da Consulta", value=datetime.datetime.now().time(), key="manual_hora_rec2")
+                    sugerido = agenda.proximo_horario()
+                    nova_data = st.date_input("Data da Consulta", value=sugerido.date(), key="manual_data_rec")
+                    nova_hora = st.time_input("Hora da Consulta", value=sugerido.time(), key="manual_hora_rec")
                     data_hora_recuperacao = datetime.datetime.combine(nova_data, nova_hora).strftime("%Y-%m-%d %H:%M:%S")
                 
                 st.divider()
@@ -1020,7 +1153,7 @@ elif pagina == "Auditoria (Trigger)":
                                 INSERT INTO Consulta (CodCli, CodMed, CpfPaciente, Data_Hora) 
                                 VALUES (%s, %s, %s, %s)
                                 """
-                                cursor.execute(query_recuperar, (
+                                executar(cursor, query_recuperar, (
                                     cli_valor,
                                     med_valor,
                                     cpf_valor,
@@ -1037,18 +1170,79 @@ elif pagina == "Auditoria (Trigger)":
                                     # Opcionalmente, remover do log
                                     remover_log = st.checkbox("Remover esta entrada do log de cancelamentos?")
                                     if remover_log:
-                                        cursor.execute(f"DELETE FROM Log_Cancelamento WHERE {col_id} = {id_recuperar}")
+                                        executar(cursor, f"DELETE FROM Log_Cancelamento WHERE {col_id} = %s", (id_recuperar,))
                                         conn.commit()
                                         st.info("Registro removido do log de cancelamentos.")
                                 else:
                                     st.error("Erro ao recuperar consulta.")
                                     
                             except mysql.connector.Error as e:
-                                st.error(f"Erro ao recuperar consulta: {e}")
+                                if agenda.horario_ocupado(e):
+                                    st.error(f"Erro ao recuperar consulta: o médico já tem outra consulta em {data_hora_recuperacao}.")
+                                else:
+                                    st.error(f"Erro ao recuperar consulta: {e}")
                     else:
                         st.button("🔄 RECUPERAR CONSULTA", disabled=True, use_container_width=True)
                         st.warning("⚠️ Corrija os problemas acima antes de recuperar")
+            
+            # === RECUPERAÇÃO EM LOTE ===
+            # Várias entradas do log de uma vez, com os dados gravados nelas:
+            # uma consulta valida todas e as aprovadas voltam numa transação
+            with st.expander("📦 Recuperar várias consultas de uma vez"):
+                df_lotes = ler_sql_aba(conn, *auditoria.sql_lotes())
+                rotulos_lote = {lote: f"{lote} · {data} · {qtd} entrada(s)" for lote, data, qtd
+                                in zip(df_lotes['IdLote'], df_lotes['DataCancelamento'], df_lotes['Entradas'])}
+                lote_escolhido = st.selectbox("Cancelamento em massa (IdLote)", ["Nenhum"] + list(rotulos_lote),
+                                              format_func=lambda lote: rotulos_lote.get(lote, lote), key="lote_rec")
+                ids_texto = st.text_area("IDs do log (IdLog), um por linha ou separados por vírgula", key="ids_rec")
+                ids_lote = set(cancelamento.ids_do_texto(ids_texto))
+                if lote_escolhido != "Nenhum":
+                    ids_lote |= set(ler_sql(conn, *auditoria.sql_ids_lote(lote_escolhido))['IdLog'].astype(int))
+                ids_lote = sorted(ids_lote)
+                remover_log_lote = st.checkbox("Remover as entradas recuperadas do log", key="remover_log_lote")
+                
+                if ids_lote:
+                    df_lote = auditoria.validar_lote(conn, ids_lote)
+                    aptas = int((df_lote['Motivo'] == "").sum()) if not df_lote.empty else 0
+                    st.caption(f"{len(ids_lote)} ID(s) informado(s) · {len(df_lote)} encontrado(s) no log · {aptas} podem ser recuperada(s)")
+                    if not df_lote.empty:
+                        st.dataframe(df_lote[['IdLog', 'IdConsultaDeletada', 'CpfPaciente', 'CodMed', 'CodCli', 'Data_Hora', 'Motivo']],
+                                     use_container_width=True, hide_index=True)
+                    if st.button(f"🔄 RECUPERAR {aptas} CONSULTA(S)", disabled=aptas == 0, key="btn_rec_lote"):
+                        try:
+                            df_resultado = auditoria.recuperar_em_lote(conn, ids_lote, remover_log=remover_log_lote)
+                            st.success(f"✅ {int(df_resultado['Recuperada'].sum())} consulta(s) recuperada(s).")
+                        except mysql.connector.Error as e:
+                            if agenda.horario_ocupado(e):
+                                st.error("Nada foi recuperado: outra consulta ocupou um dos horários. Valide o lote novamente.")
+                            else:
+                                st.error(f"Erro ao recuperar consultas: {e}")
         else:
             st.info("Não há consultas canceladas para recuperar no momento.")
         
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+# --- PAINEL DE DESEMPENHO ---
+# Cascata dos comandos SQL desta reexecução: quando começou, quanto durou,
+# linhas e bytes; os acertos do cache aparecem com origem "cache"
+df_medicao = medicao.rodada_atual().tabela()
+with st.sidebar.expander("⏱️ Performance"):
+    if df_medicao.empty:
+        st.caption("Nenhum comando SQL nesta execução.")
+    else:
+        no_banco = df_medicao[df_medicao['origem'] == "banco"]
+        st.caption(f"{len(no_banco)} comandos no banco ({len(df_medicao) - len(no_banco)} do cache) · "
+                   f"{no_banco['duracao_ms'].sum():.0f} ms · {int(df_medicao['linhas'].sum())} linhas · "
+                   f"{df_medicao['bytes'].sum() / 1024:.0f} KB")
+        df_medicao['comando'] = [f"{i + 1}. {nome}" for i, nome in enumerate(df_medicao['secao'])]
+        fig_medicao = px.bar(df_medicao, x='duracao_ms', y='comando', base='inicio_ms', orientation='h',
+                             color='origem', hover_data=['sql', 'linhas', 'bytes'],
+                             labels={'duracao_ms': 'ms', 'comando': ''})
+        fig_medicao.update_yaxes(autorange="reversed")
+        fig_medicao.update_layout(height=120 + 22 * len(df_medicao), margin=dict(l=0, r=0, t=10, b=0), showlegend=False)
+        st.plotly_chart(fig_medicao, use_container_width=True)
+        st.dataframe(df_medicao[['comando', 'duracao_ms', 'linhas', 'bytes', 'origem', 'sql']],
+                     hide_index=True, use_container_width=True)
+        lentos = int((no_banco['duracao_ms'] >= medicao.LENTA_MS).sum())
+        if lentos:
+            st.warning(f"{lentos} comando(s) acima de {medicao.LENTA_MS:.0f} ms registrados em {medicao.LOG_LENTAS}")
@@ -0,0 +1,76 @@
+"""Arquivamento do log de cancelamentos.
+
+Log_Cancelamento só cresce. Este job move as entradas com DataCancelamento
+anterior a N meses para Log_Cancelamento_Arquivo (tabela comprimida, mesmo
+IdLog), em blocos: cada bloco copia e apaga os mesmos IdLog na mesma
+transação, então uma interrupção não perde nem duplica entradas. O log
+consultado pela Auditoria fica só com os meses recentes.
+
+Uso pela linha de comando (por exemplo, uma vez por mês no cron):
+    python arquivamento.py --meses 12
+"""
+import argparse
+import datetime
+import sys
+
+from auditoria import TABELA_ARQUIVO, TABELA_LOG
+from banco import conectar, executar
+
+MESES_NO_LOG = 12
+TAMANHO_BLOCO = 1000
+COLUNAS = "IdLog, Usuario, DataCancelamento, IdConsultaDeletada, CpfPaciente, CodMed, CodCli, Data_Hora, Motivo, IdLote"
+
+
+def data_limite(meses=MESES_NO_LOG, hoje=None):
+    # Primeiro dia do mês, N meses atrás: arquiva meses inteiros
+    hoje = hoje or datetime.date.today()
+    mes = hoje.year * 12 + hoje.month - 1 - meses
+    return datetime.datetime(mes // 12, mes % 12 + 1, 1)
+
+
+def arquivar(conn, limite, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """Move para o arquivo as entradas canceladas antes de limite; devolve o total."""
+    cursor = conn.cursor()
+    movidas = 0
+    try:
+        while True:
+            # Bloco mais antigo pela faixa de idx_Log_Data
+            executar(cursor, f"SELECT IdLog FROM {TABELA_LOG} WHERE DataCancelamento < %s "
+                             f"ORDER BY DataCancelamento, IdLog LIMIT %s", (limite, tamanho_bloco))
+            ids = [linha[0] for linha in cursor.fetchall()]
+            if not ids:
+                break
+            marcadores = ", ".join(["%s"] * len(ids))
+            executar(cursor, f"INSERT INTO {TABELA_ARQUIVO} ({COLUNAS}) "
+                             f"SELECT {COLUNAS} FROM {TABELA_LOG} WHERE IdLog IN ({marcadores})", ids)
+            executar(cursor, f"DELETE FROM {TABELA_LOG} WHERE IdLog IN ({marcadores})", ids)
+            conn.commit()
+            movidas += len(ids)
+            if progresso:
+                progresso(movidas)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return movidas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move as entradas antigas do log de cancelamentos para o arquivo.")
+    parser.add_argument("--meses", type=int, default=MESES_NO_LOG, help="meses mantidos no log")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO, help="entradas por transação")
+    args = parser.parse_args(argv)
+
+    limite = data_limite(args.meses)
+    conn = conectar()
+    try:
+        movidas = arquivar(conn, limite, args.bloco,
+                           progresso=lambda n: print(f"  {n} entradas arquivadas", file=sys.stderr))
+    finally:
+        conn.close()
+    print(f"Entradas canceladas antes de {limite:%Y-%m-%d} movidas para {TABELA_ARQUIVO}: {movidas}")
+
+
+if __name__ == "__main__":
+    main()
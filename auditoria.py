@@ -0,0 +1,201 @@
+"""Comandos SQL da página de Auditoria (log de cancelamentos e recuperação).
+
+Assim como em dashboard.py, cada função sql_* devolve (sql, params).
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from agenda import MSG_HORARIO_OCUPADO
+from banco import BLOCO_ESCRITA, executar, ler_sql
+
+
+# Colunas de Log_Cancelamento (script_banco.sql) usadas nos rótulos
+COL_ID, COL_DATA, COL_CONSULTA, COL_MOTIVO = "IdLog", "DataCancelamento", "IdConsultaDeletada", "Motivo"
+MOTIVO_NO_ROTULO = 30  # caracteres do motivo exibidos
+
+TABELA_LOG = "Log_Cancelamento"
+TABELA_ARQUIVO = "Log_Cancelamento_Arquivo"  # entradas antigas (arquivamento.py)
+
+
+def _filtro_log(data_inicio=None, data_fim=None):
+    # Faixa em DataCancelamento (sem DATE() na coluna): usa idx_Log_Data
+    if data_inicio and data_fim:
+        return ["DataCancelamento >= %s AND DataCancelamento < %s + INTERVAL 1 DAY"], [data_inicio, data_fim]
+    return [], []
+
+
+def sql_log(data_inicio=None, data_fim=None, apos=None, limite=50, arquivo=False):
+    # Paginação por chave (keyset), do mais recente para o mais antigo:
+    # apos = (DataCancelamento, IdLog) da última linha da página anterior
+    condicoes, params = _filtro_log(data_inicio, data_fim)
+    if apos is not None:
+        condicoes.append("(DataCancelamento < %s OR (DataCancelamento = %s AND IdLog < %s))")
+        params.extend([apos[0], apos[0], apos[1]])
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    sql = f"""
+    SELECT * FROM {TABELA_ARQUIVO if arquivo else TABELA_LOG}
+    {where}
+    ORDER BY DataCancelamento DESC, IdLog DESC
+    LIMIT %s
+    """
+    return sql, tuple(params) + (limite,)
+
+
+def sql_contar_log(data_inicio=None, data_fim=None, arquivo=False):
+    condicoes, params = _filtro_log(data_inicio, data_fim)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return f"SELECT COUNT(*) AS total FROM {TABELA_ARQUIVO if arquivo else TABELA_LOG} {where}", tuple(params)
+
+
+def sql_lotes(limite=50):
+    # Cancelamentos em massa mais recentes (idx_Log_Lote)
+    sql = """
+    SELECT IdLote, MIN(DataCancelamento) AS DataCancelamento, COUNT(*) AS Entradas
+    FROM Log_Cancelamento
+    WHERE IdLote IS NOT NULL
+    GROUP BY IdLote
+    ORDER BY DataCancelamento DESC
+    LIMIT %s
+    """
+    return sql, (limite,)
+
+
+def sql_ids_lote(id_lote):
+    return "SELECT IdLog FROM Log_Cancelamento WHERE IdLote = %s ORDER BY IdLog", (id_lote,)
+
+
+def sql_recuperadas():
+    # Consultas com ID maior que o último cancelamento registrado
+    sql = """
+    SELECT 
+        c.IdConsulta,
+        c.Data_Hora as DataConsulta,
+        p.NomePac as Paciente,
+        m.NomeMed as Medico,
+        cl.NomeCli as Clinica,
+        TIMESTAMPDIFF(MINUTE, NOW(), c.Data_Hora) as MinutosAteFuturo
+    FROM Consulta c
+    JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
+    JOIN Medico m ON c.CodMed = m.CodMed
+    JOIN Clinica cl ON c.CodCli = cl.CodCli
+    WHERE c.IdConsulta > (SELECT COALESCE(MAX(IdConsultaDeletada), 0) FROM Log_Cancelamento)
+    ORDER BY c.IdConsulta DESC
+    LIMIT 10
+    """
+    return sql, ()
+
+
+def rotulos_log(df_log):
+    """{IdLog: "Log #id - Cancelada em: data | Consulta #id | motivo"} para o selectbox.
+
+    Montados coluna a coluna com pyarrow.compute, sem laço por linha.
+    """
+    if df_log.empty:
+        return {}
+
+    def texto(coluna, tipo=None):
+        valores = pa.Array.from_pandas(df_log[coluna])
+        if tipo is not None:
+            valores = pc.cast(valores, tipo, safe=False)  # DATETIME sem fração; IDs float quando há NULL
+        return pc.cast(valores, pa.string())
+
+    motivo = pc.utf8_slice_codeunits(pa.Array.from_pandas(df_log[COL_MOTIVO], type=pa.string()), 0, MOTIVO_NO_ROTULO)
+    rotulos = pc.binary_join_element_wise(
+        "Log #", texto(COL_ID), " - Cancelada em: ", texto(COL_DATA, pa.timestamp("s")),
+        " | Consulta #", texto(COL_CONSULTA, pa.int64()), " | ", motivo, "",
+        null_handling="replace", null_replacement="")
+    return dict(zip(df_log[COL_ID].tolist(), rotulos.to_pylist()))
+
+
+# Verificações da recuperação, calculadas para cada linha "l" com
+# CpfPaciente, CodMed, CodCli e Data_Hora. Paciente, médico e clínica são
+# buscas pela chave primária; a duplicata e o conflito de horário usam o
+# índice único (CodMed, Data_Hora).
+VERIFICACOES = """
+    l.CpfPaciente, l.CodMed, l.CodCli, l.Data_Hora,
+    EXISTS(SELECT 1 FROM Paciente p WHERE p.CpfPaciente = l.CpfPaciente) AS PacienteExiste,
+    EXISTS(SELECT 1 FROM Medico m WHERE m.CodMed = l.CodMed) AS MedicoExiste,
+    EXISTS(SELECT 1 FROM Clinica cl WHERE cl.CodCli = l.CodCli) AS ClinicaExiste,
+    (SELECT c.IdConsulta FROM Consulta c
+     WHERE c.CodMed = l.CodMed AND c.Data_Hora = l.Data_Hora
+       AND c.CpfPaciente = l.CpfPaciente AND c.CodCli = l.CodCli) AS IdDuplicada,
+    EXISTS(SELECT 1 FROM Consulta c WHERE c.CodMed = l.CodMed AND c.Data_Hora = l.Data_Hora) AS HorarioOcupado,
+    l.Data_Hora > NOW() AS DataFutura
+"""
+
+
+def sql_validar_recuperacao(cpf, cod_med, cod_cli, data_hora):
+    # Todas as verificações de uma recuperação em uma única ida ao banco
+    sql = f"""
+    SELECT {VERIFICACOES}
+    FROM (SELECT %s AS CpfPaciente, %s AS CodMed, %s AS CodCli, CAST(%s AS DATETIME) AS Data_Hora) AS l
+    """
+    return sql, (cpf, cod_med, cod_cli, data_hora)
+
+
+def sql_validar_lote(ids_log):
+    # As mesmas verificações para várias entradas do log, com os dados gravados nelas
+    marcadores = ", ".join(["%s"] * len(ids_log))
+    sql = f"""
+    SELECT l.IdLog, l.IdConsultaDeletada, {VERIFICACOES}
+    FROM Log_Cancelamento l
+    WHERE l.IdLog IN ({marcadores})
+    ORDER BY l.IdLog
+    """
+    return sql, tuple(ids_log)
+
+
+def validar_lote(conn, ids_log):
+    """Entradas do log com a coluna Motivo: vazia quando podem ser recuperadas."""
+    if not ids_log:
+        return pd.DataFrame()
+    df = ler_sql(conn, *sql_validar_lote(ids_log))
+    motivo = pd.Series("", index=df.index)
+    for problema, texto in [
+        (df["PacienteExiste"] == 0, "Paciente não existe mais"),
+        (df["MedicoExiste"] == 0, "Médico não existe mais"),
+        (df["ClinicaExiste"] == 0, "Clínica não existe mais"),
+        (df["IdDuplicada"].notna(), "Consulta idêntica já existe"),
+        (df["HorarioOcupado"] == 1, MSG_HORARIO_OCUPADO),
+        # Mesma regra do gatilho trg_Validar_Data_Consulta
+        (df["DataFutura"] != 1, "Data/hora já passou"),
+    ]:
+        motivo = motivo.mask((motivo == "") & problema, texto)
+    # Duas entradas aptas no mesmo médico e horário: só a primeira volta
+    repetida = df[motivo == ""].duplicated(["CodMed", "Data_Hora"]).reindex(df.index, fill_value=False)
+    motivo = motivo.mask(repetida, "Mesmo médico e horário de outra entrada do lote")
+    return df.assign(Motivo=motivo)
+
+
+def recuperar_em_lote(conn, ids_log, remover_log=False):
+    """Valida as entradas do log e recupera de uma vez as que passaram.
+
+    Tudo em uma transação: se o banco recusar alguma linha (outra sessão
+    ocupou o horário entre a validação e o INSERT), nada é recuperado.
+    Devolve o resultado de validar_lote com a coluna Recuperada.
+    """
+    df = validar_lote(conn, ids_log)
+    if df.empty:
+        return df
+    validas = df[df["Motivo"] == ""]
+    if validas.empty:
+        return df.assign(Recuperada=False)
+    linhas = list(zip(validas["CodCli"], validas["CodMed"], validas["CpfPaciente"],
+                      validas["Data_Hora"].dt.strftime("%Y-%m-%d %H:%M:%S")))
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(linhas), BLOCO_ESCRITA):
+            bloco = linhas[i:i + BLOCO_ESCRITA]
+            executar(cursor, "INSERT INTO Consulta (CodCli, CodMed, CpfPaciente, Data_Hora) VALUES "
+                     + ", ".join(["(%s, %s, %s, %s)"] * len(bloco)), [valor for linha in bloco for valor in linha])
+        if remover_log:
+            ids = validas["IdLog"].tolist()
+            executar(cursor, f"DELETE FROM Log_Cancelamento WHERE IdLog IN ({', '.join(['%s'] * len(ids))})", ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return df.assign(Recuperada=df["Motivo"] == "")
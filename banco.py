@@ -0,0 +1,272 @@
+"""Acesso ao banco ConsultasMedicas: configuração e pool de conexões."""
+import os
+import re
+import threading
+import time
+
+import mysql.connector
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from mysql.connector import FieldFlag, FieldType, pooling
+from mysql.connector.errors import PoolError
+
+import medicao
+
+# --- CONFIGURAÇÃO (pode ser sobrescrita por variáveis de ambiente) ---
+DB_HOST = os.environ.get("DB_HOST", "localhost")
+DB_NAME = os.environ.get("DB_NAME", "ConsultasMedicas")
+DB_USER = os.environ.get("DB_USER", "root")          # usados pelos scripts de linha de comando;
+DB_PASSWORD = os.environ.get("DB_PASSWORD", "")      # o app usa o login da barra lateral
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "3600"))  # segundos de vida de cada conexão
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "5"))   # espera máxima por uma conexão livre
+CACHE_TTL = int(os.environ.get("CACHE_TTL", "60"))                  # segundos que um resultado fica em cache
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "256")) # resultados guardados (os mais antigos saem)
+DASHBOARD_PARALELO = os.environ.get("DASHBOARD_PARALELO", "1") == "1"  # consultas do Dashboard em paralelo
+# O pool é um só para todas as sessões do mesmo login: cada Dashboard aberto
+# ocupa 1 + DASHBOARD_WORKERS conexões, então o padrão fica bem abaixo do pool
+DASHBOARD_WORKERS = int(os.environ.get("DASHBOARD_WORKERS", str(max(1, min(2, DB_POOL_SIZE - 2)))))
+DASHBOARD_TIMEOUT = float(os.environ.get("DASHBOARD_TIMEOUT", "30"))  # segundos por carga do Dashboard
+DASHBOARD_INCREMENTAL = os.environ.get("DASHBOARD_INCREMENTAL", "0") == "1"  # agregados em memória (agregados.py)
+LEITURA_COLUNAR = os.environ.get("LEITURA_COLUNAR", "1") == "1"     # resultados lidos em lotes para Arrow
+LEITURA_LOTE = int(os.environ.get("LEITURA_LOTE", "5000"))          # linhas por fetchmany
+BLOCO_ESCRITA = int(os.environ.get("BLOCO_ESCRITA", "500"))         # linhas por transação no cancelamento e na recuperação em massa
+
+
+class ConexaoEmprestada:
+    """Conexão retirada do PoolConexoes.
+
+    Funciona como a conexão do mysql.connector; close() a devolve ao pool uma
+    única vez e `devolvida` diz se isso já aconteceu, sem olhar os atributos
+    internos do PooledMySQLConnection.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.devolvida = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if not self.devolvida:
+            self.devolvida = True  # mesmo se a devolução falhar, não tenta de novo
+            self._conn.close()
+
+
+class PoolConexoes:
+    """Pool de conexões MySQL para um par (usuário, host, banco).
+
+    O pool do mysql.connector já faz o ping (is_connected) em cada retirada e
+    reconecta se a conexão caiu; aqui acrescentamos a reciclagem das conexões
+    mais antigas que DB_POOL_RECYCLE e a espera quando o pool está esgotado.
+    """
+
+    def __init__(self, usuario, senha, host=DB_HOST, database=DB_NAME,
+                 tamanho=DB_POOL_SIZE, reciclar=DB_POOL_RECYCLE, espera=DB_POOL_TIMEOUT):
+        self.chave = (usuario, host, database)
+        self.tamanho = max(1, min(tamanho, pooling.CNX_POOL_MAXSIZE))
+        self.reciclar = reciclar
+        self.espera = espera
+        self._abertura = {}  # connection_id no servidor -> instante em que a conexão foi aberta
+        self._lock = threading.Lock()
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name="pool_consultas",
+            pool_size=self.tamanho,
+            pool_reset_session=True,
+            host=host,
+            user=usuario,
+            password=senha,
+            database=database,
+        )
+
+    def obter(self):
+        """Retira uma conexão do pool (ConexaoEmprestada). conn.close() a devolve ao pool."""
+        limite = time.monotonic() + self.espera
+        while True:
+            try:
+                conn = self._pool.get_connection()
+                break
+            except PoolError:
+                # Pool esgotado: aguarda outra sessão devolver uma conexão
+                if time.monotonic() >= limite:
+                    raise
+                time.sleep(0.05)
+
+        # Uma reconexão (do ping do pool ou a daqui) abre outra sessão no
+        # servidor, com outro connection_id: a idade conta a partir dela
+        id_servidor = conn.connection_id
+        agora = time.monotonic()
+        with self._lock:
+            aberta_em = self._abertura.setdefault(id_servidor, agora)
+        if agora - aberta_em > self.reciclar:
+            # Conexão velha: reabre para evitar timeouts do servidor (wait_timeout)
+            try:
+                conn.reconnect(attempts=2, delay=0)
+            except mysql.connector.Error:
+                conn.close()
+                raise
+            with self._lock:
+                self._abertura.pop(id_servidor, None)
+                self._abertura[conn.connection_id] = time.monotonic()
+        return ConexaoEmprestada(conn)
+
+
+def conectar(usuario=DB_USER, senha=DB_PASSWORD, host=DB_HOST, database=DB_NAME):
+    # Conexão avulsa para scripts de linha de comando (fora do Streamlit)
+    return mysql.connector.connect(host=host, user=usuario, password=senha, database=database)
+
+
+# --- EXECUÇÃO DE CONSULTAS ---
+def normalizar_sql(sql):
+    # Colapsa espaços e quebras de linha para que a indentação não mude a chave de cache
+    return " ".join(sql.split())
+
+
+# --- LEITURA COLUNAR ---
+# pd.read_sql guarda o resultado inteiro como lista de tuplas antes de montar
+# colunas object. Aqui o cursor é lido em lotes de LEITURA_LOTE linhas e cada
+# lote vira um array Arrow por coluna, com o tipo tirado do cursor: só um lote
+# de tuplas fica em memória. Texto repetido (códigos CHAR, Especialidade, nome
+# do médico ou da clínica em listagens) vira category.
+TIPOS_ARROW = {
+    FieldType.TINY: pa.int64(), FieldType.SHORT: pa.int64(), FieldType.LONG: pa.int64(),
+    FieldType.INT24: pa.int64(), FieldType.LONGLONG: pa.int64(), FieldType.YEAR: pa.int64(),
+    FieldType.FLOAT: pa.float64(), FieldType.DOUBLE: pa.float64(),
+    FieldType.DECIMAL: pa.float64(), FieldType.NEWDECIMAL: pa.float64(),  # como o coerce_float do read_sql
+    FieldType.DATETIME: pa.timestamp("us"), FieldType.TIMESTAMP: pa.timestamp("us"),
+    FieldType.DATE: pa.date32(), FieldType.NEWDATE: pa.date32(), FieldType.TIME: pa.duration("us"),
+    FieldType.STRING: pa.string(), FieldType.VAR_STRING: pa.string(), FieldType.VARCHAR: pa.string(),
+    FieldType.ENUM: pa.string(),
+}
+CATEGORIA_MIN_LINHAS = 100   # resultados pequenos (agregados do Dashboard) ficam como texto
+CATEGORIA_FRACAO = 0.5       # no máximo um valor distinto a cada 2 linhas
+
+
+def tipo_arrow(descricao):
+    # Tipo Arrow de uma coluna de cursor.description (None: deixa o Arrow inferir).
+    # Os códigos de tipo são os do protocolo MySQL, iguais no mysql.connector e no
+    # PyMySQL/aiomysql; só o mysql.connector traz as flags (UNSIGNED) no índice 7
+    if descricao[1] == FieldType.LONGLONG and len(descricao) > 7 and descricao[7] & FieldFlag.UNSIGNED:
+        return pa.uint64()
+    return TIPOS_ARROW.get(descricao[1])
+
+
+def tabela_arrow(descricao, linhas):
+    """pa.Table com as linhas já lidas de um cursor e os tipos de descricao."""
+    tipos = [tipo_arrow(d) for d in descricao]
+    colunas = list(zip(*linhas)) if linhas else [()] * len(descricao)
+    arrays = [_array_lote(valores, tipo) if tipo else pa.array(valores) for valores, tipo in zip(colunas, tipos)]
+    return pa.Table.from_arrays(arrays, names=[d[0] for d in descricao])
+
+
+def _array_lote(valores, tipo):
+    if tipo == pa.float64():
+        # DECIMAL chega como decimal.Decimal, que o Arrow não converte direto para double
+        return pa.array(valores).cast(tipo) if any(v is not None for v in valores) else pa.nulls(len(valores), tipo)
+    return pa.array(valores, type=tipo)
+
+
+def _coluna_pandas(lotes, tipo):
+    coluna = pa.chunked_array(lotes, type=tipo)
+    if (pa.types.is_string(tipo) and len(coluna) >= CATEGORIA_MIN_LINHAS
+            and pc.count_distinct(coluna).as_py() <= len(coluna) * CATEGORIA_FRACAO):
+        return coluna.combine_chunks().dictionary_encode().to_pandas()
+    return coluna.to_pandas()
+
+
+def ler_colunar(conn, sql, params=(), tamanho_lote=LEITURA_LOTE):
+    """Executa sql e devolve um DataFrame montado lote a lote a partir do cursor."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, tuple(params) if params else None)
+        nomes = [d[0] for d in cursor.description]
+        tipos = [tipo_arrow(d) for d in cursor.description]
+        lotes = [[] for _ in nomes]
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                break
+            for i, valores in enumerate(zip(*linhas)):
+                # Tipo desconhecido (BLOB, JSON, BIT...): guarda os objetos Python
+                lotes[i].append(_array_lote(valores, tipos[i]) if tipos[i] else valores)
+    except Exception:
+        # Linhas não lidas deixariam a conexão (do pool) inutilizável
+        if conn.unread_result:
+            conn.consume_results()
+        raise
+    finally:
+        cursor.close()
+
+    colunas = {}
+    for i, tipo in enumerate(tipos):
+        if tipo:
+            colunas[i] = _coluna_pandas(lotes[i], tipo)
+        else:
+            colunas[i] = pd.Series([v for lote in lotes[i] for v in lote], dtype=object)
+        lotes[i] = None  # libera os lotes da coluna já convertida
+    df = pd.DataFrame(colunas)
+    df.columns = nomes  # nomes repetidos (SELECT a.x, b.x) são permitidos, como no read_sql
+    return df
+
+
+# Todo acesso ao banco passa por ler_sql (leituras) ou executar / executar_lote
+# (escritas), que registram tempo, linhas e bytes de cada comando em medicao.py
+def ler_sql(conn, sql, params=(), colunar=LEITURA_COLUNAR):
+    inicio = time.perf_counter()
+    if colunar:
+        df = ler_colunar(conn, sql, params)
+    else:
+        df = pd.read_sql(sql, conn, params=tuple(params) if params else None)
+    medicao.registrar(sql, params, inicio, time.perf_counter(), len(df),
+                      int(df.memory_usage(deep=True).sum()), conn)
+    return df
+
+
+def executar(cursor, sql, params=()):
+    inicio = time.perf_counter()
+    cursor.execute(sql, tuple(params) if params else None)
+    medicao.registrar(sql, params, inicio, time.perf_counter(), max(cursor.rowcount, 0))
+    escrita = RE_ESCRITA.match(sql)
+    if escrita:
+        marcar_escrita(escrita.group(1))
+    return cursor
+
+
+def executar_lote(cursor, sql, lista_params):
+    # executemany instrumentado: um registro por lote, com os parâmetros da primeira linha
+    inicio = time.perf_counter()
+    cursor.executemany(sql, lista_params)
+    medicao.registrar(sql, lista_params[0] if lista_params else (), inicio, time.perf_counter(),
+                      max(cursor.rowcount, 0))
+    escrita = RE_ESCRITA.match(sql)
+    if escrita:
+        marcar_escrita(escrita.group(1))
+    return cursor
+
+
+# --- VERSÃO DOS DADOS ---
+# Contadores de escritas feitas por este processo, por tabela; resultados
+# guardados com uma versão antiga devem ser descartados
+RE_ESCRITA = re.compile(r"\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE\s+(?:TABLE\s+)?)"
+                        r"\s*`?(\w+)", re.IGNORECASE)
+_versoes = {}
+_versao_lock = threading.Lock()
+
+
+def marcar_escrita(tabela):
+    with _versao_lock:
+        _versoes[tabela] = _versoes.get(tabela, 0) + 1
+
+
+def versao_dados(tabela=None):
+    # Sem tabela: total de escritas (qualquer escrita invalida)
+    with _versao_lock:
+        return _versoes.get(tabela, 0) if tabela else sum(_versoes.values())
@@ -0,0 +1,347 @@
+"""Benchmark dos comandos SQL que o app envia ao banco, página por página.
+
+Usa os mesmos construtores de SQL que app.py (dashboard, consultas, busca,
+cadastros, auditoria, cancelamento), com parâmetros tirados dos dados: o
+médico, a clínica e o paciente com mais consultas, o período inteiro etc.
+Cada comando roda algumas vezes e o relatório JSON guarda mínimo, mediana,
+p95 e linhas devolvidas, junto com o commit do git e o tamanho das tabelas,
+para comparar execuções entre commits.
+
+Uso:
+    python benchmark.py --saida bench.json
+    python benchmark.py --escalas 10k,1m --semente 42 --saida bench.json
+    python benchmark.py --comparar bench_antigo.json
+    python benchmark.py --apresentacao --saida bench_memoria.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import agenda
+import agregados
+import auditoria
+import busca
+import cadastros
+import cancelamento
+import consultas
+import dashboard
+import gerador_dados
+import ocupacao
+import referencia
+import snapshot
+from banco import DB_NAME, conectar, ler_sql
+
+REPETICOES = 5
+TAMANHOS_LOG = [200, 10_000, 100_000]  # linhas do log para os rótulos da recuperação
+TAMANHOS_OCUPACAO = [100_000, 1_000_000]  # consultas (dois anos, 500 médicos) no cálculo da ocupação
+# Listagens grandes: também medem o pico de memória da leitura colunar e do pd.read_sql
+COMANDOS_MEMORIA = {"lista pacientes", "pacientes", "histórico do paciente", "agenda do médico", "consultas da clínica"}
+TABELAS = ["Clinica", "Medico", "Paciente", "Consulta", "Log_Cancelamento", "Consulta_Diaria"]
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def contagens(conn):
+    return {tabela: int(ler_sql(conn, f"SELECT COUNT(*) AS n FROM {tabela}")["n"][0]) for tabela in TABELAS}
+
+
+def amostrar_parametros(conn):
+    # Entidades mais movimentadas: o pior caso das telas de detalhe
+    def mais_frequente(coluna):
+        df = ler_sql(conn, f"SELECT {coluna} AS chave FROM Consulta GROUP BY {coluna} ORDER BY COUNT(*) DESC LIMIT 1")
+        return df["chave"][0] if not df.empty else None
+
+    periodo = ler_sql(conn, "SELECT MIN(Data_Hora) AS inicio, MAX(Data_Hora) AS fim FROM Consulta")
+    hoje = datetime.date.today()
+    inicio = periodo["inicio"][0].date() if pd.notna(periodo["inicio"][0]) else hoje
+    fim = periodo["fim"][0].date() if pd.notna(periodo["fim"][0]) else hoje
+    cod_med = mais_frequente("CodMed")
+    medico = ler_sql(conn, "SELECT NomeMed, Especialidade FROM Medico WHERE CodMed = %s", (cod_med,))
+    ultima = ler_sql(conn, "SELECT CpfPaciente, CodMed, CodCli, Data_Hora FROM Consulta ORDER BY IdConsulta DESC LIMIT 1")
+    meio = ler_sql(conn, "SELECT (MIN(IdConsulta) + MAX(IdConsulta)) DIV 2 AS id FROM Consulta")["id"][0]
+    return {
+        "data_inicio": inicio,
+        "data_fim": fim,
+        # Últimos 30 dias do período: o filtro mais comum no dia a dia
+        "mes_inicio": max(inicio, fim - datetime.timedelta(days=30)),
+        "cod_med": cod_med,
+        "cod_cli": mais_frequente("CodCli"),
+        "cpf": mais_frequente("CpfPaciente"),
+        # Sobrenome do médico mais movimentado (FULLTEXT) e um termo curto (prefixo)
+        "termo_medico": medico["NomeMed"][0].split()[-1] if not medico.empty else "Silva",
+        "termo_curto": "an",
+        "especialidade": medico["Especialidade"][0] if not medico.empty else "Todas",
+        "id_meio": int(meio) if pd.notna(meio) else 0,
+        "ultima": ultima.iloc[0].tolist() if not ultima.empty else None,
+    }
+
+
+def comandos_por_pagina(conn, p):
+    # Os comandos de cada página do app, na ordem em que app.py os envia.
+    # Os filtros de busca entram como subconsulta no WHERE da listagem, como no app.
+    busca_med = busca.filtro_busca("medico", p["termo_medico"], "c.CodMed")
+    busca_pac_curta = busca.filtro_busca("paciente", p["termo_curto"], "p.CpfPaciente")
+    paginas = {"Dashboard": []}
+    for nome, comando in dashboard.consultas_dashboard(p["data_inicio"], p["data_fim"]).items():
+        paginas["Dashboard"].append((f"{nome} (período todo)", comando))
+    for nome, comando in dashboard.consultas_dashboard(p["mes_inicio"], p["data_fim"], p["especialidade"],
+                                                       "Mês").items():
+        paginas["Dashboard"].append((f"{nome} (30 dias, especialidade)", comando))
+    # Modo incremental: novidades acima das marcas (as últimas 1000 consultas e cancelamentos)
+    marcas = ler_sql(conn, agregados.SQL_MARCAS)
+    paginas["Dashboard"] += [
+        ("incremental: marcas", (agregados.SQL_MARCAS, ())),
+        ("incremental: consultas novas", agregados.sql_novas(int(marcas["consulta"][0]) - agregados.MARGEM_IDS)),
+        ("incremental: cancelamentos novos", agregados.sql_canceladas(int(marcas["log"][0]) - agregados.MARGEM_IDS)),
+        # Snapshot Parquet: o que cada atualização sempre lê do banco
+        ("snapshot: assinaturas dos meses", (snapshot.SQL_ASSINATURAS, ())),
+        ("snapshot: assinaturas das dimensões", (snapshot.SQL_ASSINATURA_DIMENSOES, ())),
+        ("snapshot: fatos do último mês", snapshot.sql_fatos(p["data_fim"].year, p["data_fim"].month)),
+    ]
+    # Ocupação das agendas: pares (CodMed, Data_Hora) e (CodCli, CodMed, Data_Hora) dos últimos 30 dias
+    medicos, clinicas = referencia.obter(conn, "medicos"), referencia.obter(conn, "clinicas")
+    if len(medicos) and len(clinicas):
+        paginas["Dashboard"] += [
+            ("ocupação: pares (30 dias)", ocupacao.sql_pares(medicos.codigos, p["mes_inicio"], p["data_fim"])),
+            ("ocupação: clínicas (30 dias)", ocupacao.sql_pares_clinicas(clinicas.codigos, p["mes_inicio"], p["data_fim"])),
+        ]
+
+    paginas["Gerenciar Consultas"] = [
+        ("lista primeira página", consultas.sql_listar_consultas([], 0, 51)),
+        ("lista página do meio", consultas.sql_listar_consultas([], p["id_meio"], 51)),
+        ("lista filtrada por médico", consultas.sql_listar_consultas([busca_med], 0, 51)),
+        ("total aproximado", consultas.sql_total_aproximado("Consulta")),
+        # Listas de referência: lidas uma vez e guardadas em memória pelo app
+        ("lista médicos", (referencia.ENTIDADES["medicos"][1], ())),
+        ("sugestões de paciente (prefixo)", busca.sql_sugestoes_pacientes(p["termo_curto"])),
+        ("lista clínicas", (referencia.ENTIDADES["clinicas"][1], ())),
+        ("versões das tabelas", ("SELECT Tabela, Versao FROM Controle_Versao", ())),
+        ("lista pacientes", consultas.sql_lista_pacientes()),
+        ("paciente", consultas.sql_paciente(p["cpf"])),
+        ("horários livres (7 dias)", agenda.sql_agenda_periodo(
+            p["cod_med"], p["mes_inicio"], p["mes_inicio"] + datetime.timedelta(days=7))),
+        ("prévia cancelamento em massa", cancelamento.sql_contar(cancelamento.filtro_cancelamento(p["cod_med"]))),
+    ]
+
+    paginas["Gerenciar Cadastros"] = [
+        ("pacientes", cadastros.sql_pacientes()),
+        ("pacientes filtrados", cadastros.sql_pacientes([busca_pac_curta])),
+        ("histórico do paciente", cadastros.sql_historico_paciente(p["cpf"])),
+        ("médicos", cadastros.sql_medicos()),
+        ("agenda do médico", cadastros.sql_agenda_medico(p["cod_med"], limite=26)),
+        ("consultas do médico por mês", cadastros.sql_consultas_por_mes_medico(p["cod_med"])),
+        ("clínicas", cadastros.sql_clinicas()),
+        ("consultas da clínica", cadastros.sql_consultas_clinica(p["cod_cli"], limite=26)),
+        ("especialidades da clínica", cadastros.sql_especialidades_clinica(p["cod_cli"])),
+    ]
+
+    paginas["Auditoria"] = [
+        ("log primeira página", auditoria.sql_log(limite=51)),
+        ("log 30 dias", auditoria.sql_log(p["mes_inicio"], p["data_fim"], limite=51)),
+        ("total do log 30 dias", auditoria.sql_contar_log(p["mes_inicio"], p["data_fim"])),
+        ("lotes de cancelamento", auditoria.sql_lotes()),
+        ("recuperadas", auditoria.sql_recuperadas()),
+    ]
+    if p["ultima"]:
+        cpf, cod_med, cod_cli, data_hora = p["ultima"]
+        data_hora = data_hora.to_pydatetime()
+        paginas["Auditoria"].append(("validação da recuperação",
+                                     auditoria.sql_validar_recuperacao(cpf, cod_med, cod_cli, data_hora)))
+    ids_log = ler_sql(conn, "SELECT IdLog FROM Log_Cancelamento ORDER BY IdLog DESC LIMIT 100")["IdLog"].tolist()
+    if ids_log:
+        paginas["Auditoria"].append(("validação em lote (100 entradas)", auditoria.sql_validar_lote(ids_log)))
+    return paginas
+
+
+def medir(conn, sql, params, repeticoes=REPETICOES):
+    tempos, linhas = [], 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        linhas = len(ler_sql(conn, sql, params))
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos = np.array(tempos)
+    return {
+        "min_ms": round(float(tempos.min()), 3),
+        "mediana_ms": round(float(np.median(tempos)), 3),
+        "p95_ms": round(float(np.percentile(tempos, 95)), 3),
+        "linhas": linhas,
+    }
+
+
+def medir_memoria(conn, sql, params):
+    # Pico alocado pelo Python durante a leitura (tracemalloc) e tamanho do DataFrame
+    medida = {}
+    for nome, colunar in [("colunar", True), ("read_sql", False)]:
+        tracemalloc.start()
+        try:
+            df = ler_sql(conn, sql, params, colunar=colunar)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        medida[f"pico_kb_{nome}"] = round(pico / 1024, 1)
+        medida[f"df_kb_{nome}"] = round(int(df.memory_usage(deep=True).sum()) / 1024, 1)
+    return medida
+
+
+def log_sintetico(linhas, semente=42):
+    # Log_Cancelamento com o mesmo esquema e tipos que ler_sql devolve
+    rng = np.random.default_rng(semente)
+    motivos = np.array(["Consulta Removida pelo Sistema", "Paciente desmarcou por telefone",
+                        "Médico em congresso - reagendar toda a agenda da semana", None], dtype=object)
+    return pd.DataFrame({
+        "IdLog": np.arange(linhas, 0, -1),
+        "Usuario": "root@localhost",
+        "DataCancelamento": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10**8, linhas), unit="s"),
+        "IdConsultaDeletada": rng.integers(1, 10**7, linhas),
+        "CpfPaciente": rng.integers(10**10, 10**11, linhas).astype(str),
+        "CodMed": "M000001",
+        "CodCli": "C000001",
+        "Data_Hora": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10**8, linhas), unit="s"),
+        "Motivo": motivos[rng.integers(0, len(motivos), linhas)],
+    })
+
+
+def pares_sinteticos(linhas, medicos=500, semente=42):
+    # Pares (CodMed, Data_Hora) na grade de agenda.py, ordenados como ocupacao.sql_pares devolve
+    rng = np.random.default_rng(semente)
+    codigos = [f"M{i:06d}" for i in range(medicos)]
+    datas = (np.datetime64("2023-01-01T07:00") + rng.integers(0, 730, linhas).astype("timedelta64[D]")
+             + (rng.integers(0, ocupacao.SLOTS_DIA, linhas) * ocupacao.PASSO).astype("timedelta64[m]"))
+    pares = pd.DataFrame({"CodMed": pd.Categorical.from_codes(rng.integers(0, medicos, linhas), codigos),
+                          "Data_Hora": datas.astype("datetime64[us]")})
+    return pares.sort_values(["CodMed", "Data_Hora"], ignore_index=True), codigos
+
+
+def medir_apresentacao(repeticoes=REPETICOES, log=print):
+    # Montagem em memória das opções da recuperação (Auditoria) e da ocupação
+    # das agendas (Dashboard), sem banco
+    resultados = []
+    for linhas in TAMANHOS_LOG:
+        df_log = log_sintetico(linhas)
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            auditoria.rotulos_log(df_log)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        medida = {"min_ms": round(min(tempos), 3), "mediana_ms": round(float(np.median(tempos)), 3),
+                  "p95_ms": round(float(np.percentile(tempos, 95)), 3), "linhas": linhas}
+        resultados.append({"pagina": "Auditoria", "comando": f"rótulos da recuperação ({linhas} linhas)", **medida})
+        log(f"  {'Auditoria':<20} {resultados[-1]['comando']:<40} {medida['mediana_ms']:>10.2f} ms")
+    for linhas in TAMANHOS_OCUPACAO:
+        pares, codigos = pares_sinteticos(linhas)
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            ocupacao.calcular(pares, codigos, datetime.date(2023, 1, 1), datetime.date(2024, 12, 31))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        medida = {"min_ms": round(min(tempos), 3), "mediana_ms": round(float(np.median(tempos)), 3),
+                  "p95_ms": round(float(np.percentile(tempos, 95)), 3), "linhas": linhas}
+        resultados.append({"pagina": "Dashboard", "comando": f"ocupação das agendas ({linhas} consultas)", **medida})
+        log(f"  {'Dashboard':<20} {resultados[-1]['comando']:<40} {medida['mediana_ms']:>10.2f} ms")
+    return resultados
+
+
+def executar(conn, repeticoes=REPETICOES, log=print):
+    parametros = amostrar_parametros(conn)
+    resultados = []
+    for pagina, comandos in comandos_por_pagina(conn, parametros).items():
+        for nome, (sql, params) in comandos:
+            medida = medir(conn, sql, params, repeticoes)
+            if nome in COMANDOS_MEMORIA:
+                medida.update(medir_memoria(conn, sql, params))
+            resultados.append({"pagina": pagina, "comando": nome, **medida})
+            log(f"  {pagina:<20} {nome:<40} {medida['mediana_ms']:>10.2f} ms  {medida['linhas']:>8} linhas")
+    return {
+        "tabelas": contagens(conn),
+        "parametros": {chave: str(valor) for chave, valor in parametros.items()},
+        "resultados": resultados,
+    }
+
+
+def comparar(atual, anterior):
+    # Razão entre as medianas (atual / anterior) por escala, página e comando
+    def indice(relatorio):
+        return {(rodada["escala"], r["pagina"], r["comando"]): r["mediana_ms"]
+                for rodada in relatorio["rodadas"] for r in rodada["resultados"]}
+
+    antes = indice(anterior)
+    linhas = []
+    for chave, mediana in indice(atual).items():
+        if chave in antes and antes[chave] > 0:
+            linhas.append((*chave, antes[chave], mediana, mediana / antes[chave]))
+    return sorted(linhas, key=lambda linha: linha[-1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede os comandos SQL do app, página por página.")
+    parser.add_argument("--escalas", help="gera os dados em cada escala antes de medir (ex.: 10k,1m). "
+                                          "ATENÇÃO: apaga os dados atuais do banco")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--saida", default="benchmark.json", help="relatório JSON")
+    parser.add_argument("--comparar", help="relatório JSON anterior para comparar as medianas")
+    parser.add_argument("--apresentacao", action="store_true",
+                        help="mede só a montagem das telas em memória (não conecta ao banco)")
+    args = parser.parse_args(argv)
+
+    log = lambda msg: print(msg, file=sys.stderr)  # noqa: E731
+    relatorio = {
+        "commit": commit_atual(),
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "banco": DB_NAME,
+        "python": platform.python_version(),
+        "repeticoes": args.repeticoes,
+        "semente": args.semente if args.escalas else None,
+        "rodadas": [],
+    }
+    if args.apresentacao:
+        log("Medindo a apresentação (em memória)...")
+        relatorio["rodadas"].append({"escala": "memória", "resultados": medir_apresentacao(args.repeticoes, log)})
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f"Relatório: {args.saida}")
+        return
+
+    conn = conectar()
+    try:
+        relatorio["mysql"] = ler_sql(conn, "SELECT VERSION() AS v")["v"][0]
+        for nome_escala in (args.escalas.split(",") if args.escalas else [None]):
+            if nome_escala:
+                log(f"Gerando escala {nome_escala}...")
+                gerador_dados.limpar(conn)
+                gerador_dados.gerar(conn, gerador_dados.escala(nome_escala), args.semente, log=log)
+            log(f"Medindo ({nome_escala or 'dados atuais'})...")
+            rodada = executar(conn, args.repeticoes, log=log)
+            rodada["escala"] = nome_escala or "atual"
+            relatorio["rodadas"].append(rodada)
+    finally:
+        conn.close()
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"Relatório: {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        print(f"\nComparação com {anterior.get('commit')} (mediana atual / anterior):")
+        for escala, pagina, comando, antes, agora, razao in comparar(relatorio, anterior):
+            print(f"  {escala:<6} {pagina:<20} {comando:<40} {antes:>9.2f} -> {agora:>9.2f} ms  x{razao:.2f}")
+
+
+if __name__ == "__main__":
+    main()
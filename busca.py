@@ -0,0 +1,141 @@
+"""Busca por nome de pacientes, médicos e clínicas.
+
+Usa os índices FULLTEXT de NomePac/NomeMed/NomeCli (script_banco.sql) e,
+para termos curtos demais para o FULLTEXT, um prefixo na coluna normalizada
+(minúsculas, collation sem acento) indexada. Todas as caixas de busca do app
+passam por filtro_busca(), uma subconsulta no WHERE da listagem (sem limite
+de resultados). O CPF é buscado pelo início do número. Os seletores de paciente dos formulários usam
+sugerir_pacientes(): no máximo 20 pacientes por prefixo de CPF ou de nome.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import referencia
+from banco import ler_sql
+
+LIMITE_BUSCA = 200
+FT_MIN_TOKEN = 3  # innodb_ft_min_token_size padrão do MySQL
+LIMITE_SUGESTOES = 20
+SUGESTAO_MIN = 2        # caracteres digitados antes de consultar o banco
+CACHE_SUGESTOES = 256   # resultados recentes guardados (os mais antigos saem)
+
+ENTIDADES = {
+    "paciente": {"tabela": "Paciente", "chave": "CpfPaciente", "nome": "NomePac", "normalizado": "NomePacBusca"},
+    "medico": {"tabela": "Medico", "chave": "CodMed", "nome": "NomeMed", "normalizado": "NomeMedBusca"},
+    "clinica": {"tabela": "Clinica", "chave": "CodCli", "nome": "NomeCli", "normalizado": "NomeCliBusca"},
+}
+
+
+def _palavras(termo):
+    # Remove os operadores do modo booleano do FULLTEXT
+    return re.sub(r'[+\-<>()~*"@]', " ", termo).lower().split()
+
+
+def _prefixo_like(termo):
+    return re.sub(r"([\\%_])", r"\\\1", termo) + "%"
+
+
+def _digitos_cpf(termo):
+    # CPF digitado com ou sem pontuação ("123.456" -> "123456"); None se não for CPF
+    digitos = re.sub(r"[.\-\s]", "", termo)
+    return digitos if digitos.isdigit() else None
+
+
+def _condicao(entidade, termo):
+    # (where, params, ordem, params da ordem) sobre a tabela da entidade
+    cfg = ENTIDADES[entidade]
+    termo = " ".join(termo.split())
+
+    cpf = _digitos_cpf(termo) if entidade == "paciente" else None
+    if cpf:
+        return "CpfPaciente LIKE %s", (_prefixo_like(cpf),), "CpfPaciente", ()
+
+    palavras = _palavras(termo)
+    longas = [p for p in palavras if len(p) >= FT_MIN_TOKEN]
+    if longas:
+        match = f"MATCH({cfg['nome']}) AGAINST (%s IN BOOLEAN MODE)"
+        expressao = " ".join(f"+{p}*" for p in longas)
+        where, params = [match], [expressao]
+        for curta in (p for p in palavras if len(p) < FT_MIN_TOKEN):
+            where.append(f"CONCAT(' ', {cfg['normalizado']}) LIKE %s")
+            params.append("% " + _prefixo_like(curta))
+        return " AND ".join(where), tuple(params), f"{match} DESC", (expressao,)
+
+    # Termo curto: prefixo na coluna normalizada (usa o índice B-tree)
+    return f"{cfg['normalizado']} LIKE %s", (_prefixo_like(termo.lower()),), cfg["normalizado"], ()
+
+
+def condicao_busca(entidade, termo):
+    """Trecho de WHERE (e parâmetros) sobre a tabela da entidade para o termo.
+
+    CPF (só dígitos, com ou sem pontuação): prefixo na chave primária.
+    Palavras com FT_MIN_TOKEN letras ou mais: todas no FULLTEXT (como
+    prefixo); as mais curtas do mesmo termo ("da" em "da Silva") precisam
+    começar uma palavra do nome normalizado, conferido só nas linhas que o
+    FULLTEXT já achou. Só palavras curtas: prefixo do nome normalizado.
+    """
+    where, params, _, _ = _condicao(entidade, termo)
+    return where, params
+
+
+def sql_busca(entidade, termo, limite=LIMITE_BUSCA):
+    # As `limite` chaves mais relevantes (FULLTEXT) ou em ordem (prefixo)
+    cfg = ENTIDADES[entidade]
+    where, params, ordem, params_ordem = _condicao(entidade, termo)
+    sql = f"""
+    SELECT {cfg['chave']} AS chave
+    FROM {cfg['tabela']}
+    WHERE {where}
+    ORDER BY {ordem}
+    LIMIT %s
+    """
+    return sql, params + params_ordem + (limite,)
+
+
+def buscar(conn, entidade, termo, limite=LIMITE_BUSCA):
+    # Chaves encontradas, das mais relevantes para as menos
+    return ler_sql(conn, *sql_busca(entidade, termo, limite))["chave"].tolist()
+
+
+def filtro_busca(entidade, termo, coluna):
+    # Trecho de WHERE (e parâmetros) restringindo `coluna` às chaves que casam
+    # com o termo: subconsulta sem limite, então a listagem traz todos os
+    # resultados (e pagina normalmente) em vez de só os mais relevantes
+    cfg = ENTIDADES[entidade]
+    where, params = condicao_busca(entidade, termo)
+    return f"{coluna} IN (SELECT {cfg['chave']} FROM {cfg['tabela']} WHERE {where})", params
+
+
+def sql_sugestoes_pacientes(termo, limite=LIMITE_SUGESTOES):
+    # Prefixo no CPF (chave primária) ou no nome normalizado (idx_Paciente_NomeBusca):
+    # lê no máximo `limite` entradas do índice, qualquer que seja o tamanho da tabela
+    termo = " ".join(termo.split())
+    digitos = _digitos_cpf(termo)
+    if digitos:
+        sql = "SELECT CpfPaciente, NomePac FROM Paciente WHERE CpfPaciente LIKE %s ORDER BY CpfPaciente LIMIT %s"
+        return sql, (_prefixo_like(digitos), limite)
+    sql = "SELECT CpfPaciente, NomePac FROM Paciente WHERE NomePacBusca LIKE %s ORDER BY NomePacBusca LIMIT %s"
+    return sql, (_prefixo_like(termo.lower()), limite)
+
+
+_sugestoes = OrderedDict()  # (termo, limite, versão de Paciente) -> [(cpf, rótulo)]
+_sugestoes_lock = threading.Lock()
+
+
+def sugerir_pacientes(conn, termo, limite=LIMITE_SUGESTOES):
+    """Pacientes cujo CPF ou nome começa com o termo: lista de (cpf, "cpf - nome")."""
+    if len(termo.strip()) < SUGESTAO_MIN:
+        return []
+    chave = (" ".join(termo.lower().split()), limite, referencia.versao(conn, "Paciente"))
+    with _sugestoes_lock:
+        if chave in _sugestoes:
+            _sugestoes.move_to_end(chave)
+            return _sugestoes[chave]
+    df = ler_sql(conn, *sql_sugestoes_pacientes(termo, limite))
+    resultado = list(zip(df["CpfPaciente"], df["CpfPaciente"] + " - " + df["NomePac"]))
+    with _sugestoes_lock:
+        _sugestoes[chave] = resultado
+        while len(_sugestoes) > CACHE_SUGESTOES:
+            _sugestoes.popitem(last=False)
+    return resultado
@@ -0,0 +1,161 @@
+"""Comandos SQL da página Gerenciar Cadastros (pacientes, médicos e clínicas).
+
+Assim como em dashboard.py, cada função devolve (sql, params). Os filtros
+são listas de (trecho_sql, parametros), como os de busca.filtro_busca.
+"""
+
+
+def _where(filtros):
+    if not filtros:
+        return "", ()
+    trechos = " AND ".join(trecho for trecho, _ in filtros)
+    return f"WHERE {trechos}", tuple(valor for _, valores in filtros for valor in valores)
+
+
+def sql_pacientes(filtros=()):
+    where, params = _where(filtros)
+    sql = f"""
+    SELECT 
+        p.CpfPaciente as CPF,
+        p.NomePac as Nome,
+        p.DataNascimento as 'Data Nascimento',
+        p.Genero as Gênero,
+        p.Telefone,
+        p.Email,
+        COUNT(c.IdConsulta) as 'Total Consultas'
+    FROM Paciente p
+    LEFT JOIN Consulta c ON p.CpfPaciente = c.CpfPaciente
+    {where}
+    GROUP BY p.CpfPaciente, p.NomePac, p.DataNascimento, p.Genero, p.Telefone, p.Email
+    ORDER BY p.NomePac ASC
+    """
+    return sql, params
+
+
+def sql_historico_paciente(cpf):
+    sql = """
+    SELECT 
+        c.IdConsulta as 'ID',
+        c.Data_Hora as 'Data/Hora',
+        m.NomeMed as 'Médico',
+        m.Especialidade,
+        cl.NomeCli as 'Clínica'
+    FROM Consulta c
+    JOIN Medico m ON c.CodMed = m.CodMed
+    JOIN Clinica cl ON c.CodCli = cl.CodCli
+    WHERE c.CpfPaciente = %s
+    ORDER BY c.Data_Hora DESC
+    """
+    return sql, (cpf,)
+
+
+def sql_medicos(filtros=()):
+    where, params = _where(filtros)
+    sql = f"""
+    SELECT 
+        m.CodMed as 'Código',
+        m.NomeMed as 'Nome',
+        m.Especialidade,
+        m.Email,
+        m.Telefone,
+        COUNT(c.IdConsulta) as 'Total Consultas',
+        COUNT(DISTINCT c.CpfPaciente) as 'Pacientes Atendidos'
+    FROM Medico m
+    LEFT JOIN Consulta c ON m.CodMed = c.CodMed
+    {where}
+    GROUP BY m.CodMed, m.NomeMed, m.Especialidade, m.Email, m.Telefone
+    ORDER BY m.NomeMed ASC
+    """
+    return sql, params
+
+
+def sql_agenda_medico(cod_med, apos=None, limite=50):
+    # Paginação por chave (keyset) em uq_Consulta_Med_Data, da mais recente
+    # para a mais antiga: Data_Hora é única por médico, então apos é só a
+    # Data/Hora da última linha da página anterior
+    pagina, params = ("AND c.Data_Hora < %s", (apos,)) if apos is not None else ("", ())
+    sql = f"""
+    SELECT 
+        c.IdConsulta as 'ID',
+        c.Data_Hora as 'Data/Hora',
+        p.NomePac as 'Paciente',
+        p.CpfPaciente as 'CPF',
+        cl.NomeCli as 'Clínica'
+    FROM Consulta c
+    JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
+    JOIN Clinica cl ON c.CodCli = cl.CodCli
+    WHERE c.CodMed = %s {pagina}
+    ORDER BY c.Data_Hora DESC
+    LIMIT %s
+    """
+    return sql, (cod_med, *params, limite)
+
+
+def sql_consultas_por_mes_medico(cod_med):
+    # Só os totais do gráfico mensal: varredura do índice (CodMed, Data_Hora), sem ler as linhas
+    sql = """
+    SELECT DATE_FORMAT(c.Data_Hora, '%Y-%m') as Mes, COUNT(*) as Quantidade
+    FROM Consulta c
+    WHERE c.CodMed = %s
+    GROUP BY Mes
+    ORDER BY Mes ASC
+    """
+    return sql, (cod_med,)
+
+
+def sql_clinicas(filtros=()):
+    where, params = _where(filtros)
+    sql = f"""
+    SELECT 
+        cl.CodCli as 'Código',
+        cl.NomeCli as 'Nome',
+        cl.Endereco as 'Endereço',
+        cl.Telefone,
+        COUNT(c.IdConsulta) as 'Total Consultas'
+    FROM Clinica cl
+    LEFT JOIN Consulta c ON cl.CodCli = c.CodCli
+    {where}
+    GROUP BY cl.CodCli, cl.NomeCli, cl.Endereco, cl.Telefone
+    ORDER BY cl.NomeCli ASC
+    """
+    return sql, params
+
+
+def sql_consultas_clinica(cod_cli, apos=None, limite=50):
+    # Paginação por chave em idx_Consulta_Cli_Data_Med (CodCli, Data_Hora, CodMed):
+    # (Data_Hora, CodMed) é única (uq_Consulta_Med_Data), então
+    # apos = (Data/Hora, Cód. Médico) da última linha da página anterior
+    pagina, params = "", ()
+    if apos is not None:
+        pagina = "AND (c.Data_Hora < %s OR (c.Data_Hora = %s AND c.CodMed < %s))"
+        params = (apos[0], apos[0], apos[1])
+    sql = f"""
+    SELECT 
+        c.IdConsulta as 'ID',
+        c.Data_Hora as 'Data/Hora',
+        p.NomePac as 'Paciente',
+        m.NomeMed as 'Médico',
+        c.CodMed as 'Cód. Médico',
+        m.Especialidade
+    FROM Consulta c
+    JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
+    JOIN Medico m ON c.CodMed = m.CodMed
+    WHERE c.CodCli = %s {pagina}
+    ORDER BY c.Data_Hora DESC, c.CodMed DESC
+    LIMIT %s
+    """
+    return sql, (cod_cli, *params, limite)
+
+
+def sql_especialidades_clinica(cod_cli):
+    # Totais por especialidade: CodMed sai do próprio idx_Consulta_Cli_Data_Med
+    # (sem ler as linhas de Consulta) e Medico entra pela chave primária
+    sql = """
+    SELECT m.Especialidade, COUNT(*) as Quantidade
+    FROM Consulta c
+    JOIN Medico m ON c.CodMed = m.CodMed
+    WHERE c.CodCli = %s
+    GROUP BY m.Especialidade
+    ORDER BY Quantidade DESC
+    """
+    return sql, (cod_cli,)
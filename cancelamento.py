@@ -0,0 +1,93 @@
+"""Cancelamento de consultas em massa.
+
+As consultas são selecionadas por filtro (médico, clínica, período) ou por
+lista de IDs e removidas em blocos, cada um em sua própria transação, para
+não segurar bloqueios por muito tempo. O gatilho trg_Auditoria_Cancelamento
+lê @motivo_cancelamento e @lote_cancelamento, então todas as linhas do log
+ficam com o motivo informado e o mesmo IdLote.
+"""
+import re
+import uuid
+
+import mysql.connector
+
+from banco import BLOCO_ESCRITA, executar, ler_sql
+
+MOTIVO_MAX = 100  # tamanho de Log_Cancelamento.Motivo
+
+
+def ids_do_texto(texto):
+    # Lista de IDs enviada pelo usuário (um por linha, CSV etc.)
+    return sorted({int(numero) for numero in re.findall(r"\d+", texto)})
+
+
+def filtro_cancelamento(cod_med=None, cod_cli=None, data_inicio=None, data_fim=None, ids=None):
+    condicoes, params = [], []
+    if ids is not None:
+        if not ids:
+            return "1 = 0", ()
+        condicoes.append(f"IdConsulta IN ({', '.join(['%s'] * len(ids))})")
+        params.extend(ids)
+    if cod_med:
+        condicoes.append("CodMed = %s")
+        params.append(cod_med)
+    if cod_cli:
+        condicoes.append("CodCli = %s")
+        params.append(cod_cli)
+    if data_inicio and data_fim:
+        condicoes.append("Data_Hora >= %s AND Data_Hora < %s + INTERVAL 1 DAY")
+        params.extend([data_inicio, data_fim])
+    if not condicoes:
+        # Sem critério nenhum cancelaria a agenda inteira
+        raise ValueError("Informe ao menos um critério para o cancelamento em massa.")
+    return " AND ".join(condicoes), tuple(params)
+
+
+def sql_contar(filtro):
+    where, params = filtro
+    return f"SELECT COUNT(*) AS total FROM Consulta WHERE {where}", params
+
+
+def contar(conn, filtro):
+    return int(ler_sql(conn, *sql_contar(filtro))["total"][0])
+
+
+def cancelar_em_lote(conn, filtro, motivo, tamanho_bloco=BLOCO_ESCRITA, progresso=None):
+    """Remove as consultas do filtro em blocos; devolve (IdLote, total removido)."""
+    where, params = filtro
+    lote = str(uuid.uuid4())
+    cursor = conn.cursor()
+    executar(cursor, "SET @motivo_cancelamento = %s, @lote_cancelamento = %s", (motivo[:MOTIVO_MAX], lote))
+    removidas, ultimo_id = 0, 0
+    try:
+        while True:
+            # Próximo bloco de IDs (keyset em IdConsulta), depois DELETE só desses IDs.
+            # O filtro se repete no DELETE: uma consulta remarcada para outro
+            # médico, clínica ou data entre o SELECT e o DELETE fica de fora
+            executar(cursor, f"SELECT IdConsulta FROM Consulta WHERE {where} AND IdConsulta > %s "
+                             f"ORDER BY IdConsulta LIMIT %s", params + (ultimo_id, tamanho_bloco))
+            ids = [linha[0] for linha in cursor.fetchall()]
+            if not ids:
+                break
+            executar(cursor, f"DELETE FROM Consulta WHERE {where} AND IdConsulta IN ({', '.join(['%s'] * len(ids))})",
+                     params + tuple(ids))
+            conn.commit()
+            removidas += cursor.rowcount
+            ultimo_id = ids[-1]
+            if progresso:
+                progresso(removidas)
+    except Exception:
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            pass  # conexão perdida: o servidor já desfez o bloco em andamento
+        raise
+    finally:
+        # Em um passo à parte: com a conexão perdida este SET também falha, e
+        # o erro dele não pode tomar o lugar do erro original
+        try:
+            executar(cursor, "SET @motivo_cancelamento = NULL, @lote_cancelamento = NULL")
+        except mysql.connector.Error:
+            pass
+        cursor.close()
+    return lote, removidas
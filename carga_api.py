@@ -0,0 +1,128 @@
+"""Teste de carga local da API do Dashboard (api.py).
+
+N clientes simultâneos repetem, durante alguns segundos, requisições às
+seções do Dashboard com alguns filtros diferentes. Por padrão cada cliente
+reenvia o último ETag de cada URL (If-None-Match), como faria um sistema que
+consulta a API periodicamente; --sem-etag mede o custo das respostas
+completas. O relatório traz requisições por segundo, latências (p50, p95,
+p99), a contagem por status HTTP e os bytes recebidos.
+
+Uso (com a API rodando em outro terminal):
+    python carga_api.py --url http://127.0.0.1:8080 --clientes 50 --segundos 20
+    python carga_api.py --formato arrow --sem-etag --saida carga.json
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+import aiohttp
+import numpy as np
+
+import dashboard
+from api import FIM_PADRAO, INICIO_PADRAO, SECOES, TIPO_ARROW
+
+CLIENTES = 20
+SEGUNDOS = 10
+# Filtros usados pelos clientes: o período padrão do app e um ano recente
+PERIODOS = [(INICIO_PADRAO, FIM_PADRAO), (datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))]
+
+
+def caminhos(formato, especialidades=("Todas",)):
+    # Uma URL por seção, período, especialidade e (só na evolução) agrupamento
+    urls = []
+    for secao, (inicio, fim), especialidade in itertools.product(SECOES, PERIODOS, especialidades):
+        for agrupamento in (dashboard.AGRUPAMENTOS if secao == "evolucao" else ["Dia"]):
+            query = {"inicio": inicio.isoformat(), "fim": fim.isoformat(), "especialidade": especialidade,
+                     "agrupamento": agrupamento, "formato": formato}
+            urls.append(f"/dashboard/{secao}?{urlencode(query)}")
+    return urls
+
+
+async def cliente(sessao, base, urls, prazo, usar_etag, medidas, deslocamento):
+    etags = {}
+    for url in itertools.islice(itertools.cycle(urls), deslocamento, None):
+        if time.monotonic() >= prazo:
+            return
+        cabecalhos = {"Accept": TIPO_ARROW} if "formato=arrow" in url else {}
+        if usar_etag and url in etags:
+            cabecalhos["If-None-Match"] = etags[url]
+        inicio = time.perf_counter()
+        try:
+            async with sessao.get(base + url, headers=cabecalhos) as resposta:
+                corpo = await resposta.read()
+                status = resposta.status
+                if "ETag" in resposta.headers:
+                    etags[url] = resposta.headers["ETag"]
+        except aiohttp.ClientError as e:
+            status, corpo = type(e).__name__, b""
+        medidas.append((time.perf_counter() - inicio, status, len(corpo)))
+
+
+async def executar_carga(base, clientes=CLIENTES, segundos=SEGUNDOS, formato="json", usar_etag=True,
+                         especialidades=("Todas",)):
+    urls = caminhos(formato, especialidades)
+    medidas = []
+    conector = aiohttp.TCPConnector(limit=clientes)
+    async with aiohttp.ClientSession(connector=conector) as sessao:
+        async with sessao.get(base + "/saude") as resposta:
+            resposta.raise_for_status()
+        inicio = time.perf_counter()
+        prazo = time.monotonic() + segundos
+        # Cada cliente começa em uma URL diferente para não andarem juntos
+        await asyncio.gather(*(cliente(sessao, base, urls, prazo, usar_etag, medidas, i % len(urls))
+                               for i in range(clientes)))
+        duracao = time.perf_counter() - inicio
+    return resumo(medidas, duracao, clientes, formato, usar_etag)
+
+
+def resumo(medidas, duracao, clientes, formato, usar_etag):
+    latencias = np.array([m[0] for m in medidas]) * 1000 if medidas else np.zeros(1)
+    return {
+        "clientes": clientes,
+        "formato": formato,
+        "etag": usar_etag,
+        "segundos": round(duracao, 2),
+        "requisicoes": len(medidas),
+        "req_por_s": round(len(medidas) / duracao, 1) if duracao else 0.0,
+        "p50_ms": round(float(np.percentile(latencias, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencias, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 2),
+        "status": {str(k): v for k, v in Counter(m[1] for m in medidas).most_common()},
+        "bytes": int(sum(m[2] for m in medidas)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API do Dashboard.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="endereço da API")
+    parser.add_argument("--clientes", default=str(CLIENTES),
+                        help="clientes simultâneos; vários separados por vírgula (ex.: 1,10,50)")
+    parser.add_argument("--segundos", type=float, default=SEGUNDOS, help="duração de cada rodada")
+    parser.add_argument("--formato", choices=["json", "arrow"], default="json")
+    parser.add_argument("--sem-etag", action="store_true", help="não envia If-None-Match")
+    parser.add_argument("--especialidades", default="Todas", help="especialidades filtradas, separadas por vírgula")
+    parser.add_argument("--saida", help="relatório JSON")
+    args = parser.parse_args(argv)
+
+    rodadas = []
+    for clientes in [int(n) for n in args.clientes.split(",")]:
+        print(f"{clientes} cliente(s) por {args.segundos:g}s...", file=sys.stderr)
+        rodada = asyncio.run(executar_carga(args.url.rstrip("/"), clientes, args.segundos, args.formato,
+                                            not args.sem_etag, args.especialidades.split(",")))
+        rodadas.append(rodada)
+        print(f"  {rodada['req_por_s']:>9.1f} req/s  p50 {rodada['p50_ms']:>8.2f} ms  p95 {rodada['p95_ms']:>8.2f} ms  "
+              f"p99 {rodada['p99_ms']:>8.2f} ms  status {rodada['status']}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"url": args.url, "rodadas": rodadas}, arquivo, ensure_ascii=False, indent=2)
+        print(f"Relatório: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""Teste de carga do app Streamlit com várias recepcionistas simultâneas.
+
+Cada sessão simulada é um AppTest (streamlit.testing) de app.py com o seu
+próprio session_state; todas rodam em threads do mesmo processo, como as
+sessões de um único "streamlit run app.py": o pool de conexões, os caches
+(st.cache_data / st.cache_resource) e o GIL são compartilhados. Não há
+websocket nem navegador, então as latências são as das reexecuções do
+script (o que faz as recepcionistas esperarem quando as reexecuções
+enfileiram), sem o tempo de rede e de desenho no navegador.
+
+As sessões seguem roteiros de navegação sorteados pelos pesos de ROTEIROS:
+
+    dashboard    troca período, especialidade e agrupamento do Dashboard
+    busca        busca consultas por paciente e médico e pagina o resultado
+    cadastros    alterna as abas de Gerenciar Cadastros e busca por nome
+    agendamento  busca um paciente, agenda pelo form_add e às vezes desiste
+                 ou cancela a consulta pelo Cancelamento em Massa
+
+Os agendamentos usam datas de 2 a 9 anos à frente (o gerador_dados vai até
+1 ano) e são apagados no fim, junto com as suas entradas no log.
+
+Para cada nível de concorrência o relatório traz reexecuções por segundo,
+latências (p50, p95, p99) no geral e por roteiro, erros, as conexões
+abertas no MySQL (Threads_connected, sem a do monitor) e a memória
+residente (RSS) do processo.
+
+Uso (banco local com dados do gerador_dados.py):
+    python carga_app.py --sessoes 1,5,10,20 --segundos 30
+    python carga_app.py --escala 100k --sessoes 10 --roteiros dashboard,busca --saida carga_app.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from unittest import mock
+
+import mysql.connector
+import numpy as np
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+
+import gerador_dados
+from agenda import HORARIOS
+from banco import DB_PASSWORD, DB_POOL_SIZE, DB_USER, conectar, executar
+
+try:
+    import resource  # RSS de pico quando não há /proc (macOS)
+except ImportError:
+    resource = None  # Windows
+
+APP = "app.py"
+SESSOES = "1,5,10"
+SEGUNDOS = 20
+TIMEOUT = 60.0                 # segundos por reexecução antes de contar erro
+INTERVALO_AMOSTRA = 0.25       # segundos entre leituras de conexões e RSS
+ROTEIROS = {"dashboard": 4, "busca": 3, "cadastros": 2, "agendamento": 1}
+PROB_DESISTENCIA = 0.2         # preenche o form_add e não agenda
+PROB_CANCELAMENTO = 0.5        # cancela a consulta que acabou de agendar
+PAUSA_ERRO = 1.0               # segundos de espera depois de um widget ausente
+DIAS_AGENDAMENTO = (2 * 365, 9 * 365)  # date_input aceita até 10 anos à frente
+MOTIVO_CARGA = "Teste de carga (carga_app.py)"
+PAGINAS = {"dashboard": "Dashboard ", "consultas": "Gerenciar Consultas (CRUD)", "cadastros": "Gerenciar Cadastros"}
+
+
+# --- RUNTIME COMPARTILHADO ---
+@contextlib.contextmanager
+def runtime_compartilhado():
+    """Durante o bloco, todas as sessões (threads) usam um Runtime só.
+
+    O AppTest supõe uma sessão por processo: cada run() instala um Runtime de
+    teste e o apaga no fim (Runtime._instance = None), o que derruba as
+    reexecuções das outras threads ("Runtime hasn't been created!"). Dentro do
+    bloco, Runtime.instance()/exists() caem no último Runtime que um AppTest
+    instalou, como no servidor de verdade; os originais voltam na saída.
+    """
+    ultimo = []
+
+    def instancia(cls):
+        if cls._instance is not None:
+            ultimo[:] = [cls._instance]
+        if not ultimo:
+            raise RuntimeError("Runtime hasn't been created!")
+        return ultimo[0]
+
+    def existe(cls):
+        return cls._instance is not None or bool(ultimo)
+
+    with mock.patch.object(Runtime, "instance", classmethod(instancia)), \
+            mock.patch.object(Runtime, "exists", classmethod(existe)):
+        yield
+
+
+def rss_mb():
+    # Memória residente deste processo, que é o mesmo que executa o app
+    try:
+        with open("/proc/self/status", encoding="ascii") as arquivo:
+            for linha in arquivo:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB no Linux, bytes no macOS
+    return pico / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def widget(at, tipo, rotulo):
+    """Widget sem key com este rótulo (os com key saem de at.<tipo>(key=...))."""
+    for elemento in getattr(at, tipo):
+        # Botões de st.form recebem do Streamlit a key "FormSubmitter:<form>-<rótulo>"
+        sem_key = elemento.key is None or elemento.key.startswith("FormSubmitter:")
+        if elemento.label == rotulo and sem_key:
+            return elemento
+    raise LookupError(f"{tipo} '{rotulo}' não está na página")
+
+
+class Monitor(threading.Thread):
+    """Amostra Threads_connected e o RSS enquanto um nível de carga roda."""
+
+    def __init__(self, usuario, senha):
+        super().__init__(daemon=True)
+        self.conn = conectar(usuario, senha)
+        self.parar = threading.Event()
+        self.conexoes = []
+        self.rss = []
+
+    def run(self):
+        cursor = self.conn.cursor()
+        while not self.parar.is_set():
+            cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads_connected'")
+            self.conexoes.append(int(cursor.fetchone()[1]) - 1)  # sem a conexão do monitor
+            memoria = rss_mb()
+            if memoria is not None:
+                self.rss.append(memoria)
+            self.parar.wait(INTERVALO_AMOSTRA)
+        cursor.close()
+        self.conn.close()
+
+
+class Sessao:
+    """Uma recepcionista: um AppTest de app.py e os roteiros que ela segue."""
+
+    def __init__(self, usuario, senha, semente, medidas, erros, agendadas, timeout=TIMEOUT, pausa=0.0):
+        self.timeout = timeout
+        self.at = None                # AppTest aberto em entrar()
+        self.usuario = usuario
+        self.senha = senha
+        self.rng = np.random.default_rng(semente)
+        self.medidas = medidas        # (segundos, roteiro, passo) de cada reexecução bem-sucedida
+        self.erros = erros            # (roteiro, passo, mensagem)
+        self.agendadas = agendadas    # (CodMed, Data_Hora) criadas pela carga
+        self.pausa = pausa
+
+    def escolher(self, opcoes):
+        return opcoes[int(self.rng.integers(len(opcoes)))]
+
+    def passo(self, roteiro, nome, alvo):
+        # Uma reexecução do script; alvo é o AppTest ou o widget já alterado
+        if self.pausa:
+            time.sleep(self.rng.uniform(0, 2 * self.pausa))
+        inicio = time.perf_counter()
+        try:
+            alvo.run()
+        except RuntimeError as e:  # tempo esgotado no AppTest
+            self.erros.append((roteiro, nome, str(e)))
+            return False
+        segundos = time.perf_counter() - inicio
+        if self.at.exception:
+            self.erros.append((roteiro, nome, self.at.exception[0].message))
+            return False
+        self.medidas.append((segundos, roteiro, nome))
+        return True
+
+    def entrar(self):
+        # Primeira visita: página aberta com o login padrão, depois usuário e senha
+        self.at = AppTest.from_file(APP, default_timeout=self.timeout)
+        self.passo("login", "abrir", self.at)
+        usuario = widget(self.at.sidebar, "text_input", "Usuário (MySQL)")
+        if usuario.value != self.usuario or self.senha:
+            usuario.input(self.usuario)
+            self.passo("login", "senha", widget(self.at.sidebar, "text_input", "Senha (MySQL)").input(self.senha))
+
+    def reabrir(self):
+        # O app devolve ao pool as conexões de uma reexecução interrompida só
+        # na reexecução seguinte da mesma sessão; a sessão descartada as
+        # devolve aqui, senão cada reabertura tiraria conexões do pool
+        state = self.at.session_state
+        for conn in (state["conexoes_rodada"] if "conexoes_rodada" in state else []):
+            if not conn.devolvida:
+                conn.close()
+        self.entrar()
+
+    def navegar(self, roteiro, pagina):
+        navegacao = widget(self.at.sidebar, "radio", "Navegação")
+        if navegacao.value != PAGINAS[pagina]:
+            self.passo(roteiro, "navegar", navegacao.set_value(PAGINAS[pagina]))
+
+    # --- ROTEIROS ---
+    def dashboard(self):
+        self.navegar("dashboard", "dashboard")
+        inicio = datetime.date.today() - datetime.timedelta(days=int(self.rng.integers(30, 5 * 365)))
+        self.passo("dashboard", "período", widget(self.at, "date_input", "Data Início").set_value(inicio))
+        especialidade = widget(self.at, "selectbox", "Especialidade")
+        self.passo("dashboard", "especialidade", especialidade.set_value(self.escolher(especialidade.options)))
+        agrupamento = self.at.radio(key="agrupamento")
+        self.passo("dashboard", "agrupamento", agrupamento.set_value(self.escolher(agrupamento.options)))
+
+    def busca(self):
+        self.navegar("busca", "consultas")
+        try:
+            paciente = widget(self.at, "text_input", "Buscar por nome do paciente")
+            termo = self.escolher(gerador_dados.NOMES)[:int(self.rng.integers(3, 6))]
+            self.passo("busca", "paciente", paciente.input(termo))
+            medico = widget(self.at, "text_input", "Buscar por nome do médico")
+            self.passo("busca", "médico", medico.input(self.escolher(gerador_dados.SOBRENOMES)))
+            proxima = widget(self.at, "button", "Próxima ➡️")
+            if not proxima.disabled:
+                self.passo("busca", "próxima página", proxima.click())
+        finally:
+            # Os termos ficam na sessão: se a busca falhar, a página de
+            # Consultas falharia também nos roteiros seguintes
+            widget(self.at, "text_input", "Buscar por nome do paciente").input("")
+            self.passo("busca", "limpar", widget(self.at, "text_input", "Buscar por nome do médico").input(""))
+
+    def cadastros(self):
+        self.navegar("cadastros", "cadastros")
+        self.passo("cadastros", "aba médicos", self.at.radio(key="aba_cadastros").set_value("medicos"))
+        self.passo("cadastros", "busca médico", self.at.text_input(key="busca_med").input(self.escolher(gerador_dados.SOBRENOMES)))
+        filtro = self.at.selectbox(key="filtro_esp")
+        self.passo("cadastros", "especialidade", filtro.set_value(self.escolher(filtro.options)))
+        self.passo("cadastros", "aba pacientes", self.at.radio(key="aba_cadastros").set_value("pacientes"))
+        self.passo("cadastros", "busca paciente", self.at.text_input(key="busca_pac").input(self.escolher(gerador_dados.NOMES)))
+
+    def agendamento(self):
+        self.navegar("agendamento", "consultas")
+        self.passo("agendamento", "busca paciente",
+                   self.at.text_input(key="nova_consulta_termo").input(self.escolher(gerador_dados.NOMES)))
+        if not self.at.selectbox(key="nova_consulta_cpf").value:
+            self.erros.append(("agendamento", "busca paciente", "nenhum paciente encontrado"))
+            return
+        # Campos do form_add: só vão ao servidor junto com o botão de envio
+        medico = widget(self.at, "selectbox", "Médico")
+        rotulo_medico = self.escolher(medico.options)
+        medico.set_value(rotulo_medico)
+        clinica = widget(self.at, "selectbox", "Clínica")
+        clinica.set_value(self.escolher(clinica.options))
+        dia = datetime.date.today() + datetime.timedelta(days=int(self.rng.integers(*DIAS_AGENDAMENTO)))
+        hora = self.escolher(HORARIOS)
+        self.at.date_input(key="nova_consulta_data").set_value(dia)
+        self.at.time_input(key="nova_consulta_hora").set_value(hora)
+        if self.rng.random() < PROB_DESISTENCIA:
+            # Desistiu: apaga o termo da busca e o form volta ao início
+            self.passo("agendamento", "desistência", self.at.text_input(key="nova_consulta_termo").input(""))
+            return
+        agendou = self.passo("agendamento", "agendar", widget(self.at, "button", "Agendar Consulta").click())
+        cod_med = rotulo_medico.split(" - ")[0]
+        # Registra mesmo sem a confirmação: a reexecução pode ter falhado ou
+        # estourado o tempo depois do INSERT (as datas da carga só têm consultas dela)
+        self.agendadas.append((cod_med, datetime.datetime.combine(dia, hora)))
+        if not agendou or not any("Agendado" in aviso.value for aviso in self.at.success):
+            return  # horário já ocupado: o app mostrou o erro e os horários livres
+        if self.rng.random() < PROB_CANCELAMENTO:
+            self.cancelar(cod_med, dia)
+
+    def cancelar(self, cod_med, dia):
+        # Cancelamento em Massa filtrando o médico e o dia da consulta agendada
+        self.passo("agendamento", "cancelar: filtro", self.at.radio(key="modo_cancel").set_value("Filtro"))
+        medico = self.at.selectbox(key="med_cancel")
+        opcao = next(o for o in medico.options if o.startswith(cod_med + " - "))
+        self.passo("agendamento", "cancelar: médico", medico.set_value(opcao))
+        self.passo("agendamento", "cancelar: período", self.at.checkbox(key="periodo_cancel").check())
+        self.passo("agendamento", "cancelar: de", self.at.date_input(key="ini_cancel").set_value(dia))
+        self.passo("agendamento", "cancelar: até", self.at.date_input(key="fim_cancel").set_value(dia))
+        self.passo("agendamento", "cancelar: motivo", self.at.text_input(key="motivo_cancel").input(MOTIVO_CARGA))
+        self.passo("agendamento", "cancelar: confirmar", self.at.checkbox(key="confirma_cancel").check())
+        self.passo("agendamento", "cancelar", widget(self.at, "button", "Cancelar Consultas").click())
+        self.passo("agendamento", "cancelar: limpar", self.at.checkbox(key="confirma_cancel").uncheck())
+
+    def executar(self, prazo, roteiros):
+        nomes = list(roteiros)
+        pesos = np.array([roteiros[nome] for nome in nomes], dtype=float)
+        try:
+            self.entrar()
+        except LookupError as e:
+            self.erros.append(("login", "abrir", str(e)))
+            return
+        while time.monotonic() < prazo:
+            roteiro = nomes[int(self.rng.choice(len(nomes), p=pesos / pesos.sum()))]
+            try:
+                getattr(self, roteiro)()
+            except (LookupError, StopIteration) as e:  # KeyError: widget com key ausente
+                # Widget ausente: a página não chegou a desenhar (erro acima ou
+                # "Desconectado"). Espera e reabre a sessão, como quem recarrega
+                # a aba: a árvore da reexecução que falhou não roda de novo
+                self.erros.append((roteiro, "widget", f"{type(e).__name__}: {e}"))
+                time.sleep(PAUSA_ERRO)
+                try:
+                    self.reabrir()
+                except LookupError as e:
+                    self.erros.append(("login", "recarregar", str(e)))
+
+
+def _percentis(segundos):
+    ms = np.array(segundos) * 1000 if segundos else np.zeros(1)
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 1) for p in (50, 95, 99)}
+
+
+def nivel(sessoes, segundos, usuario, senha, roteiros, semente=42, timeout=TIMEOUT, pausa=0.0):
+    """Roda `sessoes` recepcionistas por `segundos` e resume as medidas."""
+    medidas, erros, agendadas = [], [], []
+    monitor = Monitor(usuario, senha)
+    rss_inicio = rss_mb()
+    monitor.start()
+    prazo = time.monotonic() + segundos
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=Sessao(usuario, senha, semente + i, medidas, erros, agendadas,
+                                              timeout, pausa).executar,
+                                args=(prazo, roteiros), daemon=True)
+               for i in range(sessoes)]
+    with runtime_compartilhado():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    duracao = time.perf_counter() - inicio
+    monitor.parar.set()
+    monitor.join()
+
+    por_roteiro = defaultdict(list)
+    for tempo, roteiro, _ in medidas:
+        por_roteiro[roteiro].append(tempo)
+    return {
+        "sessoes": sessoes,
+        "segundos": round(duracao, 1),
+        "reexecucoes": len(medidas),
+        "reexecucoes_por_s": round(len(medidas) / duracao, 2) if duracao else 0.0,
+        **_percentis([m[0] for m in medidas]),
+        "roteiros": {nome: {"reexecucoes": len(tempos), **_percentis(tempos)}
+                     for nome, tempos in sorted(por_roteiro.items())},
+        "erros": len(erros),
+        "erros_frequentes": [{"roteiro": r, "passo": p, "mensagem": m, "vezes": n}
+                             for (r, p, m), n in Counter(erros).most_common(5)],
+        "conexoes_max": max(monitor.conexoes, default=0),
+        "conexoes_media": round(float(np.mean(monitor.conexoes)), 1) if monitor.conexoes else 0.0,
+        "rss_mb_inicio": round(rss_inicio, 1) if rss_inicio is not None else None,
+        "rss_mb_max": round(max(monitor.rss), 1) if monitor.rss else None,
+        "agendadas": agendadas,
+    }
+
+
+def limpar_agendadas(conn, agendadas):
+    # Remove as consultas criadas pela carga e só as entradas do log gravadas
+    # com MOTIVO_CARGA (pelo Cancelamento em Massa da carga ou por este DELETE)
+    cursor = conn.cursor()
+    try:
+        executar(cursor, "SET @motivo_cancelamento = %s", (MOTIVO_CARGA,))
+        for cod_med, data_hora in agendadas:
+            executar(cursor, "DELETE FROM Consulta WHERE CodMed = %s AND Data_Hora = %s", (cod_med, data_hora))
+            executar(cursor, "DELETE FROM Log_Cancelamento WHERE CodMed = %s AND Data_Hora = %s AND Motivo = %s",
+                     (cod_med, data_hora, MOTIVO_CARGA))
+        conn.commit()
+    finally:
+        try:
+            executar(cursor, "SET @motivo_cancelamento = NULL")
+        except mysql.connector.Error:
+            pass  # conexão perdida: a variável some com a sessão e o erro original segue
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do app Streamlit com sessões simultâneas.")
+    parser.add_argument("--sessoes", default=SESSOES, help="sessões simultâneas por nível, separadas por vírgula")
+    parser.add_argument("--segundos", type=float, default=SEGUNDOS, help="duração de cada nível")
+    parser.add_argument("--roteiros", default=",".join(ROTEIROS),
+                        help=f"roteiros sorteados (padrão: todos; pesos {ROTEIROS})")
+    parser.add_argument("--pausa", type=float, default=0.0,
+                        help="pausa média entre interações, em segundos (0 = sem pausa)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="tempo máximo de uma reexecução")
+    parser.add_argument("--usuario", default=DB_USER)
+    parser.add_argument("--senha", default=DB_PASSWORD)
+    parser.add_argument("--escala", help="gera os dados nesta escala antes da carga (ex.: 100k). "
+                                         "ATENÇÃO: apaga os dados atuais do banco")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="relatório JSON")
+    args = parser.parse_args(argv)
+
+    desconhecidos = set(args.roteiros.split(",")) - set(ROTEIROS)
+    if desconhecidos:
+        parser.error(f"roteiro(s) desconhecido(s): {', '.join(sorted(desconhecidos))}")
+    roteiros = {nome: ROTEIROS[nome] for nome in args.roteiros.split(",")}
+    log = lambda msg: print(msg, file=sys.stderr)  # noqa: E731
+    if args.escala:
+        log(f"Gerando escala {args.escala}...")
+        conn = conectar(args.usuario, args.senha)
+        try:
+            gerador_dados.limpar(conn)
+            gerador_dados.gerar(conn, gerador_dados.escala(args.escala), args.semente, log=log)
+        finally:
+            conn.close()
+
+    rodadas = []
+    for sessoes in [int(n) for n in args.sessoes.split(",")]:
+        log(f"{sessoes} sessão(ões) por {args.segundos:g}s (pool de {DB_POOL_SIZE} conexões)...")
+        rodada = nivel(sessoes, args.segundos, args.usuario, args.senha, roteiros, args.semente,
+                       args.timeout, args.pausa)
+        # Conexão só para a limpeza: durante a carga o MySQL vê apenas as do app
+        conn = conectar(args.usuario, args.senha)
+        try:
+            limpar_agendadas(conn, rodada.pop("agendadas"))
+        finally:
+            conn.close()
+        rodadas.append(rodada)
+        log(f"  {rodada['reexecucoes_por_s']:>7.2f} reexec/s  p50 {rodada['p50_ms']:>8.1f} ms  "
+            f"p95 {rodada['p95_ms']:>8.1f} ms  p99 {rodada['p99_ms']:>8.1f} ms  "
+            f"conexões {rodada['conexoes_max']:>3}  RSS {rodada['rss_mb_max'] or 0:>7.1f} MB  erros {rodada['erros']}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"data": datetime.datetime.now().isoformat(timespec="seconds"), "pool": DB_POOL_SIZE,
+                       "roteiros": roteiros, "rodadas": rodadas}, arquivo, ensure_ascii=False, indent=2)
+        print(f"Relatório: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
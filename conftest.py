@@ -0,0 +1,3 @@
+# Os módulos do app ficam na raiz do repositório (sem pacote): este arquivo
+# faz o pytest incluir a raiz no sys.path, então os testes em tests/ importam
+# banco, busca, dashboard... como o app. Os testes não precisam do MySQL.
@@ -0,0 +1,41 @@
+"""Comandos SQL da página de Consultas (CRUD).
+
+Assim como em dashboard.py, cada função devolve (sql, params).
+"""
+
+
+def sql_listar_consultas(filtros, apos, limite):
+    # Paginação por chave (keyset): continua a partir do último IdConsulta
+    # exibido em vez de usar OFFSET, então o custo de cada página não cresce
+    # com o tamanho da tabela. filtros: lista de (trecho_sql, parametros).
+    condicoes = ["c.IdConsulta > %s"] + [trecho for trecho, _ in filtros]
+    params = [apos] + [valor for _, valores in filtros for valor in valores] + [limite]
+    sql = f"""
+    SELECT c.IdConsulta, cl.NomeCli, m.NomeMed, p.NomePac, c.Data_Hora
+    FROM Consulta c
+    JOIN Clinica cl ON c.CodCli = cl.CodCli
+    JOIN Medico m ON c.CodMed = m.CodMed
+    JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
+    WHERE {' AND '.join(condicoes)}
+    ORDER BY c.IdConsulta ASC
+    LIMIT %s
+    """
+    return sql, tuple(params)
+
+
+def sql_total_aproximado(tabela):
+    # Estimativa das estatísticas do InnoDB: não percorre a tabela como COUNT(*)
+    sql = """
+    SELECT TABLE_ROWS AS total
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """
+    return sql, (tabela,)
+
+
+def sql_lista_pacientes():
+    return "SELECT CpfPaciente, NomePac, DataNascimento, Genero FROM Paciente ORDER BY NomePac ASC", ()
+
+
+def sql_paciente(cpf):
+    return "SELECT * FROM Paciente WHERE CpfPaciente = %s", (cpf,)
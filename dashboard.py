@@ -0,0 +1,290 @@
+"""Camada de dados do Dashboard: monta os comandos SQL e seus parâmetros.
+
+Cada função devolve (sql, params) para ser executado com banco.ler_sql
+(params=...) ou pelo cache de consultas do app. carregar() envia as
+consultas independentes do Dashboard ao mesmo tempo, cada uma em sua
+conexão do pool, e junta os resultados em um DadosDashboard.
+"""
+import contextvars
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as TempoEsgotado
+from dataclasses import dataclass, field
+
+import mysql.connector
+import pandas as pd
+
+import medicao
+from banco import DASHBOARD_PARALELO, DASHBOARD_TIMEOUT, DASHBOARD_WORKERS, executar, ler_sql
+
+
+def intervalo_datas(data_inicio, data_fim):
+    # Intervalo semiaberto [início, fim + 1 dia): compara a coluna Data_Hora
+    # diretamente, sem DATE(), para o MySQL poder usar os índices de Consulta
+    return data_inicio, data_fim + datetime.timedelta(days=1)
+
+
+def filtro_dashboard(data_inicio, data_fim, especialidade="Todas"):
+    where = "WHERE c.Data_Hora >= %s AND c.Data_Hora < %s"
+    params = list(intervalo_datas(data_inicio, data_fim))
+    if especialidade != "Todas":
+        where += " AND m.Especialidade = %s"
+        params.append(especialidade)
+    return where, tuple(params)
+
+
+def sql_kpis(filtro):
+    # Os três cartões (total, pacientes únicos e médicos) em uma única ida ao banco
+    where, params = filtro
+    sql = f"""
+    SELECT COUNT(*) AS total,
+           COUNT(DISTINCT c.CpfPaciente) AS pacientes,
+           (SELECT COUNT(*) FROM Medico) AS medicos
+    FROM Consulta c
+    JOIN Medico m ON c.CodMed = m.CodMed
+    {where}
+    """
+    return sql, params
+
+
+def sql_rank_medicos(filtro, limite=10):
+    where, params = filtro
+    sql = f"""
+    SELECT m.NomeMed, m.Especialidade, COUNT(c.IdConsulta) as TotalConsultas
+    FROM Medico m
+    JOIN Consulta c ON m.CodMed = c.CodMed
+    {where}
+    GROUP BY m.NomeMed, m.Especialidade
+    ORDER BY TotalConsultas DESC
+    LIMIT %s
+    """
+    return sql, params + (limite,)
+
+
+def sql_rank_pacientes(filtro, limite=10):
+    where, params = filtro
+    sql = f"""
+    SELECT p.NomePac, COUNT(c.IdConsulta) as TotalConsultas
+    FROM Paciente p
+    JOIN Consulta c ON p.CpfPaciente = c.CpfPaciente
+    JOIN Medico m ON c.CodMed = m.CodMed
+    {where}
+    GROUP BY p.NomePac
+    ORDER BY TotalConsultas DESC
+    LIMIT %s
+    """
+    return sql, params + (limite,)
+
+
+def sql_por_especialidade(filtro):
+    where, params = filtro
+    sql = f"""
+    SELECT m.Especialidade, COUNT(c.IdConsulta) as Quantidade
+    FROM Medico m
+    JOIN Consulta c ON m.CodMed = c.CodMed
+    {where}
+    GROUP BY m.Especialidade
+    ORDER BY Quantidade DESC
+    """
+    return sql, params
+
+
+# Expressão de agrupamento da série temporal para cada opção do rádio
+AGRUPAMENTOS = {
+    "Dia": "d.Dia",
+    "Semana": "DATE_FORMAT(d.Dia, '%Y-%u')",
+    "Mês": "DATE_FORMAT(d.Dia, '%Y-%m')",
+}
+
+
+def sql_evolucao(data_inicio, data_fim, especialidade, agrupamento):
+    # Lê o resumo diário (Consulta_Diaria): o custo depende do número de dias,
+    # não do número de consultas
+    expr = AGRUPAMENTOS[agrupamento]
+    where = "WHERE d.Dia BETWEEN %s AND %s"
+    params = [data_inicio, data_fim]
+    if especialidade != "Todas":
+        where += " AND d.Especialidade = %s"
+        params.append(especialidade)
+    sql = f"""
+    SELECT {expr} as Data, CAST(SUM(d.Qtd) AS UNSIGNED) as Consultas
+    FROM Consulta_Diaria d
+    {where}
+    GROUP BY {expr}
+    ORDER BY Data ASC
+    """
+    return sql, tuple(params)
+
+
+def sql_ociosos(data_inicio, data_fim):
+    sql = """
+    SELECT m.NomeMed, m.Especialidade, m.Email
+    FROM Medico m
+    LEFT JOIN (
+        SELECT DISTINCT CodMed
+        FROM Consulta c
+        WHERE c.Data_Hora >= %s AND c.Data_Hora < %s
+    ) c ON m.CodMed = c.CodMed
+    WHERE c.CodMed IS NULL
+    """
+    return sql, intervalo_datas(data_inicio, data_fim)
+
+
+def consultas_dashboard(data_inicio, data_fim, especialidade="Todas", agrupamento="Dia"):
+    # Todos os comandos que uma renderização do Dashboard envia, por seção
+    filtro = filtro_dashboard(data_inicio, data_fim, especialidade)
+    return {
+        "kpis": sql_kpis(filtro),
+        "rank_medicos": sql_rank_medicos(filtro),
+        "rank_pacientes": sql_rank_pacientes(filtro),
+        "especialidades": sql_por_especialidade(filtro),
+        "evolucao": sql_evolucao(data_inicio, data_fim, especialidade, agrupamento),
+        "ociosos": sql_ociosos(data_inicio, data_fim),
+    }
+
+
+@dataclass
+class DadosDashboard:
+    # Um DataFrame por seção (None se a seção falhou; o motivo fica em erros)
+    kpis: pd.DataFrame = None
+    rank_medicos: pd.DataFrame = None
+    rank_pacientes: pd.DataFrame = None
+    especialidades: pd.DataFrame = None
+    evolucao: pd.DataFrame = None
+    ociosos: pd.DataFrame = None
+    erros: dict = field(default_factory=dict)  # seção -> mensagem
+    segundos: float = 0.0
+    paralelo: bool = False
+    detalhe: str = ""                          # modo incremental (agregados.py): o que foi aplicado
+
+
+ERROS_SECAO = (mysql.connector.Error, pd.errors.DatabaseError)
+
+
+class ConexaoSobDemanda:
+    """Conexão do pool retirada só no primeiro uso.
+
+    Com o cache de consultas do app (ler=ler_sql_cache) uma seção que já está
+    em cache não toca na conexão, então não ocupa o pool nem faz o SET do
+    prazo. close() devolve a conexão se ela chegou a ser retirada.
+    """
+
+    def __init__(self, obter_conexao, timeout):
+        self._obter = obter_conexao
+        self._timeout = timeout
+        self._conn = None
+
+    def _abrir(self):
+        if self._conn is None:
+            conn = self._obter()
+            try:
+                # O servidor interrompe o SELECT que passar do prazo (erro 3024), então
+                # uma seção lenta não segura a conexão depois que desistimos dela
+                executar(conn.cursor(), "SET SESSION MAX_EXECUTION_TIME = %s", (int(self._timeout * 1000),)).close()
+            except mysql.connector.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    @property
+    def aberta(self):
+        return self._conn is not None
+
+    def __getattr__(self, nome):
+        return getattr(self._abrir(), nome)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _carregar_secao(obter_conexao, ler, nome, sql, params, timeout, ao_iniciar):
+    # Executada em uma thread do pool; a conexão só é retirada se a seção for ao banco
+    if ao_iniciar:
+        ao_iniciar()
+    conn = ConexaoSobDemanda(obter_conexao, timeout)
+    try:
+        with medicao.secao(f"dashboard:{nome}"):
+            return ler(conn, sql, params)
+    finally:
+        conn.close()
+
+
+def carregar(obter_conexao, data_inicio, data_fim, especialidade="Todas", agrupamento="Dia",
+             paralelo=DASHBOARD_PARALELO, workers=DASHBOARD_WORKERS, timeout=DASHBOARD_TIMEOUT,
+             ler=ler_sql, ao_iniciar=None):
+    """Executa todas as consultas do Dashboard e devolve um DadosDashboard.
+
+    obter_conexao() deve devolver uma conexão do pool (close() a devolve); ela
+    só é chamada para as seções que vão ao banco (ConexaoSobDemanda).
+    Com paralelo=False as seções rodam uma após a outra em uma só conexão.
+    ao_iniciar é chamado no início de cada thread (o app o usa para anexar
+    o contexto do Streamlit ao cache de consultas).
+    """
+    comandos = consultas_dashboard(data_inicio, data_fim, especialidade, agrupamento)
+    dados = DadosDashboard(paralelo=paralelo)
+    inicio = time.perf_counter()
+    if paralelo:
+        executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="dashboard")
+        # Cada tarefa leva uma cópia do contexto (rodada de medição do app)
+        futuros = {nome: executor.submit(contextvars.copy_context().run, _carregar_secao, obter_conexao, ler,
+                                         nome, sql, params, timeout, ao_iniciar)
+                   for nome, (sql, params) in comandos.items()}
+        prazo = time.monotonic() + timeout
+        for nome, futuro in futuros.items():
+            try:
+                setattr(dados, nome, futuro.result(timeout=max(0.0, prazo - time.monotonic())))
+            except TempoEsgotado:
+                dados.erros[nome] = f"tempo esgotado ({timeout:g}s)"
+            except ERROS_SECAO as e:
+                dados.erros[nome] = str(e)
+        # Não espera as seções que estouraram o prazo
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        conn = ConexaoSobDemanda(obter_conexao, timeout)
+        for nome, (sql, params) in comandos.items():
+            try:
+                with medicao.secao(f"dashboard:{nome}"):
+                    setattr(dados, nome, ler(conn, sql, params))
+            except ERROS_SECAO as e:
+                dados.erros[nome] = str(e)
+                if not conn.aberta:
+                    # Não conseguiu a conexão: as seções que faltam também iriam ao banco
+                    dados.erros.update({n: str(e) for n in comandos
+                                        if getattr(dados, n) is None and n not in dados.erros})
+                    break
+        conn.close()
+    dados.segundos = time.perf_counter() - inicio
+    return dados
+
+
+def planos_execucao(conn, data_inicio, data_fim, especialidade="Todas"):
+    # EXPLAIN de cada consulta do Dashboard; com os índices de script_banco.sql
+    # o acesso à tabela Consulta (alias c) deve ser 'range', nunca 'ALL'
+    planos = []
+    for nome, (sql, params) in consultas_dashboard(data_inicio, data_fim, especialidade).items():
+        plano = ler_sql(conn, "EXPLAIN " + sql, params)
+        plano.insert(0, "consulta", nome)
+        planos.append(plano)
+    return pd.concat(planos, ignore_index=True)
+
+
+if __name__ == "__main__":
+    # Verificação: python dashboard.py [data_inicio] [data_fim]
+    import sys
+
+    from banco import conectar
+
+    inicio = datetime.date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else datetime.date(2015, 1, 1)
+    fim = datetime.date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else datetime.date(2036, 12, 29)
+    conn = conectar()
+    planos = planos_execucao(conn, inicio, fim)
+    conn.close()
+    print(planos[["consulta", "table", "type", "key", "rows", "Extra"]].to_string(index=False))
+    varreduras = planos[(planos["table"] == "c") & (planos["type"] == "ALL")]
+    if not varreduras.empty:
+        print("\nATENÇÃO: varredura completa de Consulta em:", ", ".join(varreduras["consulta"].unique()))
+        sys.exit(1)
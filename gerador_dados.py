@@ -0,0 +1,284 @@
+"""Gerador de dados sintéticos para o banco ConsultasMedicas.
+
+Preenche Clinica, Medico, Paciente, Consulta e Log_Cancelamento em escalas
+configuráveis (10k, 1m, 10m consultas ou um número qualquer) com uma
+distribuição parecida com a real: poucos pacientes concentram muitas
+consultas, feriados e fins de semana têm menos atendimentos e alguns médicos
+ficam sem agenda. A mesma semente gera sempre os mesmos dados.
+
+Uso:
+    python gerador_dados.py --escala 1m --semente 42 --limpar
+"""
+import argparse
+import datetime
+import sys
+import time
+
+import mysql.connector
+import numpy as np
+
+from agenda import HORARIOS  # 07:00 a 18:30, de 30 em 30 minutos
+from banco import conectar
+
+ESCALAS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+TAMANHO_LOTE = 10_000
+ANOS_HISTORICO = 5        # consultas desde N anos atrás...
+ANOS_FUTURO = 1           # ...até N anos à frente
+TAXA_CANCELAMENTO = 0.03
+TAXA_MEDICOS_OCIOSOS = 0.05
+
+ESPECIALIDADES = ["Cardiologia", "Dermatologia", "Pediatria", "Oftalmologia", "Ortopedia", "Psiquiatria",
+                  "Infectologia", "Neurologia", "Cirurgia Geral", "Diagnóstico", "Ginecologia", "Clínica Geral"]
+PESO_ESPECIALIDADES = [10, 6, 9, 5, 7, 4, 2, 3, 2, 1, 6, 12]
+NOMES = ["Ana", "Maria", "João", "José", "Pedro", "Paulo", "Carla", "Fernanda", "Lucas", "Gabriel", "Juliana",
+         "Rafael", "Beatriz", "Mariana", "Tiago", "Bruno", "Letícia", "Camila", "Felipe", "Larissa", "Antônio",
+         "Francisca", "Luiz", "Patrícia", "Rodrigo", "Aline", "Marcos", "Vitória", "Heitor", "Helena"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues",
+              "Almeida", "Nascimento", "Carvalho", "Araújo", "Ribeiro", "Gomes", "Barbosa", "Cavalcanti",
+              "Melo", "Albuquerque", "Monteiro"]
+BAIRROS = ["Boa Viagem", "Casa Forte", "Graças", "Espinheiro", "Madalena", "Torre", "Derby", "Boa Vista"]
+MOTIVOS = ["Paciente desmarcou", "Médico de férias", "Remarcação", "Falta do paciente", "Consulta Removida pelo Sistema"]
+
+
+def escala(texto):
+    return ESCALAS.get(texto.lower()) or int(texto)
+
+
+def dimensoes(qtd_consultas):
+    return {
+        "clinicas": max(8, qtd_consultas // 20_000),
+        "medicos": max(18, qtd_consultas // 2_000),
+        "pacientes": max(30, qtd_consultas // 4),
+    }
+
+
+def _pascoa(ano):
+    # Algoritmo de Meeus/Jones/Butcher
+    a, b, c = ano % 19, ano // 100, ano % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(ano, mes, dia + 1)
+
+
+def peso_dias(dias):
+    # Peso relativo de cada dia: fins de semana, feriados e recesso de fim de ano têm vales
+    pesos = np.ones(len(dias))
+    dia_semana = np.array([d.weekday() for d in dias])
+    pesos[dia_semana == 5] = 0.35
+    pesos[dia_semana == 6] = 0.05
+    feriados = set()
+    for ano in {d.year for d in dias}:
+        pascoa = _pascoa(ano)
+        feriados |= {datetime.date(ano, m, d) for m, d in [(1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (12, 25)]}
+        feriados |= {pascoa - datetime.timedelta(days=n) for n in (48, 47, 2)}  # Carnaval e Sexta-feira Santa
+    for i, d in enumerate(dias):
+        if d in feriados:
+            pesos[i] = 0.05
+        elif (d.month == 12 and d.day >= 20) or (d.month == 1 and d.day <= 6):
+            pesos[i] *= 0.4
+    # Leve crescimento da demanda ao longo do tempo
+    return pesos * np.linspace(0.8, 1.2, len(dias))
+
+
+def gerar_agenda(rng, qtd, n_medicos, n_pacientes, dias):
+    """Devolve arrays (médico, paciente, dia, horário) ordenados pela data/hora."""
+    pesos_dia = peso_dias(dias)
+    log_peso_grade = np.log(np.repeat(pesos_dia / pesos_dia.sum(), len(HORARIOS)))
+    tamanho_grade = len(log_peso_grade)
+
+    # Volume por médico: log-normal, com uma fração de médicos ociosos
+    volume = rng.lognormal(0, 0.6, n_medicos)
+    volume[rng.random(n_medicos) < TAXA_MEDICOS_OCIOSOS] = 0
+    por_medico = np.minimum(np.round(volume / volume.sum() * qtd).astype(np.int64), tamanho_grade)
+
+    # Pacientes recorrentes: pesos tipo Zipf (poucos pacientes com muitas consultas)
+    cdf_pacientes = np.cumsum(1.0 / (np.arange(n_pacientes) + 5) ** 1.05)
+    cdf_pacientes /= cdf_pacientes[-1]
+
+    medicos, slots = [], []
+    for medico, n in enumerate(por_medico):
+        if n == 0:
+            continue
+        # Amostragem ponderada sem reposição (Gumbel top-k): um médico nunca
+        # recebe duas consultas no mesmo horário
+        chaves = log_peso_grade + rng.gumbel(size=tamanho_grade)
+        escolhidos = np.argpartition(chaves, -n)[-n:]
+        slots.append(escolhidos.astype(np.int32))
+        medicos.append(np.full(n, medico, dtype=np.int32))
+    slots = np.concatenate(slots)
+    medicos = np.concatenate(medicos)
+    pacientes = np.searchsorted(cdf_pacientes, rng.random(len(slots))).astype(np.int32)
+    pacientes = np.minimum(pacientes, n_pacientes - 1)
+
+    ordem = np.argsort(slots, kind="stable")
+    slots, medicos, pacientes = slots[ordem], medicos[ordem], pacientes[ordem]
+    return medicos, pacientes, slots // len(HORARIOS), slots % len(HORARIOS)
+
+
+def _nomes(rng, qtd, prefixo=""):
+    nomes = rng.choice(NOMES, qtd)
+    sobrenomes1 = rng.choice(SOBRENOMES, qtd)
+    sobrenomes2 = rng.choice(SOBRENOMES, qtd)
+    return [f"{prefixo}{a} {b} {c}" for a, b, c in zip(nomes, sobrenomes1, sobrenomes2)]
+
+
+def _inserir(conn, sql, linhas, tamanho_lote=TAMANHO_LOTE):
+    cursor = conn.cursor()
+    for i in range(0, len(linhas), tamanho_lote):
+        cursor.executemany(sql, linhas[i:i + tamanho_lote])
+        conn.commit()
+    cursor.close()
+
+
+def _gatilhos_consulta(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT TRIGGER_NAME, ACTION_TIMING, EVENT_MANIPULATION, ACTION_STATEMENT
+        FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'Consulta'
+        ORDER BY EVENT_MANIPULATION, ACTION_TIMING, ACTION_ORDER
+    """)
+    gatilhos = cursor.fetchall()
+    cursor.close()
+    return gatilhos
+
+
+def limpar(conn):
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for tabela in ["Log_Cancelamento", "Consulta_Diaria", "Consulta", "Paciente", "Medico", "Clinica"]:
+        cursor.execute(f"TRUNCATE TABLE {tabela}")
+    try:
+        cursor.execute("TRUNCATE TABLE Log_Cancelamento_Arquivo")
+    except mysql.connector.ProgrammingError:
+        pass  # migração do arquivo do log não aplicada
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    # TRUNCATE não dispara gatilhos: avisa os apps abertos que as listas mudaram
+    try:
+        cursor.execute("UPDATE Controle_Versao SET Versao = Versao + 1")
+        conn.commit()
+    except mysql.connector.ProgrammingError:
+        pass  # migração de Controle_Versao não aplicada
+    cursor.close()
+
+
+def gerar(conn, qtd_consultas, semente=42, log=print):
+    rng = np.random.default_rng(semente)
+    dim = dimensoes(qtd_consultas)
+    hoje = datetime.date.today()
+    inicio = hoje.replace(year=hoje.year - ANOS_HISTORICO, day=1)
+    fim = hoje + datetime.timedelta(days=365 * ANOS_FUTURO)
+    dias = [inicio + datetime.timedelta(days=i) for i in range((fim - inicio).days + 1)]
+
+    # Códigos com prefixo próprio para não colidir com os dados de script_banco.sql
+    cod_cli = [f"G{i:06d}" for i in range(1, dim["clinicas"] + 1)]
+    cod_med = [f"G{i:06d}" for i in range(1, dim["medicos"] + 1)]
+    cpfs = [f"9{i:010d}" for i in range(1, dim["pacientes"] + 1)]
+
+    log(f"Dimensões: {dim}")
+    _inserir(conn, "INSERT INTO Clinica (CodCli, NomeCli, Endereco, Telefone, Email) VALUES (%s, %s, %s, %s, %s)", [
+        (c, f"Clínica {b} {i}", f"Rua {s}, {rng.integers(1, 2000)} - {b}", f"(81) 3{i:03d}-{i % 10000:04d}", f"clinica{i}@mail.com")
+        for i, (c, b, s) in enumerate(zip(cod_cli, rng.choice(BAIRROS, len(cod_cli)), rng.choice(SOBRENOMES, len(cod_cli))), 1)
+    ])
+    # .tolist(): o mysql.connector não converte tipos do NumPy
+    especialidades = rng.choice(ESPECIALIDADES, len(cod_med), p=np.array(PESO_ESPECIALIDADES) / sum(PESO_ESPECIALIDADES)).tolist()
+    generos_med = rng.choice(["M", "F"], len(cod_med)).tolist()
+    _inserir(conn, "INSERT INTO Medico (CodMed, NomeMed, Genero, Telefone, Email, Especialidade) VALUES (%s, %s, %s, %s, %s, %s)", [
+        (c, n, g, f"9{i:04d}-{i % 10000:04d}", f"medico{i}@mail.com", e)
+        for i, (c, n, g, e) in enumerate(zip(cod_med, _nomes(rng, len(cod_med), "Dr(a). "), generos_med, especialidades), 1)
+    ])
+    nascimentos = [hoje - datetime.timedelta(days=int(d)) for d in rng.integers(30, 95 * 365, len(cpfs))]
+    _inserir(conn, "INSERT INTO Paciente (CpfPaciente, NomePac, DataNascimento, Genero, Telefone, Email) VALUES (%s, %s, %s, %s, %s, %s)", [
+        (c, n, d, g, f"9{i % 10000:04d}-{i % 9999:04d}", f"paciente{i}@mail.com")
+        for i, (c, n, d, g) in enumerate(zip(cpfs, _nomes(rng, len(cpfs)), nascimentos, rng.choice(["M", "F"], len(cpfs)).tolist()), 1)
+    ])
+    log(f"{len(cod_cli)} clínicas, {len(cod_med)} médicos e {len(cpfs)} pacientes inseridos")
+
+    # Agenda (inclui as consultas que serão "canceladas") em ordem cronológica
+    qtd_total = int(qtd_consultas / (1 - TAXA_CANCELAMENTO))
+    medicos, pacientes, idx_dia, idx_hora = gerar_agenda(rng, qtd_total, len(cod_med), len(cpfs), dias)
+    # Cada médico atende em uma clínica principal e, às vezes, em uma segunda
+    clinica_principal = rng.integers(0, len(cod_cli), len(cod_med))
+    clinica_extra = rng.integers(0, len(cod_cli), len(cod_med))
+    clinicas = np.where(rng.random(len(medicos)) < 0.8, clinica_principal[medicos], clinica_extra[medicos])
+    cancelada = rng.random(len(medicos)) < TAXA_CANCELAMENTO
+    minutos_horario = np.array([h.hour * 60 + h.minute for h in HORARIOS])
+    data_horas = (np.datetime64(inicio, "m") + (idx_dia.astype(np.int64) * 1440 + minutos_horario[idx_hora])).astype("datetime64[s]")
+    agora = np.datetime64(datetime.datetime.now(), "s")
+    data_cancel = np.minimum(data_horas - rng.integers(0, 30, len(medicos)) * np.timedelta64(1, "D"), agora)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(IdConsulta), 0) FROM Consulta")
+    primeiro_id = cursor.fetchone()[0] + 1
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0, UNIQUE_CHECKS = 0")
+
+    # Os gatilhos são retirados durante a carga (o de validação recusaria datas
+    # passadas e os do resumo diário custariam uma escrita por linha) e
+    # recriados no fim, com o resumo reconstruído de uma vez
+    gatilhos = _gatilhos_consulta(conn)
+    for nome, *_ in gatilhos:
+        cursor.execute(f"DROP TRIGGER {nome}")
+    try:
+        inicio_carga = time.perf_counter()
+        total_cancelamentos = 0
+        for ini in range(0, len(medicos), TAMANHO_LOTE):
+            fatia = slice(ini, ini + TAMANHO_LOTE)
+            # IDs em ordem cronológica; as canceladas deixam buracos na sequência, como na vida real
+            linhas = list(zip(
+                (primeiro_id + np.arange(ini, ini + len(medicos[fatia]))).tolist(),
+                [cod_cli[i] for i in clinicas[fatia]],
+                [cod_med[i] for i in medicos[fatia]],
+                [cpfs[i] for i in pacientes[fatia]],
+                data_horas[fatia].tolist(),
+            ))
+            canceladas = cancelada[fatia]
+            _inserir(conn, "INSERT INTO Consulta (IdConsulta, CodCli, CodMed, CpfPaciente, Data_Hora) VALUES (%s, %s, %s, %s, %s)",
+                     [linha for linha, c in zip(linhas, canceladas) if not c])
+            _inserir(conn, "INSERT INTO Log_Cancelamento (Usuario, DataCancelamento, IdConsultaDeletada, CpfPaciente, CodMed, CodCli, Data_Hora, Motivo) "
+                           "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                     [("gerador@localhost", dc, id_consulta, cpf, med, cli, dh, MOTIVOS[id_consulta % len(MOTIVOS)])
+                      for (id_consulta, cli, med, cpf, dh), dc, c in zip(linhas, data_cancel[fatia].tolist(), canceladas) if c])
+            total_cancelamentos += int(canceladas.sum())
+            fim_lote = ini + len(linhas)
+            log(f"  {fim_lote}/{len(medicos)} consultas geradas ({fim_lote / (time.perf_counter() - inicio_carga):.0f}/s)")
+        log(f"{len(medicos) - total_cancelamentos} consultas e {total_cancelamentos} cancelamentos inseridos")
+    finally:
+        for nome, momento, evento, corpo in gatilhos:
+            cursor.execute(f"CREATE TRIGGER {nome} {momento} {evento} ON Consulta FOR EACH ROW {corpo}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1, UNIQUE_CHECKS = 1")
+
+    cursor.execute("SELECT COUNT(*) FROM information_schema.ROUTINES "
+                   "WHERE ROUTINE_SCHEMA = DATABASE() AND ROUTINE_NAME = 'sp_Recalcular_Consulta_Diaria'")
+    if cursor.fetchone()[0]:
+        cursor.execute("CALL sp_Recalcular_Consulta_Diaria()")
+        conn.commit()
+    cursor.execute("ANALYZE TABLE Clinica, Medico, Paciente, Consulta, Log_Cancelamento")
+    cursor.fetchall()
+    cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos no banco ConsultasMedicas.")
+    parser.add_argument("--escala", default="10k", help="quantidade de consultas: 10k, 100k, 1m, 10m ou um número")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--limpar", action="store_true", help="apaga TODOS os dados das tabelas antes de gerar")
+    args = parser.parse_args(argv)
+
+    conn = conectar()
+    try:
+        if args.limpar:
+            limpar(conn)
+        inicio = time.perf_counter()
+        gerar(conn, escala(args.escala), args.semente, log=lambda msg: print(msg, file=sys.stderr))
+        print(f"Concluído em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Importação em massa de consultas a partir de CSV ou Parquet.
+
+O arquivo é lido em blocos; cada bloco é validado contra as chaves de
+Clinica/Medico/Paciente (carregadas uma vez) e inserido com executemany em
+uma transação. As linhas recusadas, inclusive pelo gatilho
+trg_Validar_Data_Consulta e pelo índice único (CodMed, Data_Hora), vão para
+um relatório com o motivo.
+
+Uso pela linha de comando:
+    python importacao.py consultas.csv --relatorio rejeitadas.csv
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import mysql.connector
+import pandas as pd
+
+from agenda import MSG_HORARIO_OCUPADO, horario_ocupado
+from banco import conectar, executar, executar_lote, ler_sql
+
+COLUNAS = ["CodCli", "CodMed", "CpfPaciente", "Data_Hora"]
+TAMANHO_BLOCO = 5000   # linhas lidas do arquivo por vez (uma transação por bloco)
+TAMANHO_LOTE = 500     # linhas por executemany
+SQL_INSERIR = "INSERT INTO Consulta (CodCli, CodMed, CpfPaciente, Data_Hora) VALUES (%s, %s, %s, %s)"
+MSG_DATA_PASSADA = "ERRO DE INTEGRIDADE: Não é permitido agendar consultas para datas/horas passadas."
+
+
+@dataclass
+class ResultadoImportacao:
+    lidas: int = 0
+    inseridas: int = 0
+    segundos: float = 0.0
+    rejeitadas: list = field(default_factory=list)  # DataFrames com Linha e Motivo
+
+    @property
+    def linhas_por_segundo(self):
+        return self.lidas / self.segundos if self.segundos > 0 else 0.0
+
+    def relatorio(self):
+        if not self.rejeitadas:
+            return pd.DataFrame(columns=["Linha"] + COLUNAS + ["Motivo"])
+        return pd.concat(self.rejeitadas, ignore_index=True)
+
+
+def ler_em_blocos(arquivo, nome, tamanho=TAMANHO_BLOCO):
+    # arquivo pode ser um caminho ou um objeto de arquivo (upload do Streamlit)
+    if nome.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=tamanho, columns=COLUNAS):
+            yield lote.to_pandas().astype({"CodCli": str, "CodMed": str, "CpfPaciente": str})
+    else:
+        yield from pd.read_csv(arquivo, usecols=COLUNAS, dtype={c: str for c in COLUNAS[:3]}, chunksize=tamanho)
+
+
+def carregar_chaves(conn):
+    chaves = {}
+    for coluna, tabela in [("CodCli", "Clinica"), ("CodMed", "Medico"), ("CpfPaciente", "Paciente")]:
+        chaves[coluna] = set(ler_sql(conn, f"SELECT {coluna} FROM {tabela}")[coluna])
+    return chaves
+
+
+def validar_bloco(bloco, chaves, agora):
+    # Validação vetorizada; devolve (válidas, rejeitadas com Motivo)
+    bloco = bloco.copy()
+    data_hora = pd.to_datetime(bloco["Data_Hora"], errors="coerce")
+    motivo = pd.Series("", index=bloco.index)
+    for coluna in ["CodCli", "CodMed", "CpfPaciente"]:
+        bloco[coluna] = bloco[coluna].str.strip()
+        motivo = motivo.mask((motivo == "") & ~bloco[coluna].isin(chaves[coluna]), f"{coluna} inexistente")
+    motivo = motivo.mask((motivo == "") & data_hora.isna(), "Data_Hora inválida")
+    # Mesma regra do gatilho trg_Validar_Data_Consulta, checada antes de ir ao banco
+    motivo = motivo.mask((motivo == "") & (data_hora <= agora), MSG_DATA_PASSADA)
+    recusadas = motivo != ""
+    validas = bloco[~recusadas].assign(Data_Hora=data_hora[~recusadas])
+    return validas, bloco[recusadas].assign(Motivo=motivo[recusadas])
+
+
+def _linhas(df):
+    return list(zip(df["CodCli"], df["CodMed"], df["CpfPaciente"],
+                    df["Data_Hora"].dt.strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def inserir_bloco(conn, validas, tamanho_lote=TAMANHO_LOTE):
+    # Insere em lotes numa transação; se o banco recusar algum lote (gatilho,
+    # chave duplicada...), refaz o bloco linha a linha para saber quais falharam
+    cursor = conn.cursor()
+    linhas = _linhas(validas)
+    try:
+        for i in range(0, len(linhas), tamanho_lote):
+            executar_lote(cursor, SQL_INSERIR, linhas[i:i + tamanho_lote])
+        conn.commit()
+        cursor.close()
+        return len(linhas), None
+    except mysql.connector.Error:
+        conn.rollback()
+
+    inseridas, motivos = 0, {}
+    for indice, linha in zip(validas.index, linhas):
+        try:
+            executar(cursor, SQL_INSERIR, linha)
+            inseridas += 1
+        except mysql.connector.Error as e:
+            motivos[indice] = MSG_HORARIO_OCUPADO if horario_ocupado(e) else e.msg
+    conn.commit()
+    cursor.close()
+    recusadas = validas.loc[list(motivos)]
+    return inseridas, recusadas.assign(Motivo=pd.Series(motivos, dtype=str))
+
+
+def importar(conn, arquivo, nome, tamanho_bloco=TAMANHO_BLOCO, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    resultado = ResultadoImportacao()
+    chaves = carregar_chaves(conn)
+    inicio = time.perf_counter()
+    for bloco in ler_em_blocos(arquivo, nome, tamanho_bloco):
+        # Número da linha no arquivo (1 = primeira linha de dados)
+        bloco.index = pd.RangeIndex(resultado.lidas + 1, resultado.lidas + 1 + len(bloco))
+        resultado.lidas += len(bloco)
+        validas, rejeitadas = validar_bloco(bloco, chaves, pd.Timestamp(datetime.datetime.now()))
+        inseridas, recusadas_banco = inserir_bloco(conn, validas, tamanho_lote) if not validas.empty else (0, None)
+        resultado.inseridas += inseridas
+        for df in (rejeitadas, recusadas_banco):
+            if df is not None and not df.empty:
+                resultado.rejeitadas.append(df.rename_axis("Linha").reset_index())
+        if progresso:
+            progresso(resultado)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa consultas em massa (CSV ou Parquet).")
+    parser.add_argument("arquivo", help="arquivo .csv ou .parquet com CodCli, CodMed, CpfPaciente, Data_Hora")
+    parser.add_argument("--relatorio", default="rejeitadas.csv", help="CSV de saída com as linhas recusadas")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO, help="linhas por transação")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="linhas por executemany")
+    args = parser.parse_args(argv)
+
+    conn = conectar()
+    try:
+        resultado = importar(conn, args.arquivo, os.path.basename(args.arquivo), args.bloco, args.lote,
+                             progresso=lambda r: print(f"  {r.lidas} lidas, {r.inseridas} inseridas", file=sys.stderr))
+    finally:
+        conn.close()
+
+    relatorio = resultado.relatorio()
+    relatorio.to_csv(args.relatorio, index=False)
+    print(f"Lidas: {resultado.lidas} | Inseridas: {resultado.inseridas} | Rejeitadas: {len(relatorio)}")
+    print(f"Tempo: {resultado.segundos:.2f}s | Vazão: {resultado.linhas_por_segundo:.0f} linhas/s")
+    if not relatorio.empty:
+        print(f"Relatório de rejeitadas: {args.relatorio}")
+
+
+if __name__ == "__main__":
+    main()
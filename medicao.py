@@ -0,0 +1,154 @@
+"""Instrumentação dos comandos enviados ao banco.
+
+banco.ler_sql e banco.executar chamam registrar() a cada comando: tempo,
+linhas, bytes do resultado, página e seção de onde partiu. Os registros de
+uma reexecução do app ficam em uma Rodada (painel "Performance" da barra
+lateral) e os comandos acima de SLOW_QUERY_MS vão para um log rotativo em
+JSON, uma linha por comando, opcionalmente com o EXPLAIN.
+"""
+import contextlib
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import mysql.connector
+import pandas as pd
+
+# --- CONFIGURAÇÃO (variáveis de ambiente) ---
+LENTA_MS = float(os.environ.get("SLOW_QUERY_MS", "500"))             # limite de comando lento
+LOG_LENTAS = os.environ.get("SLOW_QUERY_LOG", "consultas_lentas.log")
+LOG_MAX_BYTES = int(os.environ.get("SLOW_QUERY_LOG_BYTES", str(5 * 1024 * 1024)))
+LOG_ARQUIVOS = int(os.environ.get("SLOW_QUERY_LOG_BACKUPS", "3"))    # arquivos antigos mantidos
+EXPLAIN_LENTAS = os.environ.get("SLOW_QUERY_EXPLAIN", "0") == "1"   # anexa o EXPLAIN ao log
+
+MODULO_APP = "app.py"
+
+
+@dataclass
+class Registro:
+    pagina: str
+    secao: str
+    sql: str
+    inicio_ms: float     # desde o início da rodada
+    duracao_ms: float
+    linhas: int
+    bytes: int           # tamanho do resultado em memória (0 para escritas)
+    origem: str = "banco"  # "banco" ou "cache"
+
+
+class Rodada:
+    """Comandos de uma reexecução do app (ou de uma execução de script)."""
+
+    def __init__(self, pagina=""):
+        self.pagina = pagina
+        self.inicio = time.perf_counter()
+        self.registros = []
+        self._lock = threading.Lock()  # consultas em paralelo registram na mesma rodada
+
+    def adicionar(self, registro):
+        with self._lock:
+            self.registros.append(registro)
+
+    def tabela(self):
+        with self._lock:
+            return pd.DataFrame([asdict(r) for r in self.registros],
+                                columns=list(Registro.__dataclass_fields__))
+
+
+_rodada = contextvars.ContextVar("rodada", default=None)
+_secao = contextvars.ContextVar("secao", default=None)
+
+
+def iniciar_rodada(pagina=""):
+    rodada = Rodada(pagina)
+    _rodada.set(rodada)
+    return rodada
+
+
+def rodada_atual():
+    return _rodada.get()
+
+
+@contextlib.contextmanager
+def secao(nome):
+    # Nomeia a seção dos comandos executados dentro do bloco
+    token = _secao.set(nome)
+    try:
+        yield
+    finally:
+        _secao.reset(token)
+
+
+def _origem_chamada():
+    # Sem seção explícita, usa a linha de app.py (ou do primeiro módulo fora
+    # desta camada) que originou o comando, ex.: "app.py:98"
+    primeira = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        nome = os.path.basename(frame.f_code.co_filename)
+        if nome == MODULO_APP:
+            return f"{nome}:{frame.f_lineno}"
+        if primeira is None and nome not in ("banco.py", "medicao.py"):
+            primeira = f"{nome}:{frame.f_lineno}"
+        frame = frame.f_back
+    return primeira or "?"
+
+
+_log = logging.getLogger("consultas_lentas")
+_log_lock = threading.Lock()
+
+
+def _logger_lentas():
+    with _log_lock:
+        if not _log.handlers:
+            handler = logging.handlers.RotatingFileHandler(LOG_LENTAS, maxBytes=LOG_MAX_BYTES,
+                                                           backupCount=LOG_ARQUIVOS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _log.addHandler(handler)
+            _log.setLevel(logging.INFO)
+            _log.propagate = False
+    return _log
+
+
+def _explain(conn, sql, params):
+    if conn is None or not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("EXPLAIN " + sql, tuple(params) if params else None)
+        plano = [dict(zip(cursor.column_names, linha)) for linha in cursor.fetchall()]
+        cursor.close()
+        return plano
+    except mysql.connector.Error:
+        return None
+
+
+def registrar(sql, params, inicio, fim, linhas, bytes_resultado=0, conn=None, origem="banco"):
+    duracao_ms = (fim - inicio) * 1000
+    nome_secao = _secao.get() or _origem_chamada()
+    sql = " ".join(sql.split())
+    rodada = _rodada.get()
+    if rodada is not None:
+        rodada.adicionar(Registro(rodada.pagina, nome_secao, sql, (inicio - rodada.inicio) * 1000,
+                                  duracao_ms, linhas, bytes_resultado, origem))
+    if origem == "banco" and duracao_ms >= LENTA_MS:
+        entrada = {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "ms": round(duracao_ms, 1),
+            "linhas": linhas,
+            "bytes": bytes_resultado,
+            "pagina": rodada.pagina if rodada is not None else None,
+            "secao": nome_secao,
+            "sql": sql,
+            "params": [str(p) for p in params or ()],
+        }
+        if EXPLAIN_LENTAS:
+            entrada["explain"] = _explain(conn, sql, params)
+        _logger_lentas().info(json.dumps(entrada, ensure_ascii=False, default=str))
@@ -0,0 +1,266 @@
+"""Ocupação das agendas: horários marcados x horários disponíveis.
+
+A grade é a de agenda.py (expediente, duração da consulta e dias de
+atendimento): cada médico oferece os mesmos horários candidatos no período.
+Os pares (CodMed, Data_Hora) saem de uma varredura por faixa no índice único
+uq_Consulta_Med_Data (CodMed IN (...) AND Data_Hora na faixa), já ordenados
+e sem ler a tabela. Cada consulta vira índices inteiros (médico, dia,
+horário da grade) e a ocupação por médico, semana e dia da semana x horário
+sai de np.bincount, sem laço por linha. A ocupação por clínica usa o índice
+(CodCli, Data_Hora, CodMed): a capacidade de uma clínica são os dias em que
+cada médico atendeu nela, vezes os horários de um dia.
+
+Verificação pela linha de comando (mostra o tempo de leitura e de cálculo):
+    python ocupacao.py 2024-01-01 2024-12-31
+"""
+import argparse
+import datetime
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import agenda
+import dashboard
+from banco import ler_sql
+
+MINUTOS_DIA = 24 * 60
+INICIO = agenda.INICIO_EXPEDIENTE.hour * 60 + agenda.INICIO_EXPEDIENTE.minute  # minutos desde 00:00
+PASSO = int(agenda.DURACAO_CONSULTA.total_seconds() // 60)
+SLOTS_DIA = len(agenda.HORARIOS)
+DIAS = np.array(sorted(agenda.DIAS_ATENDIMENTO))
+ATENDE = np.isin(np.arange(7), DIAS)  # dia da semana -> há expediente?
+NOMES_DIAS = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
+ROTULOS_HORARIOS = [h.strftime("%H:%M") for h in agenda.HORARIOS]
+
+
+def _lista(codigos):
+    return ", ".join(["%s"] * len(codigos))
+
+
+def sql_pares(cod_meds, data_inicio, data_fim):
+    # Uma faixa por médico em uq_Consulta_Med_Data: "Using index", já em ordem
+    sql = f"""
+    SELECT CodMed, Data_Hora
+    FROM Consulta
+    WHERE CodMed IN ({_lista(cod_meds)}) AND Data_Hora >= %s AND Data_Hora < %s
+    ORDER BY CodMed, Data_Hora
+    """
+    return sql, (*cod_meds, *dashboard.intervalo_datas(data_inicio, data_fim))
+
+
+def sql_pares_clinicas(cod_clis, data_inicio, data_fim):
+    # Uma faixa por clínica em idx_Consulta_Cli_Data_Med, que também traz CodMed
+    sql = f"""
+    SELECT CodCli, CodMed, Data_Hora
+    FROM Consulta
+    WHERE CodCli IN ({_lista(cod_clis)}) AND Data_Hora >= %s AND Data_Hora < %s
+    """
+    return sql, (*cod_clis, *dashboard.intervalo_datas(data_inicio, data_fim))
+
+
+@dataclass
+class Ocupacao:
+    marcadas: int = 0                 # consultas dentro da grade
+    disponiveis: int = 0              # horários da grade, somando todos os médicos
+    fora_da_grade: int = 0            # consultas fora do expediente ou em dia sem atendimento
+    medicos: pd.DataFrame = None      # uma linha por médico, inclusive os sem consultas
+    semanas: pd.DataFrame = None      # uma linha por semana (início na segunda)
+    mapa: pd.DataFrame = None         # % de ocupação: dia da semana x horário da grade
+    clinicas: pd.DataFrame = None     # preenchido por calcular_clinicas
+    linhas: int = 0                   # pares lidos
+    leitura_s: float = 0.0            # tempo da leitura dos pares
+    segundos: float = 0.0             # tempo do cálculo em memória
+
+    @property
+    def percentual(self):
+        return 100.0 * self.marcadas / self.disponiveis if self.disponiveis else 0.0
+
+
+def _posicoes(datas):
+    # datetime64 -> (dia desde 1970-01-01, horário na grade, dia da semana, está na grade?)
+    minutos = np.asarray(datas, dtype="datetime64[m]").astype(np.int64)
+    dia = minutos // MINUTOS_DIA
+    desde_inicio = minutos % MINUTOS_DIA - INICIO
+    slot = desde_inicio // PASSO
+    dia_semana = (dia + 3) % 7  # 1970-01-01 foi quinta (3)
+    na_grade = ATENDE[dia_semana] & (desde_inicio >= 0) & (slot < SLOTS_DIA)
+    return dia, slot, dia_semana, na_grade
+
+
+def _distintos(valores):
+    # Valores distintos por ordenação (np.unique usa hash, mais lento em milhões de inteiros)
+    valores = np.sort(valores)
+    return valores[np.concatenate(([True], valores[1:] != valores[:-1]))] if len(valores) else valores
+
+
+def _percentual(marcadas, disponiveis):
+    marcadas = np.asarray(marcadas, dtype=np.float64)
+    disponiveis = np.asarray(disponiveis, dtype=np.float64)
+    return np.round(np.divide(100.0 * marcadas, disponiveis, out=np.zeros_like(marcadas),
+                              where=disponiveis > 0), 1)
+
+
+def calcular(pares, codigos, data_inicio, data_fim, nomes=None, especialidades=None):
+    """Ocupação dos médicos em codigos a partir de pares (CodMed, Data_Hora).
+
+    Consultas de médicos fora de codigos são ignoradas; médicos sem
+    consultas aparecem com 0%. Os pares não precisam vir ordenados.
+    """
+    inicio = time.perf_counter()
+    n_med = len(codigos)
+    grade = agenda.candidatos(data_inicio, data_fim)
+    g_dia, g_slot, g_dia_semana, _ = _posicoes(grade)
+
+    med = pd.Categorical(pares["CodMed"], categories=codigos).codes.astype(np.int64)
+    datas = pares["Data_Hora"].to_numpy(dtype="datetime64[m]")
+    dia, slot, dia_semana, na_grade = _posicoes(datas)
+    conhecido = med >= 0
+    dentro = conhecido & na_grade
+    resultado = Ocupacao(linhas=len(pares), fora_da_grade=int((conhecido & ~na_grade).sum()))
+
+    # As lacunas comparam consultas seguidas do mesmo médico no mesmo dia: cada
+    # médico precisa estar em um bloco só, em ordem de data (como sql_pares
+    # devolve); senão, ordena aqui
+    med, dia, slot, dia_semana, datas = med[dentro], dia[dentro], slot[dentro], dia_semana[dentro], datas[dentro]
+    por_medico = np.bincount(med, minlength=n_med)
+    mudou = med[1:] != med[:-1]
+    if int(mudou.sum()) + 1 != np.count_nonzero(por_medico) or not np.all(mudou | (datas[1:] >= datas[:-1])):
+        ordem = np.lexsort((datas, med))
+        med, dia, slot, dia_semana = med[ordem], dia[ordem], slot[ordem], dia_semana[ordem]
+
+    # --- Por médico ---
+    horarios_medico = np.bincount(med * SLOTS_DIA + slot, minlength=n_med * SLOTS_DIA).reshape(n_med, SLOTS_DIA)
+    pico = horarios_medico.argmax(axis=1)
+    mesmo_dia = (med[1:] == med[:-1]) & (dia[1:] == dia[:-1])
+    intervalo = np.where(mesmo_dia, slot[1:] - slot[:-1] - 1, 0).clip(min=0)
+    lacunas = np.bincount(med[1:], weights=intervalo, minlength=n_med).astype(np.int64) if len(med) > 1 \
+        else np.zeros(n_med, dtype=np.int64)
+    maior_lacuna = np.zeros(n_med, dtype=np.int64)
+    if len(intervalo):
+        np.maximum.at(maior_lacuna, med[1:], intervalo)
+    disponiveis = len(grade)
+    resultado.medicos = pd.DataFrame({
+        "CodMed": list(codigos),
+        "NomeMed": list(nomes) if nomes is not None else list(codigos),
+        "Especialidade": list(especialidades) if especialidades is not None else None,
+        "Marcadas": por_medico,
+        "Disponíveis": disponiveis,
+        "Ocupação (%)": _percentual(por_medico, np.full(n_med, disponiveis)),
+        "Horários vagos entre consultas": lacunas,
+        "Maior intervalo (min)": maior_lacuna * PASSO,
+        "Horário de pico": np.where(por_medico > 0, np.array(ROTULOS_HORARIOS, dtype=object)[pico], None),
+    }).sort_values("Ocupação (%)", ascending=False, kind="stable").reset_index(drop=True)
+
+    # --- Por semana (segunda-feira de início) ---
+    primeira_segunda = int(g_dia[0] - (g_dia[0] + 3) % 7) if len(grade) else 0
+    g_semana = (g_dia - primeira_segunda) // 7
+    n_sem = int(g_semana.max()) + 1 if len(grade) else 0
+    marcadas_semana = np.bincount((dia - primeira_segunda) // 7, minlength=n_sem)[:n_sem]
+    disponiveis_semana = np.bincount(g_semana, minlength=n_sem) * n_med
+    resultado.semanas = pd.DataFrame({
+        "Semana": (np.datetime64("1970-01-01") + (primeira_segunda + 7 * np.arange(n_sem)).astype("timedelta64[D]")),
+        "Marcadas": marcadas_semana,
+        "Disponíveis": disponiveis_semana,
+        "Ocupação (%)": _percentual(marcadas_semana, disponiveis_semana),
+    })
+
+    # --- Dia da semana x horário ---
+    celulas = 7 * SLOTS_DIA
+    marcadas_celula = np.bincount(dia_semana * SLOTS_DIA + slot, minlength=celulas)
+    disponiveis_celula = np.bincount(g_dia_semana * SLOTS_DIA + g_slot, minlength=celulas) * n_med
+    mapa = _percentual(marcadas_celula, disponiveis_celula).reshape(7, SLOTS_DIA)[DIAS]
+    resultado.mapa = pd.DataFrame(mapa, index=[NOMES_DIAS[d] for d in DIAS], columns=ROTULOS_HORARIOS)
+
+    resultado.marcadas = int(por_medico.sum())
+    resultado.disponiveis = disponiveis * n_med
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def calcular_clinicas(triplas, codigos, nomes=None):
+    """Ocupação por clínica a partir de (CodCli, CodMed, Data_Hora).
+
+    Capacidade: para cada dia em que um médico teve consulta na clínica,
+    todos os horários da grade daquele dia.
+    """
+    n_cli = len(codigos)
+    cli = pd.Categorical(triplas["CodCli"], categories=codigos).codes.astype(np.int64)
+    med = pd.factorize(triplas["CodMed"])[0].astype(np.int64)
+    dia, _, _, na_grade = _posicoes(triplas["Data_Hora"].to_numpy(dtype="datetime64[m]"))
+    dentro = (cli >= 0) & na_grade
+    cli, med, dia = cli[dentro], med[dentro], dia[dentro]
+    marcadas = np.bincount(cli, minlength=n_cli)
+    # (clínica, médico, dia) distintos em um inteiro só
+    if len(dia):
+        dia = dia - dia.min()
+    n_med, n_dia = int(med.max(initial=0)) + 1, int(dia.max(initial=0)) + 1
+    dias_medico = _distintos((cli * n_med + med) * n_dia + dia)
+    disponiveis = np.bincount(dias_medico // (n_med * n_dia), minlength=n_cli) * SLOTS_DIA
+    medicos = np.bincount(_distintos(dias_medico // n_dia) // n_med, minlength=n_cli)
+    return pd.DataFrame({
+        "CodCli": list(codigos),
+        "NomeCli": list(nomes) if nomes is not None else list(codigos),
+        "Médicos": medicos,
+        "Marcadas": marcadas,
+        "Disponíveis": disponiveis,
+        "Ocupação (%)": _percentual(marcadas, disponiveis),
+    }).sort_values("Ocupação (%)", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def carregar(conn, medicos, data_inicio, data_fim, especialidade="Todas", clinicas=None, ler=ler_sql):
+    """Lê os pares do banco e calcula a ocupação.
+
+    medicos e clinicas são listas de referencia.obter; com clinicas, também
+    calcula a ocupação por clínica.
+    """
+    escolhidos = [i for i, e in enumerate(medicos.extras or [None] * len(medicos))
+                  if especialidade == "Todas" or e == especialidade]
+    codigos = [medicos.codigos[i] for i in escolhidos]
+    if not codigos:
+        return Ocupacao(medicos=pd.DataFrame(), semanas=pd.DataFrame(), mapa=pd.DataFrame())
+    inicio = time.perf_counter()
+    pares = ler(conn, *sql_pares(codigos, data_inicio, data_fim))
+    leitura = time.perf_counter() - inicio
+    resultado = calcular(pares, codigos, data_inicio, data_fim,
+                         nomes=[medicos.nomes[i] for i in escolhidos],
+                         especialidades=[medicos.extras[i] for i in escolhidos] if medicos.extras else None)
+    resultado.leitura_s = leitura
+    if clinicas is not None and len(clinicas):
+        triplas = ler(conn, *sql_pares_clinicas(clinicas.codigos, data_inicio, data_fim))
+        if especialidade != "Todas":
+            triplas = triplas[triplas["CodMed"].isin(codigos)]
+        resultado.clinicas = calcular_clinicas(triplas, clinicas.codigos, clinicas.nomes)
+    return resultado
+
+
+def main(argv=None):
+    import referencia
+    from banco import conectar
+
+    parser = argparse.ArgumentParser(description="Ocupação das agendas dos médicos no período.")
+    parser.add_argument("inicio", type=datetime.date.fromisoformat)
+    parser.add_argument("fim", type=datetime.date.fromisoformat)
+    parser.add_argument("--especialidade", default="Todas")
+    args = parser.parse_args(argv)
+
+    conn = conectar()
+    try:
+        resultado = carregar(conn, referencia.obter(conn, "medicos"), args.inicio, args.fim, args.especialidade,
+                             clinicas=referencia.obter(conn, "clinicas"))
+    finally:
+        conn.close()
+    print(f"{resultado.linhas} consultas lidas em {resultado.leitura_s:.2f}s, "
+          f"ocupação calculada em {resultado.segundos * 1000:.0f} ms", file=sys.stderr)
+    print(f"Ocupação: {resultado.marcadas} de {resultado.disponiveis} horários ({resultado.percentual:.1f}%), "
+          f"{resultado.fora_da_grade} consulta(s) fora da grade")
+    print(resultado.medicos.head(10).to_string(index=False))
+    print(resultado.mapa.to_string())
+    if resultado.clinicas is not None:
+        print(resultado.clinicas.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cache em memória das tabelas de referência (médicos e clínicas).
+
+As caixas de seleção do app (formulário de consultas, filtros do Dashboard e
+de Cadastros, recuperação na Auditoria) usam estas listas em vez de reler as
+tabelas a cada interação. Pacientes são muitos para uma lista: os formulários
+os buscam por prefixo (busca.sugerir_pacientes). Uma lista é relida quando a
+versão da sua tabela muda: pelas escritas deste processo (banco.versao_dados)
+ou, para as feitas por outros processos, pela tabela Controle_Versao mantida
+por gatilhos (script_banco.sql), consultada no máximo a cada REF_VERIFICAR_S
+segundos.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import mysql.connector
+
+from banco import executar, ler_sql, versao_dados
+
+REF_VERIFICAR_S = float(os.environ.get("REF_VERIFICAR_S", "5"))  # intervalo entre leituras de Controle_Versao
+
+# entidade -> (tabela, SELECT com codigo, nome e, opcionalmente, extra)
+ENTIDADES = {
+    "medicos": ("Medico", "SELECT CodMed AS codigo, NomeMed AS nome, Especialidade AS extra FROM Medico ORDER BY NomeMed"),
+    "clinicas": ("Clinica", "SELECT CodCli AS codigo, NomeCli AS nome FROM Clinica ORDER BY NomeCli"),
+}
+
+
+@dataclass
+class Lista:
+    codigos: list
+    nomes: list
+    rotulos: list                                     # "código - nome", prontos para o selectbox
+    extras: list = None                               # Especialidade, para médicos
+    posicao: dict = field(default_factory=dict)       # código -> índice
+
+    @classmethod
+    def do_dataframe(cls, df):
+        # Rótulos montados de uma vez (operações vetorizadas do pandas)
+        # astype(object): nomes repetidos podem chegar como category (banco.ler_colunar)
+        codigos, nomes = df["codigo"].astype(str), df["nome"].astype(object).fillna("")
+        return cls(codigos=codigos.tolist(), nomes=nomes.tolist(), rotulos=(codigos + " - " + nomes).tolist(),
+                   extras=df["extra"].tolist() if "extra" in df else None,
+                   posicao={codigo: i for i, codigo in enumerate(codigos)})
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def nome(self, codigo):
+        i = self.posicao.get(codigo)
+        return self.nomes[i] if i is not None else None
+
+    def rotulos_com_extra(self):
+        # "código - nome (especialidade)"
+        return [f"{r} ({e})" for r, e in zip(self.rotulos, self.extras)] if self.extras else self.rotulos
+
+
+_listas = {}            # entidade -> (versão, Lista)
+_carimbos = {"lido_em": None, "versoes": {}, "disponivel": True}
+_lock = threading.Lock()
+
+
+def _versoes_banco(conn, forcar=False):
+    # Versões de Controle_Versao, relidas no máximo a cada REF_VERIFICAR_S
+    with _lock:
+        if not _carimbos["disponivel"]:
+            return {}
+        lido_em = _carimbos["lido_em"]
+        if not forcar and lido_em is not None and time.monotonic() - lido_em < REF_VERIFICAR_S:
+            return _carimbos["versoes"]
+    try:
+        cursor = executar(conn.cursor(), "SELECT Tabela, Versao FROM Controle_Versao")
+        versoes = dict(cursor.fetchall())
+        cursor.close()
+    except mysql.connector.ProgrammingError:
+        # Migração não aplicada: só as escritas deste processo invalidam
+        with _lock:
+            _carimbos["disponivel"] = False
+        return {}
+    with _lock:
+        _carimbos.update(lido_em=time.monotonic(), versoes=versoes)
+    return versoes
+
+
+def versao(conn, tabela, forcar=False):
+    # Versão atual da tabela: escritas deste processo e carimbo de Controle_Versao
+    return versao_dados(tabela), _versoes_banco(conn, forcar).get(tabela)
+
+
+def obter(conn, entidade):
+    """Lista de referência da entidade ("medicos" ou "clinicas")."""
+    tabela, sql = ENTIDADES[entidade]
+    with _lock:
+        atual = _listas.get(entidade)
+    # Escrita local desde a última leitura: confere o carimbo do banco agora
+    versao_atual = versao(conn, tabela, forcar=atual is not None and atual[0][0] != versao_dados(tabela))
+    if atual is not None and atual[0] == versao_atual:
+        return atual[1]
+    lista = Lista.do_dataframe(ler_sql(conn, sql))
+    with _lock:
+        _listas[entidade] = (versao_atual, lista)
+    return lista
+
+
+def especialidades(conn):
+    # Derivadas da lista de médicos: nenhuma consulta a mais
+    medicos = obter(conn, "medicos")
+    return sorted({e for e in medicos.extras or () if e})
+
@@ -263,6 +263,102 @@ BEGIN
 END$$
 DELIMITER ;
 
+-- ==========================================================
+-- RESUMO DIÁRIO (Consulta_Diaria) PARA O GRÁFICO DE EVOLUÇÃO
+-- ==========================================================
+-- Uma linha por dia/médico/clínica com a quantidade de consultas, mantida
+-- pelos gatilhos abaixo. O Dashboard agrupa por dia, semana ou mês a partir
+-- desta tabela em vez de percorrer toda a Consulta.
+CREATE TABLE IF NOT EXISTS Consulta_Diaria (
+    Dia DATE NOT NULL,
+    CodMed CHAR(7) NOT NULL,
+    CodCli CHAR(7) NOT NULL,
+    Especialidade VARCHAR(50),
+    Qtd INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Dia, CodMed, CodCli),
+    INDEX idx_Diaria_Esp_Dia (Especialidade, Dia)
+);
+
+DELIMITER $$
+CREATE TRIGGER trg_Diaria_Inserir
+AFTER INSERT ON Consulta
+FOR EACH ROW
+BEGIN
+    IF NEW.Data_Hora IS NOT NULL AND NEW.CodMed IS NOT NULL AND NEW.CodCli IS NOT NULL THEN
+        INSERT INTO Consulta_Diaria (Dia, CodMed, CodCli, Especialidade, Qtd)
+        VALUES (DATE(NEW.Data_Hora), NEW.CodMed, NEW.CodCli,
+                (SELECT Especialidade FROM Medico WHERE CodMed = NEW.CodMed), 1)
+        ON DUPLICATE KEY UPDATE Qtd = Qtd + 1;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_Diaria_Remover
+AFTER DELETE ON Consulta
+FOR EACH ROW FOLLOWS trg_Auditoria_Cancelamento
+BEGIN
+    UPDATE Consulta_Diaria SET Qtd = Qtd - 1
+    WHERE Dia = DATE(OLD.Data_Hora) AND CodMed = OLD.CodMed AND CodCli = OLD.CodCli;
+    DELETE FROM Consulta_Diaria
+    WHERE Dia = DATE(OLD.Data_Hora) AND CodMed = OLD.CodMed AND CodCli = OLD.CodCli AND Qtd <= 0;
+END$$
+
+CREATE TRIGGER trg_Diaria_Atualizar
+AFTER UPDATE ON Consulta
+FOR EACH ROW
+BEGIN
+    IF NOT (DATE(OLD.Data_Hora) <=> DATE(NEW.Data_Hora)
+            AND OLD.CodMed <=> NEW.CodMed AND OLD.CodCli <=> NEW.CodCli) THEN
+        UPDATE Consulta_Diaria SET Qtd = Qtd - 1
+        WHERE Dia = DATE(OLD.Data_Hora) AND CodMed = OLD.CodMed AND CodCli = OLD.CodCli;
+        DELETE FROM Consulta_Diaria
+        WHERE Dia = DATE(OLD.Data_Hora) AND CodMed = OLD.CodMed AND CodCli = OLD.CodCli AND Qtd <= 0;
+        IF NEW.Data_Hora IS NOT NULL AND NEW.CodMed IS NOT NULL AND NEW.CodCli IS NOT NULL THEN
+            INSERT INTO Consulta_Diaria (Dia, CodMed, CodCli, Especialidade, Qtd)
+            VALUES (DATE(NEW.Data_Hora), NEW.CodMed, NEW.CodCli,
+                    (SELECT Especialidade FROM Medico WHERE CodMed = NEW.CodMed), 1)
+            ON DUPLICATE KEY UPDATE Qtd = Qtd + 1;
+        END IF;
+    END IF;
+END$$
+
+-- O ON UPDATE CASCADE das chaves estrangeiras não dispara gatilhos em Consulta,
+-- então mudanças de código/especialidade são repassadas ao resumo aqui
+CREATE TRIGGER trg_Diaria_Medico
+AFTER UPDATE ON Medico
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.CodMed <=> NEW.CodMed AND OLD.Especialidade <=> NEW.Especialidade) THEN
+        UPDATE Consulta_Diaria SET CodMed = NEW.CodMed, Especialidade = NEW.Especialidade
+        WHERE CodMed = OLD.CodMed;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_Diaria_Clinica
+AFTER UPDATE ON Clinica
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.CodCli <=> NEW.CodCli) THEN
+        UPDATE Consulta_Diaria SET CodCli = NEW.CodCli WHERE CodCli = OLD.CodCli;
+    END IF;
+END$$
+
+-- Carga inicial (ou reconstrução) do resumo a partir de Consulta
+CREATE PROCEDURE sp_Recalcular_Consulta_Diaria()
+BEGIN
+    START TRANSACTION;
+    DELETE FROM Consulta_Diaria;
+    INSERT INTO Consulta_Diaria (Dia, CodMed, CodCli, Especialidade, Qtd)
+    SELECT DATE(c.Data_Hora), c.CodMed, c.CodCli, m.Especialidade, COUNT(*)
+    FROM Consulta c
+    JOIN Medico m ON c.CodMed = m.CodMed
+    WHERE c.Data_Hora IS NOT NULL AND c.CodCli IS NOT NULL
+    GROUP BY DATE(c.Data_Hora), c.CodMed, c.CodCli, m.Especialidade;
+    COMMIT;
+END$$
+DELIMITER ;
+
+CALL sp_Recalcular_Consulta_Diaria();
+
 -- GATILHO (TRIGGER) 2: PREVENÇÃO DE DATA RETROATIVA
 DELIMITER $$
 CREATE TRIGGER trg_Validar_Data_Consulta
@@ -273,4 +369,183 @@ BEGIN
         SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'ERRO DE INTEGRIDADE: Não é permitido agendar consultas para datas/horas passadas. Verifique a Data_Hora.';
     END IF;
 END$$
-DELIMITER ;
\ No newline at end of file
+DELIMITER ;
+-- ==========================================================
+-- MIGRAÇÃO: ÍNDICES PARA OS FILTROS DE PERÍODO DO DASHBOARD
+-- ==========================================================
+-- O Dashboard filtra por Data_Hora >= início AND Data_Hora < fim + 1 dia.
+-- (Data_Hora, CodMed, CpfPaciente) cobre KPIs, rankings e séries temporais;
+-- (CodMed, Data_Hora) atende a agenda de cada médico e o relatório de ociosos.
+CREATE INDEX idx_Consulta_Data_Med_Pac ON Consulta (Data_Hora, CodMed, CpfPaciente);
+CREATE INDEX idx_Consulta_Med_Data ON Consulta (CodMed, Data_Hora);
+
+-- Verificação: a coluna "type" da tabela c deve ser "range" (antes era "ALL").
+-- O mesmo teste para todas as consultas do Dashboard: python dashboard.py
+EXPLAIN SELECT COUNT(*) AS total, COUNT(DISTINCT c.CpfPaciente) AS pacientes
+FROM Consulta c
+JOIN Medico m ON c.CodMed = m.CodMed
+WHERE c.Data_Hora >= '2024-01-01' AND c.Data_Hora < '2025-01-01';
+
+EXPLAIN SELECT DISTINCT CodMed
+FROM Consulta c
+WHERE c.Data_Hora >= '2024-01-01' AND c.Data_Hora < '2025-01-01';
+
+-- ==========================================================
+-- MIGRAÇÃO: ÍNDICES DE BUSCA POR NOME
+-- ==========================================================
+-- FULLTEXT para palavras com 3+ letras (ranqueado por relevância) e uma coluna
+-- normalizada (minúsculas, collation sem acento) indexada para buscas por
+-- prefixo com termos curtos. As colunas são INVISIBLE: não aparecem no SELECT *.
+ALTER TABLE Paciente
+    ADD COLUMN NomePacBusca VARCHAR(100) COLLATE utf8mb4_0900_ai_ci
+        AS (LOWER(TRIM(NomePac))) STORED INVISIBLE,
+    ADD INDEX idx_Paciente_NomeBusca (NomePacBusca),
+    ADD FULLTEXT INDEX ft_Paciente_Nome (NomePac);
+
+ALTER TABLE Medico
+    ADD COLUMN NomeMedBusca VARCHAR(100) COLLATE utf8mb4_0900_ai_ci
+        AS (LOWER(TRIM(NomeMed))) STORED INVISIBLE,
+    ADD INDEX idx_Medico_NomeBusca (NomeMedBusca),
+    ADD FULLTEXT INDEX ft_Medico_Nome (NomeMed);
+
+ALTER TABLE Clinica
+    ADD COLUMN NomeCliBusca VARCHAR(100) COLLATE utf8mb4_0900_ai_ci
+        AS (LOWER(TRIM(NomeCli))) STORED INVISIBLE,
+    ADD INDEX idx_Clinica_NomeBusca (NomeCliBusca),
+    ADD FULLTEXT INDEX ft_Clinica_Nome (NomeCli);
+
+-- ==========================================================
+-- MIGRAÇÃO: MOTIVO E LOTE NO LOG DE CANCELAMENTO
+-- ==========================================================
+-- O cancelamento em massa informa o motivo e um identificador de lote pelas
+-- variáveis de sessão @motivo_cancelamento e @lote_cancelamento; sem elas o
+-- gatilho mantém o texto padrão.
+ALTER TABLE Log_Cancelamento
+    ADD COLUMN IdLote CHAR(36) NULL,
+    ADD INDEX idx_Log_Lote (IdLote);
+
+DROP TRIGGER IF EXISTS trg_Auditoria_Cancelamento;
+DELIMITER $$
+CREATE TRIGGER trg_Auditoria_Cancelamento
+AFTER DELETE ON Consulta
+FOR EACH ROW PRECEDES trg_Diaria_Remover
+BEGIN
+    INSERT INTO Log_Cancelamento (Usuario, DataCancelamento, IdConsultaDeletada, CpfPaciente, CodMed, CodCli, Data_Hora, Motivo, IdLote)
+    VALUES (USER(), NOW(), OLD.IdConsulta, OLD.CpfPaciente, OLD.CodMed, OLD.CodCli, OLD.Data_Hora,
+            COALESCE(@motivo_cancelamento, 'Consulta Removida pelo Sistema'), @lote_cancelamento);
+END$$
+DELIMITER ;
+
+-- ==========================================================
+-- MIGRAÇÃO: VERSÃO DAS TABELAS DE REFERÊNCIA
+-- ==========================================================
+-- Cada escrita em Medico, Paciente ou Clinica incrementa a versão da tabela.
+-- O app guarda as listas dessas tabelas em memória (referencia.py) e só as
+-- relê quando a versão muda, inclusive por escritas de outros processos.
+CREATE TABLE IF NOT EXISTS Controle_Versao (
+    Tabela VARCHAR(30) PRIMARY KEY,
+    Versao BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    AtualizadoEm TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO Controle_Versao (Tabela) VALUES ('Medico'), ('Paciente'), ('Clinica');
+
+DELIMITER $$
+CREATE TRIGGER trg_Versao_Medico_Inserir AFTER INSERT ON Medico FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Medico'$$
+CREATE TRIGGER trg_Versao_Medico_Atualizar AFTER UPDATE ON Medico FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Medico'$$
+CREATE TRIGGER trg_Versao_Medico_Remover AFTER DELETE ON Medico FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Medico'$$
+
+CREATE TRIGGER trg_Versao_Paciente_Inserir AFTER INSERT ON Paciente FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Paciente'$$
+CREATE TRIGGER trg_Versao_Paciente_Atualizar AFTER UPDATE ON Paciente FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Paciente'$$
+CREATE TRIGGER trg_Versao_Paciente_Remover AFTER DELETE ON Paciente FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Paciente'$$
+
+CREATE TRIGGER trg_Versao_Clinica_Inserir AFTER INSERT ON Clinica FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Clinica'$$
+CREATE TRIGGER trg_Versao_Clinica_Atualizar AFTER UPDATE ON Clinica FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Clinica'$$
+CREATE TRIGGER trg_Versao_Clinica_Remover AFTER DELETE ON Clinica FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Clinica'$$
+DELIMITER ;
+
+-- ==========================================================
+-- MIGRAÇÃO: UM MÉDICO, UMA CONSULTA POR HORÁRIO
+-- ==========================================================
+-- O índice (CodMed, Data_Hora) passa a ser único: dois agendamentos
+-- simultâneos no mesmo horário do mesmo médico não passam mais (erro 1062).
+-- Continua atendendo a agenda de cada médico, o relatório de ociosos e a
+-- busca de horários livres (agenda.py). Antes de aplicar, confira se já
+-- existem horários duplicados:
+SELECT CodMed, Data_Hora, COUNT(*) AS Qtd
+FROM Consulta
+GROUP BY CodMed, Data_Hora
+HAVING COUNT(*) > 1;
+
+ALTER TABLE Consulta
+    DROP INDEX idx_Consulta_Med_Data,
+    ADD UNIQUE INDEX uq_Consulta_Med_Data (CodMed, Data_Hora);
+
+-- ==========================================================
+-- MIGRAÇÃO: LOG DE CANCELAMENTO PAGINADO E ARQUIVO
+-- ==========================================================
+-- A Auditoria lista o log do mais recente para o mais antigo, em páginas
+-- (chave DataCancelamento, IdLog) e filtra por faixa de DataCancelamento:
+-- o índice atende as duas coisas sem ler a tabela inteira.
+ALTER TABLE Log_Cancelamento
+    ADD INDEX idx_Log_Data (DataCancelamento);
+
+-- Entradas antigas saem do log pelo arquivamento.py e vêm para esta tabela
+-- comprimida, mantendo o mesmo IdLog; o log consultado no dia a dia fica
+-- pequeno e o arquivo continua disponível na Auditoria.
+CREATE TABLE IF NOT EXISTS Log_Cancelamento_Arquivo (
+    IdLog INT PRIMARY KEY,
+    Usuario VARCHAR(50),
+    DataCancelamento DATETIME,
+    IdConsultaDeletada INT,
+    CpfPaciente CHAR(11),
+    CodMed CHAR(7),
+    CodCli CHAR(7),
+    Data_Hora DATETIME,
+    Motivo VARCHAR(100),
+    IdLote CHAR(36) NULL,
+    ArquivadoEm DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_Arquivo_Data (DataCancelamento)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+-- ==========================================================
+-- MIGRAÇÃO: ATUALIZAÇÃO INCREMENTAL DO DASHBOARD
+-- ==========================================================
+-- O modo incremental (agregados.py) acompanha Consulta pelas marcas de
+-- IdConsulta e de Log_Cancelamento.IdLog, que só enxergam inserções e
+-- cancelamentos. Uma UPDATE em Consulta ou a remoção de entradas do log
+-- (recuperação, arquivamento.py) incrementa esta versão e os agregados em
+-- memória são reconstruídos.
+INSERT IGNORE INTO Controle_Versao (Tabela) VALUES ('Consulta_Alterada');
+
+DELIMITER $$
+CREATE TRIGGER trg_Versao_Consulta_Atualizar AFTER UPDATE ON Consulta FOR EACH ROW FOLLOWS trg_Diaria_Atualizar
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Consulta_Alterada'$$
+CREATE TRIGGER trg_Versao_Log_Remover AFTER DELETE ON Log_Cancelamento FOR EACH ROW
+    UPDATE Controle_Versao SET Versao = Versao + 1 WHERE Tabela = 'Consulta_Alterada'$$
+DELIMITER ;
+
+-- ==========================================================
+-- MIGRAÇÃO: AGENDA DA CLÍNICA EM PÁGINAS
+-- ==========================================================
+-- Gerenciar Cadastros lista as consultas de uma clínica em páginas
+-- (chave Data_Hora, CodMed) e soma as consultas por especialidade. Com
+-- CodMed no índice, as duas consultas percorrem só a faixa da clínica,
+-- já na ordem da página, sem ler as linhas de Consulta para os totais.
+CREATE INDEX idx_Consulta_Cli_Data_Med ON Consulta (CodCli, Data_Hora, CodMed);
+
+-- Verificação: "key" deve ser idx_Consulta_Cli_Data_Med, sem "Using filesort".
+EXPLAIN SELECT c.IdConsulta, c.Data_Hora, c.CodMed
+FROM Consulta c
+WHERE c.CodCli = '0000001'
+ORDER BY c.Data_Hora DESC, c.CodMed DESC
+LIMIT 26;
@@ -0,0 +1,262 @@
+"""Snapshot em Parquet das consultas para as análises do Dashboard.
+
+As consultas do Dashboard juntam Consulta, Medico, Paciente e Clinica no
+mesmo MySQL em que a recepção agenda. Este módulo exporta essa junção já
+desnormalizada para arquivos Parquet particionados por ano/mês e o
+Dashboard, no modo "snapshot", lê só esses arquivos (mapeados em memória,
+agregados com pyarrow), sem nenhuma consulta ao banco.
+
+A atualização é incremental: uma consulta agrupada calcula, para cada mês,
+a quantidade de linhas e uma soma de verificação (BIT_XOR de CRC32); só os
+meses cuja assinatura mudou são exportados de novo. Mudanças em médicos,
+pacientes ou clínicas (nomes, especialidade) mudam a assinatura das
+dimensões e reexportam tudo. Tudo é lido de uma mesma fotografia do banco
+(START TRANSACTION WITH CONSISTENT SNAPSHOT).
+
+Uso pela linha de comando (por exemplo, a cada 15 minutos no cron):
+    python snapshot.py --pasta snapshot_consultas
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+import dashboard
+from banco import conectar, executar, ler_sql
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshot_consultas")
+MANIFESTO = "manifesto.json"
+PASTA_FATOS = "fatos"
+ARQUIVO_MEDICOS = "medicos.parquet"
+IDADE_AVISO = datetime.timedelta(hours=24)  # o Dashboard avisa quando o snapshot é mais velho que isso
+
+SQL_ASSINATURAS = """
+SELECT YEAR(Data_Hora) AS ano, MONTH(Data_Hora) AS mes, COUNT(*) AS linhas,
+       BIT_XOR(CRC32(CONCAT_WS('|', IdConsulta, CodCli, CodMed, CpfPaciente, Data_Hora))) AS assinatura
+FROM Consulta
+WHERE Data_Hora IS NOT NULL
+GROUP BY ano, mes
+"""
+
+SQL_ASSINATURA_DIMENSOES = """
+SELECT (SELECT BIT_XOR(CRC32(CONCAT_WS('|', CodMed, NomeMed, Especialidade, Email))) FROM Medico) AS Medico,
+       (SELECT BIT_XOR(CRC32(CONCAT_WS('|', CpfPaciente, NomePac))) FROM Paciente) AS Paciente,
+       (SELECT BIT_XOR(CRC32(CONCAT_WS('|', CodCli, NomeCli))) FROM Clinica) AS Clinica
+"""
+
+SQL_MEDICOS = "SELECT CodMed, NomeMed, Especialidade, Email FROM Medico"
+
+# Colunas de texto repetidas guardadas como dicionário (categóricas no pandas)
+ESQUEMA_FATOS = pa.schema([
+    ("IdConsulta", pa.int64()),
+    ("Data_Hora", pa.timestamp("s")),
+    ("CodMed", pa.string()),
+    ("NomeMed", pa.dictionary(pa.int32(), pa.string())),
+    ("Especialidade", pa.dictionary(pa.int32(), pa.string())),
+    ("CpfPaciente", pa.string()),
+    ("NomePac", pa.string()),
+    ("CodCli", pa.dictionary(pa.int32(), pa.string())),
+    ("NomeCli", pa.dictionary(pa.int32(), pa.string())),
+])
+
+
+def sql_fatos(ano, mes):
+    inicio = datetime.datetime(ano, mes, 1)
+    fim = datetime.datetime(ano + mes // 12, mes % 12 + 1, 1)
+    sql = """
+    SELECT c.IdConsulta, c.Data_Hora, c.CodMed, m.NomeMed, m.Especialidade,
+           c.CpfPaciente, p.NomePac, c.CodCli, cl.NomeCli
+    FROM Consulta c
+    JOIN Medico m ON c.CodMed = m.CodMed
+    JOIN Paciente p ON c.CpfPaciente = p.CpfPaciente
+    JOIN Clinica cl ON c.CodCli = cl.CodCli
+    WHERE c.Data_Hora >= %s AND c.Data_Hora < %s
+    ORDER BY c.Data_Hora
+    """
+    return sql, (inicio, fim)
+
+
+def _caminho_mes(pasta, ano, mes):
+    return os.path.join(pasta, PASTA_FATOS, f"ano={ano}", f"mes={mes:02d}")
+
+
+def _gravar(tabela, destino):
+    # Grava ao lado e troca de uma vez: quem estiver lendo nunca vê arquivo pela metade
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = destino + ".tmp"
+    pq.write_table(tabela, temporario, compression="zstd")
+    os.replace(temporario, destino)
+
+
+def ler_manifesto(pasta=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(pasta, MANIFESTO), encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+@dataclass
+class ResumoAtualizacao:
+    meses_exportados: list = field(default_factory=list)
+    meses_removidos: list = field(default_factory=list)
+    linhas: int = 0
+    segundos: float = 0.0
+
+
+def atualizar(conn, pasta=SNAPSHOT_DIR, completo=False, progresso=None):
+    """Exporta os meses que mudaram desde o último manifesto; devolve um ResumoAtualizacao."""
+    resumo = ResumoAtualizacao()
+    inicio = time.perf_counter()
+    anterior = None if completo else ler_manifesto(pasta)
+    cursor = conn.cursor()
+    executar(cursor, "START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    try:
+        dimensoes = {k: int(v or 0) for k, v in ler_sql(conn, SQL_ASSINATURA_DIMENSOES).iloc[0].items()}
+        df_meses = ler_sql(conn, SQL_ASSINATURAS)
+        meses = {f"{int(a)}-{int(m):02d}": [int(n), int(s)]
+                 for a, m, n, s in zip(df_meses["ano"], df_meses["mes"], df_meses["linhas"], df_meses["assinatura"])}
+        if anterior is None or anterior.get("dimensoes") != dimensoes:
+            anterior = {"meses": {}}  # nomes/especialidades mudaram: tudo de novo
+        for chave, assinatura in sorted(meses.items()):
+            if anterior["meses"].get(chave) == assinatura:
+                continue
+            ano, mes = map(int, chave.split("-"))
+            df = ler_sql(conn, *sql_fatos(ano, mes))
+            tabela = pa.Table.from_pandas(df, schema=ESQUEMA_FATOS, preserve_index=False)
+            _gravar(tabela, os.path.join(_caminho_mes(pasta, ano, mes), "parte-0.parquet"))
+            resumo.meses_exportados.append(chave)
+            resumo.linhas += len(df)
+            if progresso:
+                progresso(chave, len(df))
+        for chave in sorted(set(anterior["meses"]) - set(meses)):
+            ano, mes = map(int, chave.split("-"))
+            shutil.rmtree(_caminho_mes(pasta, ano, mes), ignore_errors=True)
+            resumo.meses_removidos.append(chave)
+        medicos = ler_sql(conn, SQL_MEDICOS)
+    finally:
+        conn.commit()
+        cursor.close()
+    _gravar(pa.Table.from_pandas(medicos, preserve_index=False), os.path.join(pasta, ARQUIVO_MEDICOS))
+    manifesto = {"gerado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "dimensoes": dimensoes, "meses": meses}
+    temporario = os.path.join(pasta, MANIFESTO + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, indent=1)
+    os.replace(temporario, os.path.join(pasta, MANIFESTO))
+    resumo.segundos = time.perf_counter() - inicio
+    return resumo
+
+
+def idade(gerado_em, agora=None):
+    # Há quanto tempo o snapshot foi gerado (a defasagem em relação ao banco)
+    return (agora or datetime.datetime.now()) - datetime.datetime.fromisoformat(gerado_em)
+
+
+def ler_fatos(pasta, data_inicio, data_fim, colunas):
+    """Fatos do período (arquivos mapeados em memória; só as partições do período são abertas)."""
+    inicio, fim = dashboard.intervalo_datas(data_inicio, data_fim)
+    caminho = os.path.join(pasta, PASTA_FATOS)
+    if not os.path.isdir(caminho):
+        return ESQUEMA_FATOS.empty_table().select(colunas)
+    conjunto = ds.dataset(caminho, format="parquet", partitioning="hive",
+                          filesystem=fs.LocalFileSystem(use_mmap=True))
+    filtro = ((ds.field("ano") >= inicio.year) & (ds.field("ano") <= fim.year)
+              & (ds.field("Data_Hora") >= pa.scalar(datetime.datetime.combine(inicio, datetime.time()), pa.timestamp("s")))
+              & (ds.field("Data_Hora") < pa.scalar(datetime.datetime.combine(fim, datetime.time()), pa.timestamp("s"))))
+    # Cada arquivo tem seu próprio dicionário de nomes: unifica para agrupar
+    return conjunto.to_table(columns=colunas, filter=filtro).unify_dictionaries()
+
+
+def semana_mysql(datas):
+    # DATE_FORMAT(d, '%Y-%u') do MySQL: semana começando na segunda, semana 1
+    # é a primeira com 4 ou mais dias no ano, dias antes dela ficam na semana 0
+    datas = pd.to_datetime(pd.Series(datas))
+    iso = datas.dt.isocalendar()
+    anterior = (datas - pd.Timedelta(days=7)).dt.isocalendar()["week"] + 1
+    semana = iso["week"].where(iso["year"] == datas.dt.year, anterior.where(iso["year"] > datas.dt.year, 0))
+    return datas.dt.year.astype(str) + "-" + semana.astype(int).map("{:02d}".format)
+
+
+def _contar(tabela, chaves, nome):
+    if tabela.num_rows == 0:
+        return pd.DataFrame(columns=chaves + [nome])
+    agregado = tabela.select(chaves).group_by(chaves).aggregate([([], "count_all")])
+    return agregado.to_pandas().rename(columns={"count_all": nome})
+
+
+def carregar(data_inicio, data_fim, especialidade="Todas", agrupamento="Dia", pasta=SNAPSHOT_DIR):
+    """DadosDashboard calculado só a partir do snapshot (nenhuma consulta ao MySQL)."""
+    dados = dashboard.DadosDashboard()
+    inicio = time.perf_counter()
+    manifesto = ler_manifesto(pasta)
+    if manifesto is None:
+        erro = f"snapshot não encontrado em {pasta} (rode python snapshot.py)"
+        dados.erros = {nome: erro for nome in ("kpis", "rank_medicos", "rank_pacientes", "especialidades",
+                                               "evolucao", "ociosos")}
+        return dados
+    tabela = ler_fatos(pasta, data_inicio, data_fim,
+                       ["Data_Hora", "CodMed", "NomeMed", "Especialidade", "CpfPaciente", "NomePac"])
+    medicos = pq.read_table(os.path.join(pasta, ARQUIVO_MEDICOS), memory_map=True).to_pandas()
+
+    # Médicos ociosos não dependem da especialidade (como sql_ociosos)
+    com_consulta = set(pc.unique(tabela["CodMed"]).to_pylist())
+    dados.ociosos = medicos.loc[~medicos["CodMed"].isin(com_consulta), ["NomeMed", "Especialidade", "Email"]]
+    dados.ociosos = dados.ociosos.reset_index(drop=True)
+
+    if especialidade != "Todas":
+        tabela = tabela.filter(pc.equal(pc.cast(tabela["Especialidade"], pa.string()), especialidade))
+    dados.kpis = pd.DataFrame({"total": [tabela.num_rows],
+                               "pacientes": [pc.count_distinct(tabela["CpfPaciente"]).as_py() if tabela.num_rows else 0],
+                               "medicos": [len(medicos)]})
+    por_medico = _contar(tabela, ["NomeMed", "Especialidade"], "TotalConsultas")
+    dados.rank_medicos = por_medico.nlargest(10, "TotalConsultas").reset_index(drop=True)
+    dados.rank_pacientes = _contar(tabela, ["NomePac"], "TotalConsultas").nlargest(10, "TotalConsultas").reset_index(drop=True)
+    dados.especialidades = (por_medico.groupby("Especialidade", as_index=False, observed=True)["TotalConsultas"].sum()
+                            .rename(columns={"TotalConsultas": "Quantidade"})
+                            .sort_values("Quantidade", ascending=False).reset_index(drop=True))
+
+    # Série temporal: conta por dia no Arrow e agrupa os dias no pandas
+    dias = pa.table({"Dia": pc.cast(tabela["Data_Hora"], pa.date32())})
+    por_dia = _contar(dias, ["Dia"], "Consultas")
+    chave = {"Dia": lambda d: d,
+             "Semana": semana_mysql,
+             "Mês": lambda d: pd.to_datetime(pd.Series(d)).dt.strftime("%Y-%m")}[agrupamento]
+    por_dia["Data"] = chave(por_dia["Dia"]).to_numpy() if not por_dia.empty else []
+    dados.evolucao = (por_dia.groupby("Data", as_index=False)["Consultas"].sum()
+                      .sort_values("Data").reset_index(drop=True))
+
+    dados.detalhe = manifesto["gerado_em"]  # para o app mostrar a defasagem
+    dados.segundos = time.perf_counter() - inicio
+    return dados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta as consultas para o snapshot Parquet do Dashboard.")
+    parser.add_argument("--pasta", default=SNAPSHOT_DIR, help="pasta do snapshot")
+    parser.add_argument("--completo", action="store_true", help="exporta todos os meses, mesmo sem mudança")
+    args = parser.parse_args(argv)
+
+    conn = conectar()
+    try:
+        resumo = atualizar(conn, args.pasta, args.completo,
+                           progresso=lambda mes, n: print(f"  {mes}: {n} consultas", file=sys.stderr))
+    finally:
+        conn.close()
+    print(f"Meses exportados: {len(resumo.meses_exportados)} ({resumo.linhas} consultas) | "
+          f"removidos: {len(resumo.meses_removidos)} | {resumo.segundos:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import datetime
+
+import mysql.connector
+import numpy as np
+
+import agenda
+
+SEGUNDA = datetime.date(2024, 1, 8)
+DOMINGO = datetime.date(2024, 1, 7)
+
+
+def dt(texto):
+    return datetime.datetime.fromisoformat(texto)
+
+
+def test_grade_do_dia():
+    assert agenda.HORARIOS[0] == datetime.time(7, 0)
+    assert agenda.HORARIOS[-1] == datetime.time(18, 30)
+    assert len(agenda.HORARIOS) == 24
+
+
+def test_candidatos_pulam_o_domingo():
+    slots = agenda.candidatos(datetime.date(2024, 1, 6), SEGUNDA)  # sábado a segunda
+    assert len(slots) == 2 * len(agenda.HORARIOS)
+    assert slots[0] == np.datetime64("2024-01-06T07:00")
+    assert slots[len(agenda.HORARIOS)] == np.datetime64("2024-01-08T07:00")
+    assert not len(agenda.candidatos(DOMINGO, DOMINGO))
+
+
+def test_livres_sem_consultas_e_a_grade_inteira():
+    livres = agenda.horarios_livres([], SEGUNDA, SEGUNDA)
+    assert livres == [datetime.datetime.combine(SEGUNDA, h) for h in agenda.HORARIOS]
+
+
+def test_consulta_fora_da_grade_ocupa_os_horarios_que_sobrepoe():
+    ocupados = np.array(["2024-01-08T07:00", "2024-01-08T08:15", "2024-01-08T18:30"], dtype="datetime64[m]")
+    livres = agenda.horarios_livres(ocupados, SEGUNDA, SEGUNDA)
+    for ocupado in ("2024-01-08 07:00", "2024-01-08 08:00", "2024-01-08 08:30", "2024-01-08 18:30"):
+        assert dt(ocupado) not in livres
+    assert dt("2024-01-08 07:30") in livres
+    assert dt("2024-01-08 09:00") in livres
+    assert len(livres) == len(agenda.HORARIOS) - 4
+
+
+def test_consulta_da_vespera_que_invade_o_periodo():
+    ocupados = np.array(["2024-01-07T23:45"], dtype="datetime64[m]")
+    assert len(agenda.horarios_livres(ocupados, SEGUNDA, SEGUNDA)) == len(agenda.HORARIOS)
+    ocupados = np.array(["2024-01-08T06:45"], dtype="datetime64[m]")
+    assert dt("2024-01-08 07:00") not in agenda.horarios_livres(ocupados, SEGUNDA, SEGUNDA)
+
+
+def test_livres_so_depois_de_agora():
+    livres = agenda.horarios_livres([], SEGUNDA, SEGUNDA, agora=dt("2024-01-08 18:00"))
+    assert livres == [dt("2024-01-08 18:30")]
+
+
+def test_proximo_horario():
+    assert agenda.proximo_horario(dt("2024-01-08 09:10")) == dt("2024-01-08 09:30")
+    assert agenda.proximo_horario(dt("2024-01-08 18:30")) == dt("2024-01-09 07:00")
+    assert agenda.proximo_horario(dt("2024-01-06 20:00")) == dt("2024-01-08 07:00")  # sábado à noite
+
+
+def test_horario_ocupado_so_pelo_indice_unico():
+    erro = mysql.connector.IntegrityError(msg="Duplicate entry 'M01-2024-01-08 07:00:00' for key "
+                                                 "'uq_Consulta_Med_Data'", errno=1062)
+    assert agenda.horario_ocupado(erro)
+    assert not agenda.horario_ocupado(mysql.connector.IntegrityError(msg="Duplicate entry for key 'PRIMARY'",
+                                                                     errno=1062))
+    assert not agenda.horario_ocupado(ValueError("x"))
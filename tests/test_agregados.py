@@ -0,0 +1,69 @@
+import datetime
+from collections import Counter
+
+import pandas as pd
+
+import agregados
+import referencia
+
+INICIO, FIM = datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)
+MEDICOS = referencia.Lista.do_dataframe(pd.DataFrame({
+    "codigo": ["M1", "M2"], "nome": ["Ana", "Bruno"], "extra": ["Cardiologia", "Pediatria"]}))
+
+
+def consultas(*linhas):
+    return pd.DataFrame(linhas, columns=["IdConsulta", "CodMed", "CpfPaciente", "Data_Hora"]).astype(
+        {"Data_Hora": "datetime64[ns]"})
+
+
+def canceladas(*linhas):
+    return pd.DataFrame(linhas, columns=["IdLog", "IdConsultaDeletada", "CodMed", "CpfPaciente", "Data_Hora"]).astype(
+        {"Data_Hora": "datetime64[ns]"})
+
+
+def test_aplicar_soma_e_subtrai_nos_contadores():
+    estado = agregados.Agregados(por_medico=Counter({"M1": 2, "M2": 1}))
+    estado.aplicar(consultas((1, "M1", "111", "2024-01-02 07:00"), (2, "M1", "222", "2024-01-02 07:30")), 1)
+    assert estado.por_medico == Counter({"M1": 4, "M2": 1})
+    assert estado.por_dia == Counter({datetime.date(2024, 1, 2): 2})
+    estado.aplicar(consultas((3, "M2", "111", "2024-01-02 08:00")), -1)
+    # Contagem zerada sai do contador: o médico volta a ser ocioso
+    assert "M2" not in estado.por_medico
+    assert estado.por_paciente == Counter({"222": 1})
+
+
+def test_aplicar_novidades(monkeypatch):
+    estado = agregados.Agregados(por_medico=Counter({"M1": 5}), marca_consulta=5000, marca_log=3000,
+                                 recentes={4990}, recentes_log=set())
+    novas = consultas(
+        (4990, "M1", "111", "2024-01-03 07:00"),   # já aplicada (dentro da margem)
+        (5001, "M2", "222", "2024-01-03 07:00"),
+        (5002, "M1", "333", "2024-03-01 07:00"),   # fora do período
+        (5003, "M1", "444", "2024-01-04 07:00"))
+    cancel = canceladas(
+        (3001, 100, "M1", "555", "2024-01-05 07:00"),   # antiga: estava nos agregados
+        (3002, 5003, "M1", "444", "2024-01-04 07:00"),  # acabou de entrar: também desconta
+        (3003, 4999, "M2", "666", "2024-01-06 07:00"))  # criada e cancelada entre atualizações
+    respostas = {"Consulta": novas, "Log_Cancelamento": cancel}
+    monkeypatch.setattr(agregados, "ler_sql",
+                        lambda conn, sql, params: respostas["Consulta" if "FROM Consulta" in sql else "Log_Cancelamento"])
+
+    assert agregados.aplicar_novidades(None, estado, INICIO, FIM, "Todas", MEDICOS) == (3, 3)
+    assert estado.por_medico == Counter({"M1": 4, "M2": 1})
+    assert estado.marca_consulta == 5003 and estado.marca_log == 3003
+    assert {5001, 5002, 5003} <= estado.recentes
+    assert estado.recentes_log == {3001, 3002, 3003}
+
+
+def test_novidades_demais_pedem_reconstrucao(monkeypatch):
+    monkeypatch.setattr(agregados, "NOVIDADES_MAX", 1)
+    monkeypatch.setattr(agregados, "ler_sql", lambda conn, sql, params: consultas(
+        (1, "M1", "111", "2024-01-03 07:00"), (2, "M1", "111", "2024-01-03 07:30")))
+    assert agregados.aplicar_novidades(None, agregados.Agregados(), INICIO, FIM, "Todas", MEDICOS) is None
+
+
+def test_filtro_por_especialidade_usa_a_lista_de_medicos():
+    df = consultas((1, "M1", "111", "2024-01-03 07:00"), (2, "M2", "222", "2024-01-03 07:00"),
+                   (3, "M1", "333", "2024-02-01 00:00"))
+    assert agregados._no_filtro(df, INICIO, FIM, "Pediatria", MEDICOS)["IdConsulta"].tolist() == [2]
+    assert agregados._no_filtro(df, INICIO, FIM, "Todas", MEDICOS)["IdConsulta"].tolist() == [1, 2]
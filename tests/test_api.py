@@ -0,0 +1,74 @@
+import datetime
+
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("aiomysql")
+
+from aiohttp.test_utils import make_mocked_request  # noqa: E402
+from mysql.connector import FieldType  # noqa: E402
+
+import api  # noqa: E402
+import dashboard  # noqa: E402
+from banco import tabela_arrow  # noqa: E402
+
+
+def test_para_pymysql_escapa_os_literais():
+    sql, params = dashboard.sql_evolucao(datetime.date(2024, 1, 1), datetime.date(2024, 1, 31), "Todas", "Mês")
+    convertido = api.para_pymysql(sql)
+    assert "DATE_FORMAT(d.Dia, '%%Y-%%m')" in convertido
+    # Como o PyMySQL formata: só os %s recebem valores
+    assert convertido % ("'2024-01-01'", "'2024-01-31'") == \
+        sql.replace("%s", "'2024-01-01'", 1).replace("%s", "'2024-01-31'", 1)
+
+
+def test_etiqueta_muda_com_a_versao_e_a_requisicao():
+    etag = api.etiqueta((10, 2, 5), "kpis", "2024-01-01")
+    assert etag.startswith('"') and etag.endswith('"') and len(etag) == 22
+    assert etag == api.etiqueta((10, 2, 5), "kpis", "2024-01-01")
+    assert etag != api.etiqueta((11, 2, 5), "kpis", "2024-01-01")
+    assert etag != api.etiqueta((10, 2, 5), "ociosos", "2024-01-01")
+
+
+def test_etag_confere():
+    etag = api.etiqueta((1, 1, 1), "kpis")
+
+    def requisicao(cabecalho):
+        return make_mocked_request("GET", "/", headers={"If-None-Match": cabecalho} if cabecalho else {})
+
+    assert api.etag_confere(requisicao(etag), etag)
+    assert api.etag_confere(requisicao(f'"outra", W/{etag}'), etag)
+    assert api.etag_confere(requisicao("*"), etag)
+    assert not api.etag_confere(requisicao('"outra"'), etag)
+    assert not api.etag_confere(requisicao(None), etag)
+
+
+def test_ler_filtros():
+    assert api.ler_filtros({}) == (api.INICIO_PADRAO, api.FIM_PADRAO, "Todas", "Dia")
+    assert api.ler_filtros({"inicio": "2024-01-01", "fim": "2024-01-31", "agrupamento": "Mês"})[3] == "Mês"
+    for query in ({"inicio": "01/01/2024"}, {"inicio": "2024-02-01", "fim": "2024-01-01"}, {"agrupamento": "Ano"}):
+        with pytest.raises(ValueError):
+            api.ler_filtros(query)
+
+
+def test_ler_formato_pelo_accept():
+    assert api.ler_formato(make_mocked_request("GET", "/")) == "json"
+    assert api.ler_formato(make_mocked_request("GET", "/", headers={"Accept": api.TIPO_ARROW})) == "arrow"
+    with pytest.raises(ValueError):
+        api.ler_formato(make_mocked_request("GET", "/?formato=csv"))
+
+
+def test_corpo_arrow_com_a_tabela_do_cursor():
+    # Formato de cursor.description do aiomysql/PyMySQL
+    descricao = [("Data", FieldType.DATE, None, None, None, None, 1),
+                 ("Consultas", FieldType.LONGLONG, None, None, None, None, 1)]
+    tabela = tabela_arrow(descricao, [(datetime.date(2024, 1, 1), 12), (datetime.date(2024, 1, 2), 7)])
+    lida = pa.ipc.open_stream(api.corpo_arrow(tabela)).read_all()
+    assert lida.equals(tabela)
+    assert lida.schema.types == [pa.date32(), pa.int64()]
+
+
+def test_corpo_json_converte_datas():
+    assert api.corpo_json({"dia": datetime.date(2024, 1, 1), "t": datetime.timedelta(minutes=1)}) == \
+        b'{"dia": "2024-01-01", "t": 60.0}'
@@ -0,0 +1,35 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import auditoria
+
+
+def test_rotulos_por_idlog():
+    df = pd.DataFrame({
+        "IdLog": [7, 3],
+        "DataCancelamento": pd.to_datetime(["2024-05-01 10:30:00", "2024-04-30 08:00:00"]),
+        "IdConsultaDeletada": [120.0, np.nan],  # float quando há NULL
+        "Motivo": ["Paciente pediu o cancelamento por telefone, sem remarcar", None],
+    })
+    rotulos = auditoria.rotulos_log(df)
+    # Motivo cortado em MOTIVO_NO_ROTULO caracteres; NULL vira texto vazio
+    assert rotulos == {
+        7: "Log #7 - Cancelada em: 2024-05-01 10:30:00 | Consulta #120 | Paciente pediu o cancelamento ",
+        3: "Log #3 - Cancelada em: 2024-04-30 08:00:00 | Consulta # | ",
+    }
+
+
+def test_rotulos_de_log_vazio():
+    assert auditoria.rotulos_log(pd.DataFrame(columns=["IdLog", "DataCancelamento", "IdConsultaDeletada", "Motivo"])) == {}
+
+
+def test_pagina_do_log_por_chave():
+    sql, params = auditoria.sql_log(datetime.date(2024, 1, 1), datetime.date(2024, 1, 31),
+                                    apos=("2024-01-20 10:00:00", 55), limite=25)
+    assert "(DataCancelamento < %s OR (DataCancelamento = %s AND IdLog < %s))" in sql
+    assert params == (datetime.date(2024, 1, 1), datetime.date(2024, 1, 31),
+                      "2024-01-20 10:00:00", "2024-01-20 10:00:00", 55, 25)
+    sql, _ = auditoria.sql_log(arquivo=True)
+    assert f"FROM {auditoria.TABELA_ARQUIVO}" in sql and "WHERE" not in sql
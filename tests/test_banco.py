@@ -0,0 +1,148 @@
+import contextvars
+import datetime
+import decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from mysql.connector import FieldFlag, FieldType
+
+import banco
+import medicao
+
+
+class CursorFalso:
+    # Só o que banco.executar usa de um cursor
+    def __init__(self):
+        self.comandos, self.rowcount = [], -1
+
+    def execute(self, sql, params=None):
+        self.comandos.append((sql, params))
+        self.rowcount = 1
+
+    def executemany(self, sql, lista_params):
+        self.comandos.extend((sql, params) for params in lista_params)
+        self.rowcount = len(lista_params)
+
+
+def test_re_escrita_reconhece_a_tabela_alterada():
+    casos = {
+        "INSERT INTO Consulta (CodCli) VALUES (%s)": "Consulta",
+        "  insert ignore into `Paciente` VALUES (%s)": "Paciente",
+        "\n    UPDATE Medico SET Email = %s": "Medico",
+        "DELETE FROM Log_Cancelamento WHERE IdLog = %s": "Log_Cancelamento",
+        "TRUNCATE TABLE Consulta_Diaria": "Consulta_Diaria",
+    }
+    for sql, tabela in casos.items():
+        assert banco.RE_ESCRITA.match(sql).group(1) == tabela
+    for sql in ("SELECT * FROM Consulta", "SET @motivo_cancelamento = %s", "EXPLAIN DELETE FROM Consulta"):
+        assert banco.RE_ESCRITA.match(sql) is None
+
+
+def test_executar_incrementa_so_a_versao_da_tabela_escrita():
+    consulta, medico, total = banco.versao_dados("Consulta"), banco.versao_dados("Medico"), banco.versao_dados()
+    banco.executar(CursorFalso(), "DELETE FROM Consulta WHERE IdConsulta = %s", (1,))
+    banco.executar(CursorFalso(), "SELECT 1")
+    assert banco.versao_dados("Consulta") == consulta + 1
+    assert banco.versao_dados("Medico") == medico
+    assert banco.versao_dados() == total + 1
+
+
+def test_executar_lote_registra_um_comando_por_lote():
+    def importar():
+        rodada = medicao.iniciar_rodada("teste")
+        cursor = CursorFalso()
+        versao = banco.versao_dados("Consulta")
+        banco.executar_lote(cursor, "INSERT INTO Consulta (CodMed) VALUES (%s)", [("M1",), ("M2",), ("M3",)])
+        return rodada.tabela(), cursor, banco.versao_dados("Consulta") - versao
+
+    # Contexto à parte: a rodada não vaza para os outros testes
+    registros, cursor, escritas = contextvars.copy_context().run(importar)
+    assert len(cursor.comandos) == 3
+    assert registros["linhas"].tolist() == [3]
+    assert registros["sql"][0] == "INSERT INTO Consulta (CodMed) VALUES (%s)"
+    assert escritas == 1
+
+
+# --- Leitura colunar ---
+def descricao(nome, tipo, flags=0):
+    # Formato de cursor.description do mysql.connector
+    return (nome, tipo, None, None, None, None, 1, flags, 255)
+
+
+class CursorColunar:
+    def __init__(self, conexao):
+        self.conexao, self.description = conexao, conexao.descricoes
+
+    def execute(self, sql, params=None):
+        self.restantes = list(self.conexao.linhas)
+
+    def fetchmany(self, tamanho):
+        lote, self.restantes = self.restantes[:tamanho], self.restantes[tamanho:]
+        self.conexao.lotes.append(len(lote))
+        return lote
+
+    def close(self):
+        pass
+
+
+class ConexaoColunar:
+    """Conexão com um único resultado, lido por fetchmany."""
+
+    def __init__(self, descricoes, linhas):
+        self.descricoes, self.linhas, self.lotes = descricoes, linhas, []
+        self.unread_result = False
+
+    def cursor(self):
+        return CursorColunar(self)
+
+
+def test_tipo_arrow_pelo_codigo_do_cursor():
+    assert banco.tipo_arrow(descricao("a", FieldType.LONG)) == pa.int64()
+    assert banco.tipo_arrow(descricao("a", FieldType.LONGLONG, FieldFlag.UNSIGNED)) == pa.uint64()
+    assert banco.tipo_arrow(("a", FieldType.LONGLONG, None, None, None, None, 1)) == pa.int64()  # PyMySQL
+    assert banco.tipo_arrow(descricao("a", FieldType.NEWDECIMAL)) == pa.float64()
+    assert banco.tipo_arrow(descricao("a", FieldType.DATETIME)) == pa.timestamp("us")
+    assert banco.tipo_arrow(descricao("a", FieldType.BLOB)) is None
+
+
+def test_tabela_arrow_converte_decimal_e_nulos():
+    tabela = banco.tabela_arrow(
+        [descricao("Qtd", FieldType.NEWDECIMAL), descricao("Vazio", FieldType.DOUBLE),
+         descricao("Dia", FieldType.DATE), descricao("Nome", FieldType.VAR_STRING)],
+        [(decimal.Decimal("2.5"), None, datetime.date(2024, 1, 1), "Ana"),
+         (None, None, None, "Bia")])
+    assert tabela.schema.types == [pa.float64(), pa.float64(), pa.date32(), pa.string()]
+    assert tabela.column("Qtd").to_pylist() == [2.5, None]
+    assert tabela.column("Vazio").null_count == 2
+
+
+def test_tabela_arrow_sem_linhas_mantem_as_colunas():
+    tabela = banco.tabela_arrow([descricao("total", FieldType.LONGLONG)], [])
+    assert tabela.num_rows == 0
+    assert tabela.schema.names == ["total"]
+    assert tabela.schema.types == [pa.int64()]
+
+
+def test_texto_repetido_vira_category():
+    repetido = [pa.array(["Cardiologia", "Pediatria"] * 100)]
+    assert isinstance(banco._coluna_pandas(repetido, pa.string()).dtype, pd.CategoricalDtype)
+    distintos = [pa.array([f"P{i}" for i in range(200)])]
+    assert banco._coluna_pandas(distintos, pa.string()).dtype == object
+    pequeno = [pa.array(["A"] * (banco.CATEGORIA_MIN_LINHAS - 1))]
+    assert banco._coluna_pandas(pequeno, pa.string()).dtype == object
+
+
+def test_ler_colunar_em_lotes():
+    conn = ConexaoColunar(
+        [descricao("Id", FieldType.LONG), descricao("Data_Hora", FieldType.DATETIME),
+         descricao("Extra", FieldType.BLOB), descricao("Id", FieldType.LONG)],
+        [(i, datetime.datetime(2024, 1, 1, 7, 0) + datetime.timedelta(minutes=30 * i), b"x", -i)
+         for i in range(5)])
+    df = banco.ler_colunar(conn, "SELECT ...", tamanho_lote=2)
+    assert conn.lotes == [2, 2, 1, 0]
+    assert list(df.columns) == ["Id", "Data_Hora", "Extra", "Id"]  # nomes repetidos, como no read_sql
+    assert df.dtypes.tolist() == [np.int64, np.dtype("datetime64[us]"), object, np.int64]
+    assert df.iloc[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert df["Data_Hora"].iloc[-1] == pd.Timestamp("2024-01-01 09:00")
+    assert df["Extra"].tolist() == [b"x"] * 5
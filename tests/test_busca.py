@@ -0,0 +1,88 @@
+import pandas as pd
+
+import busca
+from banco import normalizar_sql
+
+
+def test_palavras_remove_operadores_do_modo_booleano():
+    assert busca._palavras('Ana +"Maria" (Souza)* -x') == ["ana", "maria", "souza", "x"]
+
+
+def test_prefixo_like_escapa_curingas():
+    assert busca._prefixo_like("50%_a\\b") == "50\\%\\_a\\\\b%"
+
+
+def test_termo_longo_usa_fulltext_com_prefixo():
+    where, params = busca.condicao_busca("medico", "  Carlos   Eduardo ")
+    assert where == "MATCH(NomeMed) AGAINST (%s IN BOOLEAN MODE)"
+    assert params == ("+carlos* +eduardo*",)
+
+
+def test_palavra_curta_do_termo_nao_e_descartada():
+    where, params = busca.condicao_busca("paciente", "Ana da Silva")
+    assert where == ("MATCH(NomePac) AGAINST (%s IN BOOLEAN MODE)"
+                     " AND CONCAT(' ', NomePacBusca) LIKE %s")
+    assert params == ("+ana* +silva*", "% da%")
+
+
+def test_termo_so_com_palavras_curtas_usa_prefixo_normalizado():
+    assert busca.condicao_busca("clinica", "Sã") == ("NomeCliBusca LIKE %s", ("sã%",))
+
+
+def test_cpf_busca_pelo_inicio_do_numero():
+    for termo in ("123.456", "123456", " 123 456 "):
+        assert busca.condicao_busca("paciente", termo) == ("CpfPaciente LIKE %s", ("123456%",))
+
+
+def test_digitos_so_contam_como_cpf_para_paciente():
+    where, _ = busca.condicao_busca("medico", "123")
+    assert where.startswith("MATCH(NomeMed)")
+
+
+def test_sql_busca_ordena_por_relevancia_e_limita():
+    sql, params = busca.sql_busca("paciente", "maria silva", limite=10)
+    sql = normalizar_sql(sql)
+    assert "ORDER BY MATCH(NomePac) AGAINST (%s IN BOOLEAN MODE) DESC LIMIT %s" in sql
+    assert params == ("+maria* +silva*", "+maria* +silva*", 10)
+    assert sql.count("%s") == len(params)
+
+
+def test_sql_busca_por_prefixo_ordena_pelo_indice():
+    sql, params = busca.sql_busca("medico", "jo")
+    assert "ORDER BY NomeMedBusca" in normalizar_sql(sql)
+    assert params == ("jo%", busca.LIMITE_BUSCA)
+
+
+def test_filtro_busca_e_subconsulta_sem_limite():
+    trecho, params = busca.filtro_busca("paciente", "ana da silva", "c.CpfPaciente")
+    assert trecho.startswith("c.CpfPaciente IN (SELECT CpfPaciente FROM Paciente WHERE MATCH(NomePac)")
+    assert "LIMIT" not in trecho
+    assert trecho.count("%s") == len(params) == 2
+
+
+def test_sugestoes_por_prefixo_de_cpf_ou_nome():
+    sql, params = busca.sql_sugestoes_pacientes("123.45", limite=5)
+    assert "WHERE CpfPaciente LIKE %s ORDER BY CpfPaciente LIMIT %s" in sql
+    assert params == ("12345%", 5)
+    sql, params = busca.sql_sugestoes_pacientes(" Maria  da ")
+    assert "WHERE NomePacBusca LIKE %s ORDER BY NomePacBusca LIMIT %s" in sql
+    assert params == ("maria da%", busca.LIMITE_SUGESTOES)
+
+
+def test_sugestoes_guardadas_por_termo_e_versao(monkeypatch):
+    lidos, versao = [], [1]
+    monkeypatch.setattr(busca, "_sugestoes", busca.OrderedDict())
+    monkeypatch.setattr(busca.referencia, "versao", lambda conn, tabela: versao[0])
+
+    def ler(conn, sql, params):
+        lidos.append(params)
+        return pd.DataFrame({"CpfPaciente": ["11122233344"], "NomePac": ["Maria"]})
+
+    monkeypatch.setattr(busca, "ler_sql", ler)
+    assert busca.sugerir_pacientes(None, "m") == []  # curto demais: nem consulta o banco
+    assert busca.sugerir_pacientes(None, "Ma") == [("11122233344", "11122233344 - Maria")]
+    busca.sugerir_pacientes(None, " ma ")
+    assert len(lidos) == 1
+    versao[0] = 2  # Paciente mudou
+    busca.sugerir_pacientes(None, "ma")
+    assert len(lidos) == 2
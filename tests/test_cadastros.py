@@ -0,0 +1,44 @@
+import busca
+import cadastros
+from banco import normalizar_sql
+
+
+def test_listagem_sem_filtro_nao_tem_where():
+    for montar in (cadastros.sql_pacientes, cadastros.sql_medicos, cadastros.sql_clinicas):
+        sql, params = montar()
+        assert "WHERE" not in sql
+        assert params == ()
+
+
+def test_filtros_juntos_com_and():
+    filtros = [busca.filtro_busca("paciente", "ana", "p.CpfPaciente"), ("p.Genero = %s", ("F",))]
+    sql, params = cadastros.sql_pacientes(filtros)
+    assert "WHERE p.CpfPaciente IN (SELECT CpfPaciente FROM Paciente WHERE" in normalizar_sql(sql)
+    assert "AND p.Genero = %s GROUP BY" in normalizar_sql(sql)
+    assert params == ("+ana*", "F")
+
+
+def test_agenda_do_medico_pagina_por_data_hora():
+    sql, params = cadastros.sql_agenda_medico("M01", limite=20)
+    assert "WHERE c.CodMed = %s ORDER BY c.Data_Hora DESC LIMIT %s" in normalizar_sql(sql)
+    assert params == ("M01", 20)
+    sql, params = cadastros.sql_agenda_medico("M01", apos="2024-05-01 10:00:00", limite=20)
+    assert "WHERE c.CodMed = %s AND c.Data_Hora < %s ORDER BY" in normalizar_sql(sql)
+    assert params == ("M01", "2024-05-01 10:00:00", 20)
+
+
+def test_consultas_da_clinica_desempatam_pelo_medico():
+    sql, params = cadastros.sql_consultas_clinica("C01", apos=("2024-05-01 10:00:00", "M07"))
+    sql = normalizar_sql(sql)
+    assert "AND (c.Data_Hora < %s OR (c.Data_Hora = %s AND c.CodMed < %s))" in sql
+    assert sql.endswith("ORDER BY c.Data_Hora DESC, c.CodMed DESC LIMIT %s")
+    assert params == ("C01", "2024-05-01 10:00:00", "2024-05-01 10:00:00", "M07", 50)
+    assert sql.count("%s") == len(params)
+
+
+def test_graficos_agregados_no_banco():
+    sql, params = cadastros.sql_consultas_por_mes_medico("M01")
+    assert "DATE_FORMAT(c.Data_Hora, '%Y-%m') as Mes, COUNT(*)" in sql
+    assert "GROUP BY Mes" in sql and params == ("M01",)
+    sql, params = cadastros.sql_especialidades_clinica("C01")
+    assert "GROUP BY m.Especialidade" in sql and params == ("C01",)
@@ -0,0 +1,85 @@
+import datetime
+
+import mysql.connector
+import pytest
+
+import cancelamento
+
+
+class ConexaoFalsa:
+    """Consultas em memória; o DELETE de número falhar_no perde a conexão."""
+
+    def __init__(self, ids, falhar_no=None):
+        self.ids, self.falhar_no = list(ids), falhar_no
+        self.deletes, self.commits, self.perdida, self.rowcount = 0, 0, False, -1
+        self.variaveis = {}
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        if self.perdida:
+            raise mysql.connector.errors.OperationalError("MySQL Connection not available.")
+        if sql.startswith("SET"):
+            self.variaveis[sql] = params
+        elif sql.startswith("SELECT"):
+            *_, ultimo, limite = params
+            self._linhas = [(i,) for i in self.ids if i > ultimo][:limite]
+        elif sql.startswith("DELETE"):
+            self.deletes += 1
+            if self.deletes == self.falhar_no:
+                self.perdida = True
+                raise mysql.connector.errors.OperationalError("Lost connection to MySQL server during query")
+            removidos = set(params[-len(self._linhas):])
+            self.ids = [i for i in self.ids if i not in removidos]
+            self.rowcount = len(removidos)
+
+    def fetchall(self):
+        return self._linhas
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        if self.perdida:
+            raise mysql.connector.errors.OperationalError("MySQL Connection not available.")
+
+    def close(self):
+        pass
+
+
+def test_ids_do_texto():
+    assert cancelamento.ids_do_texto("12, 3\n12;  40\tabc") == [3, 12, 40]
+
+
+def test_filtro_cancelamento():
+    assert cancelamento.filtro_cancelamento(cod_med="M1", data_inicio=datetime.date(2024, 1, 1),
+                                            data_fim=datetime.date(2024, 1, 31)) == (
+        "CodMed = %s AND Data_Hora >= %s AND Data_Hora < %s + INTERVAL 1 DAY",
+        ("M1", datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)))
+    assert cancelamento.filtro_cancelamento(ids=[5, 7], cod_cli="C1") == ("IdConsulta IN (%s, %s) AND CodCli = %s",
+                                                                          (5, 7, "C1"))
+    assert cancelamento.filtro_cancelamento(ids=[]) == ("1 = 0", ())
+    # O rollback e o SET do finally também falham, mas o erro que sobe é o do DELETE
+    with pytest.raises(ValueError):
+        cancelamento.filtro_cancelamento()
+
+
+def test_cancelar_em_blocos():
+    conn = ConexaoFalsa(range(1, 11))
+    progresso = []
+    lote, removidas = cancelamento.cancelar_em_lote(conn, ("CodMed = %s", ("M1",)), "x" * 150, tamanho_bloco=4,
+                                                    progresso=progresso.append)
+    assert removidas == 10 and conn.ids == []
+    assert progresso == [4, 8, 10] and conn.commits == 3
+    motivo, id_lote = conn.variaveis["SET @motivo_cancelamento = %s, @lote_cancelamento = %s"]
+    assert len(motivo) == cancelamento.MOTIVO_MAX and id_lote == lote
+    assert "SET @motivo_cancelamento = NULL, @lote_cancelamento = NULL" in conn.variaveis
+
+
+def test_conexao_perdida_mantem_o_erro_original():
+    conn = ConexaoFalsa(range(1, 11), falhar_no=2)
+    # O rollback e o SET do finally também falham, mas o erro que sobe é o do DELETE
+    with pytest.raises(mysql.connector.errors.OperationalError, match="during query"):
+        cancelamento.cancelar_em_lote(conn, ("CodMed = %s", ("M1",)), "motivo", tamanho_bloco=4)
+    assert conn.ids == list(range(5, 11))  # o primeiro bloco já tinha sido confirmado
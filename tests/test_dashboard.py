@@ -0,0 +1,114 @@
+import datetime
+
+import mysql.connector
+import pandas as pd
+
+import dashboard
+from banco import normalizar_sql
+
+INICIO, FIM = datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)
+
+
+def test_intervalo_semiaberto_ate_o_dia_seguinte():
+    assert dashboard.intervalo_datas(INICIO, FIM) == (INICIO, datetime.date(2024, 2, 1))
+
+
+def test_filtro_sem_especialidade_compara_data_hora_sem_date():
+    where, params = dashboard.filtro_dashboard(INICIO, FIM)
+    assert where == "WHERE c.Data_Hora >= %s AND c.Data_Hora < %s"
+    assert "DATE(" not in where
+    assert params == (INICIO, datetime.date(2024, 2, 1))
+
+
+def test_filtro_com_especialidade():
+    where, params = dashboard.filtro_dashboard(INICIO, FIM, "Cardiologia")
+    assert where.endswith("AND m.Especialidade = %s")
+    assert params == (INICIO, datetime.date(2024, 2, 1), "Cardiologia")
+
+
+def test_kpis_em_uma_consulta():
+    sql, params = dashboard.sql_kpis(dashboard.filtro_dashboard(INICIO, FIM, "Cardiologia"))
+    sql = normalizar_sql(sql)
+    assert sql.count("SELECT") == 2  # a contagem de médicos é uma subconsulta escalar
+    for coluna in ("AS total", "AS pacientes", "AS medicos"):
+        assert coluna in sql
+    assert sql.count("%s") == len(params) == 3
+
+
+def test_rankings_acrescentam_o_limite_aos_parametros():
+    filtro = dashboard.filtro_dashboard(INICIO, FIM)
+    for montar in (dashboard.sql_rank_medicos, dashboard.sql_rank_pacientes):
+        sql, params = montar(filtro, limite=5)
+        assert params == filtro[1] + (5,)
+        assert sql.count("%s") == len(params)
+
+
+def test_evolucao_le_o_resumo_diario():
+    for agrupamento, expressao in dashboard.AGRUPAMENTOS.items():
+        sql, params = dashboard.sql_evolucao(INICIO, FIM, "Todas", agrupamento)
+        assert "FROM Consulta_Diaria d" in sql
+        assert f"GROUP BY {expressao}" in sql
+        assert params == (INICIO, FIM)
+    _, params = dashboard.sql_evolucao(INICIO, FIM, "Cardiologia", "Mês")
+    assert params == (INICIO, FIM, "Cardiologia")
+
+
+def test_consultas_dashboard_tem_uma_entrada_por_secao():
+    comandos = dashboard.consultas_dashboard(INICIO, FIM, "Cardiologia", "Semana")
+    assert set(comandos) == {"kpis", "rank_medicos", "rank_pacientes", "especialidades", "evolucao", "ociosos"}
+    for sql, params in comandos.values():
+        # Todo %s do comando tem seu parâmetro (os literais de DATE_FORMAT não contam)
+        assert sql.count("%s") == len(params)
+
+
+def test_normalizar_sql_ignora_indentacao():
+    assert normalizar_sql("\n    SELECT  *\n\tFROM Consulta\n    ") == "SELECT * FROM Consulta"
+    a, _ = dashboard.sql_kpis(dashboard.filtro_dashboard(INICIO, FIM))
+    assert normalizar_sql(a) == normalizar_sql(a.replace("\n    ", "\n        "))
+
+
+class ConexaoFalsa:
+    def __init__(self, abertas):
+        self.abertas = abertas
+        abertas.append(self)
+        self.fechada = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.rowcount = 0
+
+    def close(self):
+        self.fechada = True
+
+
+def test_carregar_retira_conexao_so_quando_vai_ao_banco():
+    # kpis e evolucao já estão no cache do app: não ocupam conexão do pool
+    em_cache = {normalizar_sql(sql) for nome, (sql, _) in dashboard.consultas_dashboard(INICIO, FIM).items()
+                if nome in ("kpis", "evolucao")}
+
+    def ler(conn, sql, params):
+        if normalizar_sql(sql) in em_cache:
+            return pd.DataFrame({"origem": ["cache"]})
+        conn.cursor()
+        return pd.DataFrame({"origem": ["banco"]})
+
+    for paralelo in (True, False):
+        abertas = []
+        dados = dashboard.carregar(lambda: ConexaoFalsa(abertas), INICIO, FIM, ler=ler, paralelo=paralelo)
+        assert not dados.erros
+        assert dados.kpis["origem"][0] == "cache" and dados.ociosos["origem"][0] == "banco"
+        assert len(abertas) == (4 if paralelo else 1)
+        assert all(conn.fechada for conn in abertas)
+
+
+def test_carregar_sem_conexao_marca_todas_as_secoes():
+    def obter():
+        raise mysql.connector.errors.PoolError("Failed getting connection; pool exhausted")
+
+    for paralelo in (True, False):
+        dados = dashboard.carregar(obter, INICIO, FIM, ler=lambda conn, sql, params: conn.cursor(),
+                                   paralelo=paralelo)
+        assert set(dados.erros) == set(dashboard.consultas_dashboard(INICIO, FIM))
+        assert "pool exhausted" in dados.erros["ociosos"]
@@ -0,0 +1,41 @@
+import io
+
+import pandas as pd
+
+import importacao
+
+CHAVES = {"CodCli": {"C1"}, "CodMed": {"M1"}, "CpfPaciente": {"111"}}
+AGORA = pd.Timestamp("2024-06-01 12:00")
+
+
+def test_validar_bloco_aponta_o_primeiro_motivo():
+    bloco = pd.DataFrame({
+        "CodCli": ["C1", "C9", " C1 ", "C1", "C1"],
+        "CodMed": ["M1", "M9", "M1", "M1", "M1"],
+        "CpfPaciente": ["111", "111", "111", "111", "111"],
+        "Data_Hora": ["2024-07-01 07:00", "2024-07-01 07:00", "ontem", "2024-05-01 07:00", "2024-07-02 08:00"],
+    }, index=[1, 2, 3, 4, 5])
+    validas, rejeitadas = importacao.validar_bloco(bloco, CHAVES, AGORA)
+    assert validas.index.tolist() == [1, 5]
+    assert validas["Data_Hora"].tolist() == [pd.Timestamp("2024-07-01 07:00"), pd.Timestamp("2024-07-02 08:00")]
+    assert rejeitadas["Motivo"].to_dict() == {
+        2: "CodCli inexistente",  # só o primeiro problema da linha
+        3: "Data_Hora inválida",
+        4: importacao.MSG_DATA_PASSADA,
+    }
+
+
+def test_ler_em_blocos_csv_e_parquet(tmp_path):
+    df = pd.DataFrame({"CodCli": ["C1"] * 5, "CodMed": ["007"] * 5, "CpfPaciente": ["011"] * 5,
+                       "Data_Hora": ["2024-07-01 07:00"] * 5, "Extra": range(5)})
+    csv = io.StringIO(df.to_csv(index=False))
+    blocos = list(importacao.ler_em_blocos(csv, "consultas.CSV", tamanho=2))
+    assert [len(b) for b in blocos] == [2, 2, 1]
+    assert blocos[0].columns.tolist() == importacao.COLUNAS
+    assert blocos[0]["CodMed"][0] == "007"  # códigos lidos como texto, sem perder zeros
+
+    caminho = tmp_path / "consultas.parquet"
+    df.to_parquet(caminho)
+    blocos = list(importacao.ler_em_blocos(caminho, caminho.name, tamanho=3))
+    assert [len(b) for b in blocos] == [3, 2]
+    assert blocos[0]["CpfPaciente"][0] == "011"
@@ -0,0 +1,68 @@
+import datetime
+
+import pandas as pd
+
+import agenda
+import ocupacao
+
+SEGUNDA, TERCA = datetime.date(2024, 1, 8), datetime.date(2024, 1, 9)
+SLOTS = len(agenda.HORARIOS)
+
+
+def pares(*linhas):
+    return pd.DataFrame(linhas, columns=["CodMed", "Data_Hora"]).astype({"Data_Hora": "datetime64[ns]"})
+
+
+def test_ocupacao_por_medico_semana_e_horario():
+    # Fora de ordem: calcular reordena antes de medir as lacunas
+    df = pares(("M2", "2024-01-09 07:00"), ("M1", "2024-01-08 08:00"), ("MX", "2024-01-08 07:00"),
+               ("M1", "2024-01-08 07:00"), ("M1", "2024-01-08 19:00"))
+    resultado = ocupacao.calcular(df, ["M1", "M2", "M3"], SEGUNDA, TERCA, nomes=["Ana", "Bruno", "Carla"])
+
+    assert resultado.linhas == 5
+    assert resultado.marcadas == 3            # MX não está na lista; 19:00 está fora da grade
+    assert resultado.fora_da_grade == 1
+    assert resultado.disponiveis == 3 * 2 * SLOTS
+    assert round(resultado.percentual, 2) == round(100 * 3 / (6 * SLOTS), 2)
+
+    medicos = resultado.medicos.set_index("CodMed")
+    assert medicos.index.tolist() == ["M1", "M2", "M3"]  # maior ocupação primeiro
+    assert medicos.loc["M1", "Marcadas"] == 2
+    assert medicos.loc["M1", "Horários vagos entre consultas"] == 1  # 07:30 entre 07:00 e 08:00
+    assert medicos.loc["M1", "Maior intervalo (min)"] == 30
+    assert medicos.loc["M1", "Horário de pico"] == "07:00"
+    assert medicos.loc["M3", "Marcadas"] == 0 and medicos.loc["M3", "Horário de pico"] is None
+    assert medicos.loc["M2", "Ocupação (%)"] == round(100 / (2 * SLOTS), 1)
+
+    assert resultado.semanas["Semana"].tolist() == [pd.Timestamp(SEGUNDA)]
+    assert resultado.semanas[["Marcadas", "Disponíveis"]].values.tolist() == [[3, 6 * SLOTS]]
+
+    mapa = resultado.mapa
+    assert mapa.index.tolist() == ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb"]
+    assert mapa.loc["Seg", "07:00"] == mapa.loc["Seg", "08:00"] == mapa.loc["Ter", "07:00"] == 33.3
+    assert mapa.loc["Seg", "07:30"] == 0 and mapa.loc["Qua", "07:00"] == 0  # quarta fora do período
+
+
+def test_ocupacao_sem_consultas():
+    resultado = ocupacao.calcular(pares(), ["M1"], SEGUNDA, SEGUNDA)
+    assert resultado.marcadas == 0 and resultado.disponiveis == SLOTS
+    assert resultado.medicos["Ocupação (%)"].tolist() == [0.0]
+    assert resultado.semanas["Marcadas"].tolist() == [0]
+
+
+def test_ocupacao_por_clinica():
+    triplas = pd.DataFrame([("C1", "M1", "2024-01-08 07:00"), ("C1", "M1", "2024-01-08 08:00"),
+                            ("C1", "M2", "2024-01-08 07:00"), ("C2", "M2", "2024-01-09 07:00"),
+                            ("C2", "M2", "2024-01-09 20:00")],
+                           columns=["CodCli", "CodMed", "Data_Hora"]).astype({"Data_Hora": "datetime64[ns]"})
+    clinicas = ocupacao.calcular_clinicas(triplas, ["C1", "C2", "C3"]).set_index("CodCli")
+    # Capacidade: dias em que cada médico atendeu na clínica x horários do dia
+    assert clinicas.loc["C1", ["Médicos", "Marcadas", "Disponíveis"]].tolist() == [2, 3, 2 * SLOTS]
+    assert clinicas.loc["C2", ["Médicos", "Marcadas", "Disponíveis"]].tolist() == [1, 1, SLOTS]
+    assert clinicas.loc["C3", ["Médicos", "Marcadas", "Disponíveis", "Ocupação (%)"]].tolist() == [0, 0, 0, 0.0]
+
+
+def test_pares_por_faixa_no_indice_unico():
+    sql, params = ocupacao.sql_pares(["M1", "M2"], SEGUNDA, TERCA)
+    assert "WHERE CodMed IN (%s, %s) AND Data_Hora >= %s AND Data_Hora < %s" in sql
+    assert params == ("M1", "M2", SEGUNDA, datetime.date(2024, 1, 10))